@@ -0,0 +1,312 @@
+#  Copyright 2020 NOKIA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from ansible.errors import AnsibleParserError
+from ansible.plugins.inventory import BaseInventoryPlugin
+
+try:
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin
+
+DOCUMENTATION = '''
+    name: tc_overcloud
+    plugin_type: inventory
+    short_description: Overcloud compute hosts for topology collection
+    description:
+        - Builds the tc_hosts group from the overcloud nodes known to the
+          undercloud Nova that run a NIC Switch or Open vSwitch agent in the
+          overcloud Neutron.
+        - Nova servers and Neutron agents are listed concurrently, with one
+          Keystone session per cloud. Keystone tokens are shared with the
+          collector scripts through their on-disk token cache.
+        - Each host gets ansible_host, ansible_user, hostname, service_host
+          and its own device_mappings and bridge_mappings as host vars.
+        - The result is cached on disk for cache_ttl seconds.
+        - Uses a YAML configuration file that ends with tc_inventory.yml.
+    options:
+        plugin:
+            description: token that ensures this is a source file for the
+                         'tc_overcloud' plugin.
+            required: True
+            choices: ['tc_overcloud']
+        undercloud_env_file:
+            description: rc file with the undercloud credentials
+            default: ~/stackrc
+            type: path
+            env:
+                - name: TC_UNDERCLOUD_ENV_FILE
+        osc_env_file:
+            description: rc file with the overcloud credentials
+            default: ~/overcloudrc
+            type: path
+            env:
+                - name: TC_OSC_ENV_FILE
+        overcloud_user:
+            description: user to log in to the overcloud nodes with
+            default: heat-admin
+            env:
+                - name: TC_OVERCLOUD_USER
+        network:
+            description: Nova network holding the node management address
+            default: ctlplane
+        cache_file:
+            description: path of the inventory cache
+            default: ~/.cache/nuage-topology-collector/inventory.json
+            type: path
+            env:
+                - name: TC_INVENTORY_CACHE_FILE
+        cache_ttl:
+            description: seconds a cached inventory is reused, 0 always
+                         queries the clouds and refreshes the cache
+            default: 3600
+            type: int
+            env:
+                - name: TC_INVENTORY_CACHE_TTL
+'''
+
+EXAMPLES = '''
+# tc_inventory.yml
+plugin: tc_overcloud
+undercloud_env_file: /home/stack/stackrc
+osc_env_file: /home/stack/overcloudrc
+cache_ttl: 600
+'''
+
+GROUP = 'tc_hosts'
+AGENT_TYPES = {
+    'NIC Switch agent': 'device_mappings',
+    'Open vSwitch agent': 'bridge_mappings'
+}
+# bumped whenever the cached host vars change
+CACHE_VERSION = 2
+# rc variables identifying the cloud and user, the cache is keyed on them
+CACHE_KEY_VARS = ('OS_AUTH_URL', 'OS_USERNAME', 'OS_PROJECT_NAME',
+                  'OS_TENANT_NAME', 'OS_USER_DOMAIN_NAME',
+                  'OS_PROJECT_DOMAIN_NAME')
+
+
+def read_rc_file(rc_file):
+    """Return the environment an rc file sets, without touching ours"""
+    try:
+        output = subprocess.check_output(
+            ['env', '-i', 'bash', '-c', 'source "$0" && env', rc_file],
+            stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise AnsibleParserError("Failed to source %s: %s" % (rc_file, e))
+    env = dict()
+    for line in output.decode().splitlines():
+        key, _, value = line.partition('=')
+        if key:
+            env[key] = value
+    return env
+
+
+def get_token_cache_class():
+    # the token cache is shared with the collector scripts, which are not
+    # installed as a python package
+    try:
+        from helper.token_cache import TokenCache
+    except ImportError:
+        sys.path.append(os.path.join(
+            os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+            'scripts'))
+        from helper.token_cache import TokenCache
+    return TokenCache
+
+
+def get_session(env):
+    from keystoneauth1.identity import v3
+
+    auth_url = env['OS_AUTH_URL']
+    if env.get('OS_IDENTITY_API_VERSION') == '3':
+        if 'v3' not in auth_url:
+            auth_url = urljoin(auth_url, 'v3')
+    project_name = env.get('OS_TENANT_NAME', env.get('OS_PROJECT_NAME'))
+    auth = v3.Password(auth_url=auth_url,
+                       username=env.get('OS_USERNAME'),
+                       password=env.get('OS_PASSWORD'),
+                       project_name=project_name,
+                       user_domain_name=env.get('OS_USER_DOMAIN_NAME'),
+                       project_domain_name=env.get('OS_PROJECT_DOMAIN_NAME'))
+    token_cache = get_token_cache_class()(
+        auth_url, env.get('OS_USERNAME'), project_name,
+        env.get('OS_USER_DOMAIN_NAME'), env.get('OS_PROJECT_DOMAIN_NAME'))
+    return token_cache.session(auth, verify=False)
+
+
+def list_servers(env, network):
+    """Return {server name: address on network} from the undercloud"""
+    from novaclient import client
+
+    nova = client.Client(2, session=get_session(env))
+    return dict((server.name, server.networks[network][0])
+                for server in nova.servers.list()
+                if server.networks.get(network))
+
+
+def list_agents(env):
+    """Return the NIC Switch and OVS agents of the overcloud"""
+    from neutronclient.v2_0 import client
+
+    neutron = client.Client(session=get_session(env))
+    return neutron.list_agents(
+        agent_type=list(AGENT_TYPES),
+        fields=['host', 'agent_type', 'configurations'])['agents']
+
+
+def merge_agents(agents):
+    """Return {short hostname: {'host', 'configurations'}}"""
+    result = dict()
+    for agent in agents:
+        mapping = AGENT_TYPES.get(agent['agent_type'])
+        if mapping is None:
+            continue
+        confs = {mapping: agent['configurations'].get(mapping)}
+        hostname = agent['host'].split('.')[0]
+        if hostname in result:
+            result[hostname]['configurations'].update(confs)
+        else:
+            result[hostname] = {
+                'host': agent['host'],
+                'configurations': confs
+            }
+    return result
+
+
+def build_hosts(servers, agents):
+    """Return the host vars of each server running a collected agent"""
+    hosts = dict()
+    for name, address in servers.items():
+        if name not in agents:
+            continue
+        # only the host's own mappings, copying more would make each
+        # host's vars grow with the size of the cloud
+        host_vars = dict((mapping, value) for mapping, value
+                         in agents[name]['configurations'].items()
+                         if value is not None)
+        host_vars.update(ansible_host=address,
+                         hostname=agents[name]['host'],
+                         service_host=agents[name]['host'])
+        hosts[name] = host_vars
+    return hosts
+
+
+def run_concurrently(*calls):
+    """Run (function, args) tuples in threads, return results in order"""
+    results = [None] * len(calls)
+    errors = [None] * len(calls)
+
+    def run(index, function, args):
+        try:
+            results[index] = function(*args)
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=run, args=(i, function, args))
+               for i, (function, args) in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for error in errors:
+        if error is not None:
+            raise error
+    return results
+
+
+def load_cache(path, key, ttl):
+    if ttl <= 0:
+        return None
+    try:
+        with open(path) as cache_file:
+            cache = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get('key') != key:
+        return None
+    if not 0 <= time.time() - cache.get('timestamp', 0) < ttl:
+        return None
+    return cache.get('hosts')
+
+
+def save_cache(path, key, hosts):
+    cache_dir = os.path.dirname(path)
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, 'w') as cache_file:
+            json.dump({'key': key, 'timestamp': time.time(),
+                       'hosts': hosts}, cache_file)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        # the cache is an optimization only
+        pass
+
+
+class InventoryModule(BaseInventoryPlugin):
+
+    NAME = 'tc_overcloud'
+
+    def verify_file(self, path):
+        return (super(InventoryModule, self).verify_file(path) and
+                path.endswith(('tc_inventory.yml', 'tc_inventory.yaml')))
+
+    def get_hosts(self):
+        undercloud_env = read_rc_file(self.get_option('undercloud_env_file'))
+        overcloud_env = read_rc_file(self.get_option('osc_env_file'))
+        key = [[env.get(var) for var in CACHE_KEY_VARS]
+               for env in (undercloud_env, overcloud_env)]
+        key.extend([self.get_option('network'), CACHE_VERSION])
+
+        cache_file = self.get_option('cache_file')
+        hosts = load_cache(cache_file, key, self.get_option('cache_ttl'))
+        if hosts is not None:
+            self.display.vvv("Using cached inventory %s" % cache_file)
+            return hosts
+
+        try:
+            servers, agents = run_concurrently(
+                (list_servers, (undercloud_env, self.get_option('network'))),
+                (list_agents, (overcloud_env,)))
+        except Exception as e:
+            raise AnsibleParserError("Failed to list the overcloud nodes "
+                                     "and agents: %s" % e)
+        hosts = build_hosts(servers, merge_agents(agents))
+        save_cache(cache_file, key, hosts)
+        return hosts
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+        self._read_config_data(path)
+
+        self.inventory.add_group(GROUP)
+        for name, host_vars in sorted(self.get_hosts().items()):
+            self.inventory.add_host(name, group=GROUP)
+            self.inventory.set_variable(name, 'ansible_user',
+                                        self.get_option('overcloud_user'))
+            for var, value in host_vars.items():
+                self.inventory.set_variable(name, var, value)
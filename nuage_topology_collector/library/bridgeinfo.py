@@ -14,6 +14,7 @@
 #  under the License.
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.tc_ovs import get_bridge_info
 
 ANSIBLE_METADATA = {
     'metadata_version': '1.0',
@@ -30,7 +31,8 @@ short_description: Query Open vSwitch bridges
 version_added: "2.4"
 
 description:
-    - "Query Open vSwitch bridges"
+    - "Query Open vSwitch bridges, either locally over the OVSDB UNIX
+       socket or remotely through an OVS Manager"
 
 author: Vlad Gridin (vladyslav.gridin@nokia.com)
 
@@ -43,13 +45,29 @@ options:
         default: '6640'
         description:
             - OVS Manager port
+    socket:
+        default: null
+        description:
+            - Path to the local OVSDB UNIX socket. When set, host and port
+              are ignored and no OVS Manager is needed
     bridge_mappings:
         default: {}
         description:
             - Dict of physnet/bridge relations from OVS agent
+    cache_file:
+        default: null
+        description:
+            - Path of a file where the last result is kept together with
+              the Open_vSwitch row uuid, next_cfg and cur_cfg. The cached
+              result is returned as long as none of these nor
+              bridge_mappings changed. Changes made without incrementing
+              next_cfg, e.g. ovs-vsctl --no-wait, are not detected
 '''
 
 EXAMPLES = '''
+- bridgeinfo:
+    socket: /var/run/openvswitch/db.sock
+    bridge_mappings: {'physnet1': 'br-ex'}
 '''
 
 RETURN = '''
@@ -62,82 +80,32 @@ brinfo:
         "eth1": "br-public",
         "eth2": None
     }
+cached:
+    description: Whether brinfo was served from cache_file
+    returned: always
+    type: bool
 '''
 
 
-class OvsdbQuery(object):
-
-    def __init__(self, module):
-        self.module = module
-        self.ovsdbclient = self._get_ovsdb_client(module)
-
-    def _get_ovsdb_client(self, module):
-        try:
-            from ovsdbapp.backend.ovs_idl import command
-            from ovsdbapp.backend.ovs_idl import connection
-            from ovsdbapp.backend.ovs_idl import idlutils
-            from ovsdbapp.schema.open_vswitch import impl_idl
-        except ImportError as e:
-            self.module.log(msg=str(e))
-            self.module.fail_json(msg="ovsdbapp module is required")
-
-        class GetIfaceCommand(command.ReadOnlyCommand):
-            def __init__(self, api, iface):
-                super(GetIfaceCommand, self).__init__(api)
-                self.iface = iface
-
-            def run_idl(self, txn):
-                iface = idlutils.row_by_value(self.api.idl,
-                                              'Interface',
-                                              'name',
-                                              self.iface)
-                self.result = iface
-
-        class TcOvsdbIdl(impl_idl.OvsdbIdl):
-            def __init__(self, connection):
-                super(TcOvsdbIdl, self).__init__(connection)
-
-            def get_iface(self, iface):
-                return GetIfaceCommand(self, iface)
-
-        endpoint = ("tcp:%(host)s:%(port)s" % module.params)
-        client = None
-        try:
-            idl = connection.OvsdbIdl.from_server(endpoint, 'Open_vSwitch')
-            connection = connection.Connection(idl=idl, timeout=3)
-            client = TcOvsdbIdl(connection)
-        except Exception as e:
-            self.module.fail_json(msg=("could not connect to openvswitch. "
-                                       "error: %s") % str(e))
-        return client
-
-    def get_ovs_topology(self):
-        ovs_topology = dict()
-        bridge_mappings = self.module.params['bridge_mappings']
-        bridges = self.ovsdbclient.list_br().execute(check_error=True)
-
-        for br in bridges:
-            if br in bridge_mappings.values():
-                ifaces = self.ovsdbclient.list_ifaces(br).execute(
-                    check_error=True)
-                for ifname in ifaces:
-                    iface = self.ovsdbclient.get_iface(ifname).execute(
-                        check_error=True)
-                    ovs_topology[ifname] = {'bridge': br,
-                                            'type': iface.type}
-        return ovs_topology
+def get_endpoint(params):
+    if params['socket']:
+        return "unix:%(socket)s" % params
+    return "tcp:%(host)s:%(port)s" % params
 
 
 def run_module():
     module_args = dict(
         host=dict(type='str', required=False, default='127.0.0.1'),
         port=dict(type='str', required=False, default='6640'),
-        bridge_mappings=dict(type='dict', required=False, default=dict())
+        socket=dict(type='path', required=False, default=None),
+        bridge_mappings=dict(type='dict', required=False, default=dict()),
+        cache_file=dict(type='path', required=False, default=None)
     )
 
     result = dict(
         changed=False,
-        brinfo=dict()
+        brinfo=dict(),
+        cached=False
     )
 
     module = AnsibleModule(
@@ -148,9 +116,9 @@ def run_module():
     if module.check_mode:
         module.exit_json(**result)
 
-    query = OvsdbQuery(module)
-    bridgeinfo = query.get_ovs_topology()
-    result['brinfo'] = bridgeinfo
+    result['brinfo'], result['cached'] = get_bridge_info(
+        module, get_endpoint(module.params),
+        module.params['bridge_mappings'], module.params['cache_file'])
     module.exit_json(**result)
 
 
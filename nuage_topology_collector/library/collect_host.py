@@ -0,0 +1,269 @@
+#!/usr/bin/python
+#  Copyright 2020 NOKIA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import datetime
+import json
+import re
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.tc_bond import expand_bonds
+from ansible.module_utils.tc_bond import get_aggregate_slaves
+from ansible.module_utils.tc_fingerprint import get_fingerprint
+from ansible.module_utils.tc_lldp import collect_interfaces
+from ansible.module_utils.tc_ovs import get_bridge_info
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: collect_host
+
+short_description: Collect the topology of a compute host in one run
+
+version_added: "2.4"
+
+description:
+    - "Runs on the compute host and does, in a single execution, what
+       the bridgeinfo, linuxbond, lldp and topology modules do: OVS bridge
+       discovery over the local OVSDB socket, bond expansion, interface
+       regex filtering, LLDP capture, VF enumeration and, optionally,
+       LLDP decoding into the per host report entry"
+
+options:
+    service_host:
+        default: ''
+        description:
+            - service_host name of the compute host, written to the report
+    device_mappings:
+        default: null
+        description:
+            - Dict of physnet/interfaces relations from NIC Switch agent
+    bridge_mappings:
+        default: null
+        description:
+            - Dict of physnet/bridge relations from OVS agent. OVS
+              discovery is skipped when not set
+    interface_regex:
+        default: '.*'
+        description:
+            - Regex matched against OVS bridge interface names
+    ovsdb_socket:
+        default: /var/run/openvswitch/db.sock
+        description:
+            - Path to the local OVSDB UNIX socket
+    cache_file:
+        default: null
+        description:
+            - Path of the bridgeinfo cache, see the bridgeinfo module
+    lldp_timeout:
+        default: 30
+        description:
+            - Max time to wait for LLDP packet to arrive
+    decode:
+        default: true
+        description:
+            - Decode LLDP on the host. Needs construct and netaddr on the
+              host; when false, or when those are missing, only the raw
+              LLDP data is returned for the topology module to decode on
+              the controller
+    fingerprint:
+        default: null
+        description:
+            - Fingerprint returned by the previous collection of the host.
+              When the host still has the same fingerprint nothing is
+              collected and unchanged is returned true
+    incremental:
+        default: false
+        description:
+            - Return the fingerprint of the host for its next collection.
+              The fingerprint is only computed in incremental mode or when
+              fingerprint is given, as it reads the OVS state again
+'''
+
+EXAMPLES = '''
+- collect_host:
+    service_host: overcloud-compute-0.localdomain
+    bridge_mappings: {'physnet1': 'br-ex'}
+    device_mappings: {'physnet2': ['ens1f0']}
+    interface_regex: 'en|dpdk'
+'''
+
+RETURN = '''
+interfaces:
+    description: Interfaces LLDP was captured on
+    returned: always
+    type: list
+ovs_bridges:
+    description: Dict with interface to ovs bridge mapping
+    returned: always
+    type: dict
+lldp:
+    description: Raw LLDP and VF information per interface
+    returned: always
+    type: dict
+decoded:
+    description: Whether host_json and stdout hold the decoded entries
+    returned: always
+    type: bool
+fingerprint:
+    description: Digest of the collection inputs, agent mappings, OVS
+                 next_cfg and NIC counters of the host. null when the OVS
+                 state could not be read, or when neither incremental nor
+                 fingerprint were given
+    returned: always
+    type: str
+unchanged:
+    description: Whether fingerprint matched the given one, in which case
+                 nothing was collected
+    returned: always
+    type: bool
+host_json:
+    description: The per host report entry
+    returned: when decoded
+    type: dict
+'''
+
+
+def get_host_fingerprint(module):
+    """Return the fingerprint of the collection inputs of the host"""
+    inputs = dict((param, module.params[param])
+                  for param in ('device_mappings', 'bridge_mappings',
+                                'interface_regex', 'decode'))
+    endpoint = None
+    if module.params['bridge_mappings'] is not None:
+        endpoint = 'unix:' + module.params['ovsdb_socket']
+    return get_fingerprint(inputs, endpoint)
+
+
+def get_interfaces(module):
+    """Return the interfaces to capture on and their OVS bridges"""
+    itfs_from_sriov = list()
+    for devices in (module.params['device_mappings'] or {}).values():
+        if isinstance(devices, list):
+            itfs_from_sriov.extend(devices)
+        else:
+            itfs_from_sriov.append(devices)
+
+    ovs_bridges = dict()
+    bridge_mappings = module.params['bridge_mappings']
+    if bridge_mappings is not None:
+        brinfo, _ = get_bridge_info(module,
+                                    'unix:' + module.params['ovsdb_socket'],
+                                    bridge_mappings,
+                                    module.params['cache_file'])
+        brinfo = expand_bonds(brinfo, get_aggregate_slaves())
+        interface_regex = re.compile(module.params['interface_regex'])
+        ovs_bridges = dict((k, v) for k, v in brinfo.items()
+                           if interface_regex.match(k))
+
+    interfaces = list()
+    for interface in itfs_from_sriov + list(ovs_bridges):
+        if interface not in interfaces:
+            interfaces.append(interface)
+    return interfaces, ovs_bridges
+
+
+def decode(module, itfinfo, ovs_bridges):
+    """Return the report entries, or None when decoding is unavailable"""
+    try:
+        from ansible.module_utils.tc_topology import generate_interfaces_json
+        from ansible.module_utils.tc_topology import LLDPBaseException
+    except ImportError as e:
+        module.log(msg="not decoding LLDP on the host: %s" % str(e))
+        return None
+
+    try:
+        return generate_interfaces_json(itfinfo, ovs_bridges)
+    except LLDPBaseException as e:
+        module.fail_json(msg="Failed to process LLDP data "
+                             "for interface: %s" % e.interface,
+                         stdout=None,
+                         stderr=str(e))
+
+
+def main():
+    arg_spec = dict(
+        service_host=dict(type='str', required=False, default=''),
+        device_mappings=dict(type='dict', required=False, default=None),
+        bridge_mappings=dict(type='dict', required=False, default=None),
+        interface_regex=dict(type='str', required=False, default='.*'),
+        ovsdb_socket=dict(type='path', required=False,
+                          default='/var/run/openvswitch/db.sock'),
+        cache_file=dict(type='path', required=False, default=None),
+        lldp_timeout=dict(type='int', required=False, default=30),
+        decode=dict(type='bool', required=False, default=True),
+        fingerprint=dict(type='str', required=False, default=None),
+        incremental=dict(type='bool', required=False, default=False)
+    )
+
+    module = AnsibleModule(argument_spec=arg_spec)
+
+    startd = datetime.datetime.now()
+
+    fingerprint = None
+    if module.params['incremental'] or module.params['fingerprint']:
+        fingerprint = get_host_fingerprint(module)
+    if fingerprint is not None and \
+            fingerprint == module.params['fingerprint']:
+        end = datetime.datetime.now()
+        module.exit_json(start=str(startd),
+                         end=str(end),
+                         delta=str(end - startd),
+                         interfaces=[],
+                         ovs_bridges={},
+                         lldp={},
+                         decoded=False,
+                         fingerprint=fingerprint,
+                         unchanged=True,
+                         changed=False)
+
+    interfaces, ovs_bridges = get_interfaces(module)
+    itfinfo = collect_interfaces(interfaces, module, ovs_bridges,
+                                 module.params['lldp_timeout'])
+    result = dict(
+        interfaces=interfaces,
+        ovs_bridges=ovs_bridges,
+        lldp=itfinfo,
+        decoded=False,
+        fingerprint=fingerprint,
+        unchanged=False,
+        changed=True
+    )
+
+    itf_list = None
+    if module.params['decode']:
+        itf_list = decode(module, itfinfo, ovs_bridges)
+    if itf_list is not None:
+        result.update(
+            decoded=True,
+            host_json={
+                'service_host name': module.params['service_host'],
+                'interfaces': itf_list
+            },
+            stdout=json.dumps(itf_list, indent=4))
+
+    end = datetime.datetime.now()
+    module.exit_json(start=str(startd),
+                     end=str(end),
+                     delta=str(end - startd),
+                     **result)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,9 +13,9 @@
 #  License for the specific language governing permissions and limitations
 #  under the License.
 
-import re
-
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.tc_bond import expand_bonds
+from ansible.module_utils.tc_bond import get_aggregate_slaves
 
 ANSIBLE_METADATA = {
     'metadata_version': '1.0',
@@ -32,7 +32,7 @@ short_description: Query linux bonds
 version_added: "2.4"
 
 description:
-    - "Query linux bonds"
+    - "Query linux bond and team devices, including nested bonds"
 
 author: Vlad Gridin (vladyslav.gridin@nokia.com)
 
@@ -59,19 +59,6 @@ brinfo:
 '''
 
 
-def check_linux_bond(iface):
-    slaves = list()
-    try:
-        bond = open('/proc/net/bonding/%s' % iface).read()
-        for line in bond.splitlines():
-            m = re.match('^Slave Interface: (.*)', line)
-            if m:
-                slaves.append(m.groups()[0])
-    except IOError:
-        pass
-    return slaves
-
-
 def run_module():
     module_args = dict(
         brinfo=dict(type='dict', required=False, default=dict())
@@ -90,15 +77,8 @@ def run_module():
     if module.check_mode:
         module.exit_json(**result)
 
-    bridgeinfo = dict()
-    for k, v in module.params['brinfo'].items():
-        bridgeinfo[k] = v
-        slaves = check_linux_bond(k)
-        for slave in slaves:
-            bridgeinfo[slave] = {'bridge': v.get('bridge'),
-                                 'type': None}
-
-    result['brinfo'] = bridgeinfo
+    result['brinfo'] = expand_bonds(module.params['brinfo'],
+                                    get_aggregate_slaves())
     module.exit_json(**result)
 
 
@@ -0,0 +1,112 @@
+#!/usr/bin/python
+#  Copyright 2020 NOKIA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import datetime
+import socket
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.tc_preflight import probe_ssh
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: ssh_preflight
+
+short_description: Check that the SSH server of many hosts answers
+
+version_added: "2.4"
+
+description:
+    - "Runs on the controller and probes the SSH port of all hosts at
+       once, checking the SSH banner. The soft limit of open files is
+       raised to the hard one, and beyond what it allows the hosts are
+       probed as sockets free up"
+
+options:
+    hosts:
+        required: true
+        description:
+            - Dict of inventory host name to address
+    port:
+        default: 22
+        description:
+            - SSH port of the hosts
+    timeout:
+        default: 30
+        description:
+            - Seconds given to each host, the whole probe when the hosts
+              fit in the open files limit
+    banner:
+        default: OpenSSH
+        description:
+            - Text the SSH identification string must contain
+'''
+
+EXAMPLES = '''
+- ssh_preflight:
+    hosts:
+      overcloud-compute-0: 192.168.24.20
+      overcloud-compute-1: 192.168.24.21
+    timeout: 10
+'''
+
+RETURN = '''
+reachable_hosts:
+    description: Sorted names of the hosts that answered
+    returned: always
+    type: list
+unreachable_hosts:
+    description: Dict of unreachable host name to reason
+    returned: always
+    type: dict
+'''
+
+
+def main():
+    arg_spec = dict(
+        hosts=dict(type='dict', required=True),
+        port=dict(type='int', required=False, default=22),
+        timeout=dict(type='float', required=False, default=30),
+        banner=dict(type='str', required=False, default='OpenSSH')
+    )
+
+    module = AnsibleModule(argument_spec=arg_spec)
+
+    startd = datetime.datetime.now()
+
+    hosts = dict((name, (address, module.params['port']))
+                 for name, address in module.params['hosts'].items())
+    try:
+        unreachable = probe_ssh(hosts, module.params['timeout'],
+                                module.params['banner'])
+    except (socket.error, OSError) as e:
+        module.fail_json(msg="Could not open the probe sockets: %s" % e)
+
+    end = datetime.datetime.now()
+    module.exit_json(start=str(startd),
+                     end=str(end),
+                     delta=str(end - startd),
+                     reachable_hosts=sorted(set(hosts) - set(unreachable)),
+                     unreachable_hosts=unreachable,
+                     changed=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+#  Copyright 2020 NOKIA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import datetime
+import json
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.tc_report import host_files
+from ansible.module_utils.tc_report import write_report
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = '''
+---
+module: topology_report
+
+short_description: Merge the per host topology files into one report
+
+version_added: "2.4"
+
+description:
+    - "Streams the JSON file of every compute host found in src into the
+       report dest, one host at a time. Hosts that are not valid JSON or
+       do not match the compute-host definition of the schema are left
+       out and listed under skipped-hosts. Hosts that had a .unreachable
+       file written are listed under unreachable-hosts"
+
+options:
+    src:
+        required: true
+        description:
+            - Directory holding the <host>.json and <host>.unreachable files
+    dest:
+        required: true
+        description:
+            - Path of the report
+    schema:
+        required: true
+        description:
+            - Path of topo-collect-schema.json
+    datetime:
+        required: true
+        description:
+            - Date and time of the report
+'''
+
+EXAMPLES = '''
+- topology_report:
+    src: /var/tmp/topo-coll/tmp
+    dest: /var/tmp/topo-coll/output/topo-coll.2020-01-01@00:00:00.json
+    schema: schema/topo-collect-schema.json
+    datetime: 2020-01-01@00:00:00
+'''
+
+RETURN = '''
+hosts:
+    description: Number of compute hosts in the report
+    returned: success
+    type: int
+skipped_hosts:
+    description: Dict of skipped host name to reason
+    returned: success
+    type: dict
+'''
+
+
+def main():
+    arg_spec = dict(
+        src=dict(type='path', required=True),
+        dest=dict(type='path', required=True),
+        schema=dict(type='path', required=True),
+        datetime=dict(type='str', required=True)
+    )
+
+    module = AnsibleModule(argument_spec=arg_spec)
+
+    startd = datetime.datetime.now()
+
+    src = module.params['src']
+    if not os.path.isdir(src):
+        module.fail_json(msg='%s is not a directory' % src)
+    if not host_files(src):
+        module.fail_json(msg='No json files found in %s' % src)
+    try:
+        with open(module.params['schema']) as schema_file:
+            schema = json.load(schema_file)
+    except (IOError, OSError, ValueError) as e:
+        module.fail_json(msg='Cannot load the schema: %s' % e)
+
+    try:
+        count, skipped = write_report(src, module.params['dest'], schema,
+                                      module.params['datetime'])
+    except (IOError, OSError) as e:
+        module.fail_json(msg='Cannot write the report: %s' % e)
+
+    end = datetime.datetime.now()
+    module.exit_json(start=str(startd),
+                     end=str(end),
+                     delta=str(end - startd),
+                     hosts=count,
+                     skipped_hosts=skipped,
+                     changed=True)
+
+
+if __name__ == '__main__':
+    main()
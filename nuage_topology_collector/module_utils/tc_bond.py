@@ -0,0 +1,74 @@
+#  Copyright 2020 NOKIA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import os
+
+SYS_CLASS_NET = '/sys/class/net'
+
+
+def get_aggregate_slaves(sys_class_net=SYS_CLASS_NET):
+    """Map every bond and team device to its slaves in one sysfs walk.
+
+    Bond slaves come from <dev>/bonding/slaves, which keeps the bond's own
+    ordering. Team and any other enslaved devices are found through their
+    <dev>/master link. Linux bridges are not aggregates and are left out.
+
+    :param sys_class_net: sysfs net class directory
+    :return: dict of master name to list of slave names
+    """
+    masters = dict()
+    bridges = set()
+    enslaved = list()
+    for dev in sorted(os.listdir(sys_class_net)):
+        dev_path = os.path.join(sys_class_net, dev)
+        try:
+            with open(os.path.join(dev_path, 'bonding', 'slaves')) as slaves:
+                masters[dev] = slaves.read().split()
+        except (IOError, OSError):
+            pass
+        if os.path.isdir(os.path.join(dev_path, 'bridge')):
+            bridges.add(dev)
+        master_link = os.path.join(dev_path, 'master')
+        if os.path.islink(master_link):
+            master = os.path.basename(os.readlink(master_link))
+            enslaved.append((master, dev))
+
+    for master, dev in enslaved:
+        if master in bridges:
+            continue
+        slaves = masters.setdefault(master, [])
+        if dev not in slaves:
+            slaves.append(dev)
+    return masters
+
+
+def expand_bonds(brinfo, masters):
+    """Add the slaves of every bond or team in brinfo, nested ones included.
+
+    Slaves inherit the bridge of the top level interface and have no type.
+    """
+    bridgeinfo = dict()
+    for k, v in brinfo.items():
+        bridgeinfo[k] = v
+        seen = set([k])
+        pending = list(masters.get(k, []))
+        while pending:
+            slave = pending.pop(0)
+            if slave in seen:
+                continue
+            seen.add(slave)
+            bridgeinfo[slave] = {'bridge': v.get('bridge'),
+                                 'type': None}
+            pending.extend(masters.get(slave, []))
+    return bridgeinfo
@@ -0,0 +1,79 @@
+#  Copyright 2020 NOKIA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import hashlib
+import json
+import os
+
+from ansible.module_utils.tc_bond import get_aggregate_slaves
+from ansible.module_utils.tc_bond import SYS_CLASS_NET
+from ansible.module_utils.tc_ovs import get_ovs_cfg_state
+
+# bumped whenever the collected data changes for the same inputs
+FINGERPRINT_VERSION = 1
+# sysfs attributes that change when a NIC is replaced, re-created,
+# re-cabled or re-partitioned. Traffic counters are left out on purpose,
+# they change all the time.
+NETDEV_COUNTERS = ('ifindex', 'carrier_changes', 'device/sriov_numvfs')
+
+
+def get_netdev_state(sys_class_net=SYS_CLASS_NET):
+    """Return the counters of every physical function netdev.
+
+    Virtual devices and VFs come and go with the instances on the host and
+    are left out.
+
+    :param sys_class_net: sysfs net class directory
+    :return: dict of netdev name to list of counter values
+    """
+    state = dict()
+    for dev in sorted(os.listdir(sys_class_net)):
+        dev_path = os.path.join(sys_class_net, dev)
+        if (not os.path.exists(os.path.join(dev_path, 'device')) or
+                os.path.exists(os.path.join(dev_path, 'device', 'physfn'))):
+            continue
+        values = list()
+        for counter in NETDEV_COUNTERS:
+            try:
+                with open(os.path.join(dev_path, counter)) as f:
+                    values.append(f.read().strip())
+            except (IOError, OSError):
+                values.append(None)
+        state[dev] = values
+    return state
+
+
+def get_fingerprint(inputs, endpoint=None, sys_class_net=SYS_CLASS_NET):
+    """Return a digest of everything the collection of a host depends on.
+
+    :param inputs: the collection parameters, agent mappings included
+    :param endpoint: ovsdb-server connection string, None when the host
+                     has no OVS agent
+    :param sys_class_net: sysfs net class directory
+    :return: hex digest, or None when the OVS state cannot be read
+    """
+    state = {
+        'version': FINGERPRINT_VERSION,
+        'inputs': inputs,
+        'netdevs': get_netdev_state(sys_class_net),
+        'aggregates': get_aggregate_slaves(sys_class_net)
+    }
+    if endpoint:
+        try:
+            cfg = get_ovs_cfg_state(endpoint)
+        except Exception:
+            return None
+        state['ovs'] = [cfg['uuid'], cfg['next_cfg']]
+    return hashlib.sha256(
+        json.dumps(state, sort_keys=True).encode('utf-8')).hexdigest()
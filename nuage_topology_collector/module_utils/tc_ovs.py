@@ -0,0 +1,201 @@
+#  Copyright 2020 NOKIA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import json
+import os
+import tempfile
+
+# Open_vSwitch columns needed to map interfaces to bridges. Registering
+# only these keeps the initial IDL sync from downloading and monitoring
+# every other table and column, interface statistics included.
+OVSDB_SCHEMA_COLUMNS = {
+    'Bridge': ['name', 'ports'],
+    'Port': ['name', 'interfaces'],
+    'Interface': ['name', 'type'],
+}
+
+
+def get_schema_helper(endpoint, columns=None):
+    """Return an Open_vSwitch schema helper for the given columns only.
+
+    :param endpoint: ovsdb-server connection string
+    :param columns: dict of table name to list of column names,
+                    OVSDB_SCHEMA_COLUMNS by default
+    """
+    from ovsdbapp.backend.ovs_idl import idlutils
+
+    helper = idlutils.get_schema_helper(endpoint, 'Open_vSwitch')
+    for table, table_columns in (columns or OVSDB_SCHEMA_COLUMNS).items():
+        helper.register_columns(table, table_columns)
+    return helper
+
+
+def get_ovs_cfg_state(endpoint):
+    """Return the Open_vSwitch row uuid, next_cfg and cur_cfg.
+
+    Issued as a single select so that an unchanged database can be
+    detected without syncing an IDL.
+
+    :param endpoint: ovsdb-server connection string
+    """
+    from ovs import jsonrpc
+    from ovs import stream
+
+    err, strm = stream.Stream.open_block(stream.Stream.open(endpoint))
+    if err:
+        raise IOError(err, os.strerror(err))
+    rpc = jsonrpc.Connection(strm)
+    try:
+        req = jsonrpc.Message.create_request('transact', [
+            'Open_vSwitch',
+            {'op': 'select',
+             'table': 'Open_vSwitch',
+             'where': [],
+             'columns': ['_uuid', 'next_cfg', 'cur_cfg']}])
+        err, resp = rpc.transact_block(req)
+    finally:
+        rpc.close()
+    if err:
+        raise IOError(err, os.strerror(err))
+    if resp.error:
+        raise IOError(resp.error)
+    reply = resp.result[0]
+    if 'error' in reply:
+        raise IOError(reply['error'])
+    if len(reply['rows']) != 1:
+        raise IOError('expected one Open_vSwitch row, got %d' %
+                      len(reply['rows']))
+    row = reply['rows'][0]
+    return {
+        'uuid': row['_uuid'][1],
+        'next_cfg': row['next_cfg'],
+        'cur_cfg': row['cur_cfg']
+    }
+
+
+def load_cache(path, key):
+    """Return the cached brinfo if it was stored under key, else None"""
+    try:
+        with open(path) as cache_file:
+            cache = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get('key') != key:
+        return None
+    return cache.get('brinfo')
+
+
+def save_cache(path, key, brinfo):
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname, 0o700)
+    fd, tmp_path = tempfile.mkstemp(dir=dirname)
+    with os.fdopen(fd, 'w') as cache_file:
+        json.dump({'key': key, 'brinfo': brinfo}, cache_file)
+    os.rename(tmp_path, path)
+
+
+class OvsdbQuery(object):
+
+    def __init__(self, module, endpoint, bridge_mappings):
+        self.module = module
+        self.endpoint = endpoint
+        self.bridge_mappings = bridge_mappings
+        self.ovsdbclient = self._get_ovsdb_client()
+
+    def _get_ovsdb_client(self):
+        try:
+            from ovsdbapp.backend.ovs_idl import command
+            from ovsdbapp.backend.ovs_idl import connection
+            from ovsdbapp.backend.ovs_idl import idlutils
+            from ovsdbapp.schema.open_vswitch import impl_idl
+        except ImportError as e:
+            self.module.log(msg=str(e))
+            self.module.fail_json(msg="ovsdbapp module is required")
+
+        class GetIfaceCommand(command.ReadOnlyCommand):
+            def __init__(self, api, iface):
+                super(GetIfaceCommand, self).__init__(api)
+                self.iface = iface
+
+            def run_idl(self, txn):
+                iface = idlutils.row_by_value(self.api.idl,
+                                              'Interface',
+                                              'name',
+                                              self.iface)
+                self.result = iface
+
+        class TcOvsdbIdl(impl_idl.OvsdbIdl):
+            def __init__(self, connection):
+                super(TcOvsdbIdl, self).__init__(connection)
+
+            def get_iface(self, iface):
+                return GetIfaceCommand(self, iface)
+
+        client = None
+        try:
+            idl = connection.OvsdbIdl(self.endpoint,
+                                      get_schema_helper(self.endpoint))
+            connection = connection.Connection(idl=idl, timeout=3)
+            client = TcOvsdbIdl(connection)
+        except Exception as e:
+            self.module.fail_json(msg=("could not connect to openvswitch. "
+                                       "error: %s") % str(e))
+        return client
+
+    def get_ovs_topology(self):
+        ovs_topology = dict()
+        bridges = self.ovsdbclient.list_br().execute(check_error=True)
+
+        for br in bridges:
+            if br in self.bridge_mappings.values():
+                ifaces = self.ovsdbclient.list_ifaces(br).execute(
+                    check_error=True)
+                for ifname in ifaces:
+                    iface = self.ovsdbclient.get_iface(ifname).execute(
+                        check_error=True)
+                    ovs_topology[ifname] = {'bridge': br,
+                                            'type': iface.type}
+        return ovs_topology
+
+
+def get_bridge_info(module, endpoint, bridge_mappings, cache_file=None):
+    """Return the bridge info and whether it came from the cache
+
+    :param module: the AnsibleModule used for logging and failing
+    :param endpoint: ovsdb-server connection string
+    :param bridge_mappings: dict of physnet/bridge relations
+    :param cache_file: optional path of the bridge info cache
+    """
+    key = None
+    if cache_file:
+        try:
+            key = get_ovs_cfg_state(endpoint)
+        except Exception as e:
+            module.log(msg="could not read Open_vSwitch configuration "
+                           "state, not using cache: %s" % str(e))
+        else:
+            key['bridge_mappings'] = bridge_mappings
+            brinfo = load_cache(cache_file, key)
+            if brinfo is not None:
+                return brinfo, True
+
+    brinfo = OvsdbQuery(module, endpoint,
+                        bridge_mappings).get_ovs_topology()
+    if key:
+        try:
+            save_cache(cache_file, key, brinfo)
+        except (IOError, OSError) as e:
+            module.log(msg="could not write %s: %s" % (cache_file, str(e)))
+    return brinfo, False
@@ -0,0 +1,183 @@
+#  Copyright 2020 NOKIA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import errno
+import os
+import select
+import socket
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# RFC 4253 allows other lines before the identification string, but not
+# more than fits a sane server greeting
+MAX_GREETING = 4096
+# file descriptors left to the rest of the process while probing
+FD_HEADROOM = 64
+# sockets open at once when the open files limit is unknown or unlimited
+DEFAULT_WINDOW = 1024
+
+
+class _Probe(object):
+
+    def __init__(self, name, sock, deadline):
+        self.name = name
+        self.sock = sock
+        self.deadline = deadline
+        self.connected = False
+        self.data = b''
+
+
+def _connect(address, port):
+    """Start a non blocking connect, return the socket"""
+    family, socktype, proto, _, sockaddr = socket.getaddrinfo(
+        address, port, 0, socket.SOCK_STREAM)[0]
+    sock = socket.socket(family, socktype, proto)
+    sock.setblocking(0)
+    err = sock.connect_ex(sockaddr)
+    if err not in (0, errno.EINPROGRESS, errno.EAGAIN):
+        sock.close()
+        raise socket.error(err, os.strerror(err))
+    return sock
+
+
+def _check_greeting(data, banner):
+    """Return None while incomplete, '' when valid, the error otherwise"""
+    lines = data.split(b'\n')
+    for line in lines[:-1]:
+        line = line.strip()
+        if line.startswith(b'SSH-'):
+            if banner.encode('utf-8') in line:
+                return ''
+            return 'unexpected SSH banner %r' % line.decode('utf-8',
+                                                            'replace')
+    if len(data) >= MAX_GREETING:
+        return 'no SSH banner received'
+    return None
+
+
+def fd_window():
+    """Return how many probe sockets may be open at once.
+
+    The soft limit of open files is raised to the hard one first, then
+    FD_HEADROOM descriptors are left to the rest of the process.
+    """
+    if resource is None:
+        return DEFAULT_WINDOW
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard and hard != resource.RLIM_INFINITY:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    if soft == resource.RLIM_INFINITY:
+        return DEFAULT_WINDOW
+    return max(1, soft - FD_HEADROOM)
+
+
+def probe_ssh(hosts, timeout, banner='OpenSSH', window=None):
+    """Probe the SSH server of many hosts at once.
+
+    Up to window connections are in flight together, driven from a single
+    poll loop, and each host gets timeout seconds from its connect. With
+    no more hosts than the window, the whole probe takes at most timeout
+    seconds, however many hosts there are. A host is reachable once it
+    sent an SSH identification string containing banner.
+
+    Running out of file descriptors is an error of this process, not of
+    the hosts: the window then shrinks to the sockets open, and the error
+    is raised when not a single socket can be opened.
+
+    :param hosts: dict of host name to (address, port)
+    :param timeout: seconds given to each host
+    :param banner: text the SSH identification string must contain
+    :param window: connections in flight at most, fd_window() when None
+    :return: dict of unreachable host name to reason
+    """
+    if window is None:
+        window = fd_window()
+    pending = list(hosts.items())
+    pending.reverse()
+    unreachable = dict()
+    probes = dict()
+    poller = select.poll()
+
+    def start():
+        window_size = window
+        while pending and len(probes) < window_size:
+            name, (address, port) = pending.pop()
+            try:
+                sock = _connect(address, port)
+            except (socket.error, socket.gaierror) as e:
+                if getattr(e, 'errno', None) in (errno.EMFILE,
+                                                 errno.ENFILE):
+                    pending.append((name, (address, port)))
+                    if not probes:
+                        raise
+                    window_size = len(probes)
+                    continue
+                unreachable[name] = str(e)
+                continue
+            probes[sock.fileno()] = _Probe(name, sock,
+                                           time.time() + timeout)
+            poller.register(sock, select.POLLOUT)
+        return window_size
+
+    def finish(fd, error=None):
+        probe = probes.pop(fd)
+        poller.unregister(fd)
+        probe.sock.close()
+        if error:
+            unreachable[probe.name] = error
+
+    window = start()
+    while probes:
+        now = time.time()
+        for fd in [fd for fd, probe in probes.items()
+                   if probe.deadline <= now]:
+            finish(fd, 'timed out' if probes[fd].connected else
+                   'timed out connecting')
+        if not probes:
+            window = start()
+            continue
+        remaining = min(probe.deadline for probe in probes.values()) - now
+        for fd, _ in poller.poll(remaining * 1000):
+            probe = probes[fd]
+            if not probe.connected:
+                err = probe.sock.getsockopt(socket.SOL_SOCKET,
+                                            socket.SO_ERROR)
+                if err:
+                    finish(fd, os.strerror(err))
+                else:
+                    probe.connected = True
+                    poller.modify(fd, select.POLLIN)
+                continue
+            try:
+                data = probe.sock.recv(MAX_GREETING)
+            except socket.error as e:
+                finish(fd, str(e))
+                continue
+            if not data:
+                finish(fd, 'connection closed before the SSH banner')
+                continue
+            probe.data += data
+            error = _check_greeting(probe.data, banner)
+            if error is not None:
+                finish(fd, error)
+        window = start()
+    return unreachable
@@ -0,0 +1,148 @@
+#  Copyright 2020 NOKIA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+import json
+import os
+import tempfile
+
+try:
+    string_types = (str, unicode)
+except NameError:
+    string_types = (str,)
+
+HOST_SUFFIX = '.json'
+UNREACHABLE_SUFFIX = '.unreachable'
+HOST_DEFINITION = '#/definitions/compute-host'
+# indent of a compute host inside the report
+HOST_INDENT = ' ' * 8
+
+JSON_TYPES = {
+    'object': (dict,),
+    'array': (list,),
+    'string': string_types,
+    'integer': (int,),
+    'number': (int, float),
+    'boolean': (bool,),
+    'null': (type(None),)
+}
+
+
+def resolve(schema, ref):
+    """Return the part of schema a local $ref like #/definitions/x names"""
+    if not ref.startswith('#'):
+        raise ValueError('only local references are supported: %s' % ref)
+    node = schema
+    for part in ref[1:].split('/'):
+        if part:
+            node = node[part]
+    return node
+
+
+def validate(instance, schema, node=None, path=''):
+    """Return the first error of instance against node of schema.
+
+    Only the draft-04 keywords topo-collect-schema.json uses are checked:
+    $ref to the schema itself, type, properties, required and items.
+
+    :return: the error message, None when instance is valid
+    """
+    if node is None:
+        node = schema
+    if '$ref' in node:
+        return validate(instance, schema, resolve(schema, node['$ref']),
+                        path)
+
+    expected = node.get('type')
+    if expected:
+        types = JSON_TYPES[expected]
+        # bool is an int in python, but not a JSON number
+        if not isinstance(instance, types) or \
+                (isinstance(instance, bool) and bool not in types):
+            return '%s is not of type %s' % (path or 'document', expected)
+
+    if isinstance(instance, dict):
+        for key in node.get('required', ()):
+            if key not in instance:
+                return '%s misses %r' % (path or 'document', key)
+        for key, subnode in node.get('properties', {}).items():
+            if key in instance:
+                error = validate(instance[key], schema, subnode,
+                                 '%s/%s' % (path, key))
+                if error:
+                    return error
+    elif isinstance(instance, list) and 'items' in node:
+        for index, item in enumerate(instance):
+            error = validate(item, schema, node['items'],
+                             '%s/%d' % (path, index))
+            if error:
+                return error
+    return None
+
+
+def host_files(src_dir, suffix=HOST_SUFFIX):
+    """Return the sorted names of the files of src_dir ending in suffix"""
+    return sorted(name for name in os.listdir(src_dir)
+                  if name.endswith(suffix))
+
+
+def write_report(src_dir, dest, schema, datetime):
+    """Stream the host files of src_dir into the report dest.
+
+    Hosts are read, checked against the compute-host definition of schema
+    and written one at a time, so memory use is bounded by the largest
+    host file. A host file that is not valid JSON or does not match the
+    schema is left out of the report and listed under skipped-hosts. The
+    report replaces dest atomically.
+
+    :return: (number of hosts written, dict of skipped host to reason)
+    """
+    host_node = resolve(schema, HOST_DEFINITION)
+    unreachable = [name[:-len(UNREACHABLE_SUFFIX)] for name in
+                   host_files(src_dir, UNREACHABLE_SUFFIX)]
+    skipped = dict()
+    count = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest) or '.')
+    try:
+        with os.fdopen(fd, 'w') as report:
+            report.write('{\n    "datetime": %s,\n'
+                         '    "unreachable-hosts": %s,\n'
+                         '    "compute-hosts": [' %
+                         (json.dumps(datetime), json.dumps(unreachable)))
+            for name in host_files(src_dir, HOST_SUFFIX):
+                host = name[:-len(HOST_SUFFIX)]
+                try:
+                    with open(os.path.join(src_dir, name)) as host_file:
+                        document = json.load(host_file)
+                except ValueError as e:
+                    skipped[host] = 'invalid JSON: %s' % e
+                    continue
+                error = validate(document, schema, host_node)
+                if error:
+                    skipped[host] = error
+                    continue
+                text = json.dumps(document, indent=4)
+                report.write('%s\n%s%s' % (
+                    ',' if count else '', HOST_INDENT,
+                    text.replace('\n', '\n' + HOST_INDENT)))
+                count += 1
+            report.write('\n    ],\n    "skipped-hosts": %s\n}\n' %
+                         json.dumps(skipped, indent=4, sort_keys=True)
+                         .replace('\n', '\n    '))
+        os.chmod(tmp_path, 0o644)
+        os.rename(tmp_path, dest)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return count, skipped
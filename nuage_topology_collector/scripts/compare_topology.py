@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
-import json
+import argparse
+import itertools
 import os
 import sys
 
@@ -10,13 +11,25 @@ import sys
 #      python package. This will be worked on in a subsequent release.
 try:
     from .helper import constants
+    from .helper.host_filter import add_limit_argument
+    from .helper.host_filter import HostFilter
+    from .helper.json_stream import iter_items
+    from .helper.mapping_mirror import add_mirror_arguments
+    from .helper.mapping_mirror import MappingMirror
+    from .helper import topology_diff
     from .helper.utils import Utils
 except (ImportError, ValueError):
     from helper import constants
+    from helper.host_filter import add_limit_argument
+    from helper.host_filter import HostFilter
+    from helper.json_stream import iter_items
+    from helper.mapping_mirror import add_mirror_arguments
+    from helper.mapping_mirror import MappingMirror
+    from helper import topology_diff
     from helper.utils import Utils
 
 
-def create_old_report():
+def neutron_client_factory():
     # TODO(OPENSTACK-2892) :
     #      This is temporary code for dealing with py2/py3 compatibility and
     #      have unit tests pass, while the production code isn't deployed as a
@@ -26,56 +39,99 @@ def create_old_report():
     except (ImportError, ValueError):
         from helper.osclient import NeutronClient
 
-    neutron_client = NeutronClient()
-    neutron_client.authenticate()
-    sw_maps = neutron_client.get_switchport_mapping()
-    return sw_maps["switchport_mappings"]
-
+    return NeutronClient().authenticate()
 
-def generate_new_report_map(new_report_json):
-    new_report_map = {}
-    for compute in new_report_json["compute-hosts"]:
-        for interface in compute["interfaces"]:
-            for vf in interface["vf_info"]:
-                new_report_map[(compute["service_host name"], vf["pci-id"])] \
-                    = (interface["neighbor-system-mgmt-ip"],
-                       interface["neighbor-system-port"])
-
-    return new_report_map
 
+def create_old_report(host_ids=None):
+    neutron_client = neutron_client_factory()
+    if host_ids is None:
+        sw_maps = neutron_client.get_switchport_mapping()
+    else:
+        sw_maps = neutron_client.get_switchport_mappings_for_hosts(host_ids)
+    return sw_maps["switchport_mappings"]
 
-def print_tuple(pair):
-    return ", ".join(str(x) for x in pair)
 
+def stream_old_report(host_ids=None):
+    """Yield the imported mappings page by page, sorted for a merge join"""
+    neutron_client = neutron_client_factory()
+    if host_ids is None:
+        return neutron_client.iter_switchport_mappings()
+    return itertools.chain.from_iterable(
+        neutron_client.iter_switchport_mappings(host_id=host_id)
+        for host_id in sorted(host_ids, key=lambda host_id: (
+            host_id.upper(), host_id)))
 
-def compare_reports(old_report_json, new_report_map):
-    for port in old_report_json:
-        new_port_info = new_report_map.pop((port["host_id"],
-                                            port["pci_slot"]), None)
-        if new_port_info is None:
-            print("Port deleted : " + print_tuple((port["host_id"],
-                  port["pci_slot"])) + "\n")
-        elif new_port_info != (port["switch_id"], port["port_id"]):
-            print("Port Modified : "
-                  "" + print_tuple((port["host_id"], port["pci_slot"])))
-            print(print_tuple((port["switch_id"], port["port_id"])) + " ===> "
-                  "" + print_tuple(new_port_info) + "\n")
 
-    for port in new_report_map.keys():
-        print("New Port added: " + print_tuple(port) + " ===> "
-              "" + print_tuple(new_report_map[port]) + "\n")
+def mirrored_old_report(host_ids=None, full_sync=False, max_age=None):
+    """Yield the imported mappings from the local mirror, refreshed first"""
+    mirror = MappingMirror(constants.MIRROR_FILE)
+    try:
+        mirror.refresh(neutron_client_factory(), full_sync, max_age)
+        for mapping in mirror.mappings(host_ids):
+            yield mapping
+    finally:
+        mirror.close()
+
+
+def selected_hosts(report, host_filter):
+    """Yield the compute hosts of the report host_filter matches"""
+    for compute in iter_items(report, "compute-hosts"):
+        if host_filter is None or \
+                host_filter.match(compute["service_host name"]):
+            yield compute
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description="Compare a topology report with the topology imported "
+                    "in neutron")
+    parser.add_argument('report', help="path of the new report")
+    parser.add_argument('--format', default='text',
+                        choices=topology_diff.FORMATS,
+                        help="text for people, json or ndjson for "
+                             "topology_import.py --diff")
+    parser.add_argument('--stream', default=False, action='store_true',
+                        help="page through the neutron mappings sorted, and "
+                             "merge them with the sorted report, in bounded "
+                             "memory")
+    parser.add_argument('--base', default=None, metavar='OLD_REPORT',
+                        help="compare with this older report instead of "
+                             "neutron, without any API call")
+    add_mirror_arguments(parser)
+    add_limit_argument(parser)
+    return parser
+
+
+def compare_with_base(new_report, base_report, host_filter,
+                      output_format):
+    """Diff two reports, by compute host and VF PCI address or PF name"""
+    diff = topology_diff.TopologyDiff(topology_diff.report_mappings(
+        selected_hosts(new_report, host_filter)))
+    topology_diff.write_diff(
+        diff,
+        topology_diff.base_mappings(selected_hosts(base_report, host_filter)),
+        sys.stdout, output_format)
 
 
 def main(argv):
-    if len(sys.argv) != 2:
-        sys.stdout.write("Please pass the new report as an argument.\n")
-        sys.exit(1)
-
-    new_report = argv[1]
-
-    if not os.path.exists(new_report):
-        sys.stdout.write("ERROR: The report %s does not exist.\n" % argv[1])
-        sys.exit(1)
+    parser = create_parser()
+    options = parser.parse_args(argv[1:])
+    new_report = options.report
+    if options.base is not None and options.stream:
+        parser.error("--stream pages through neutron, it does not apply to "
+                     "--base")
+
+    for report in (new_report, options.base):
+        if report is not None and not os.path.exists(report):
+            sys.stdout.write("ERROR: The report %s does not exist.\n" %
+                             report)
+            sys.exit(1)
+
+    host_filter = HostFilter(options.limit) if options.limit else None
+    if options.base is not None:
+        compare_with_base(new_report, options.base, host_filter,
+                          options.format)
+        return
 
     if not Utils.check_user(constants.STACK_USER):
         sys.stdout.write("ERROR: Run the script as %s "
@@ -89,18 +145,47 @@ def main(argv):
 
     Utils.source_rc_files(constants.OVERCLOUDRC_FILE)
 
-    with open(new_report) as new_report_data:
-        new_report_json = json.load(new_report_data)
-
-    new_report_map = generate_new_report_map(new_report_json)
-
-    old_report_json = create_old_report()
-
-    if not old_report_json:
+    host_ids = None
+    if host_filter is not None:
+        # hosts named in the limit but gone from the report may still have
+        # mappings to report as deleted
+        host_ids = sorted(
+            set(compute["service_host name"] for compute in
+                selected_hosts(new_report, host_filter)) |
+            set(host_filter.names))
+    new_mappings = topology_diff.report_mappings(
+        selected_hosts(new_report, host_filter))
+    if options.mirror:
+        # the mirror lists the mappings sorted as well
+        diff = (topology_diff.SortedTopologyDiff(new_mappings)
+                if options.stream else
+                topology_diff.TopologyDiff(new_mappings))
+        old_report_json = mirrored_old_report(host_ids, options.full_sync,
+                                              options.mirror_max_age)
+    elif options.stream:
+        diff = topology_diff.SortedTopologyDiff(new_mappings)
+        old_report_json = stream_old_report(host_ids)
+    else:
+        diff = topology_diff.TopologyDiff(new_mappings)
+        old_report_json = create_old_report(host_ids)
+    if host_filter is not None:
+        old_report_json = (port for port in old_report_json
+                           if host_filter.match(port["host_id"]))
+
+    old_report_json = iter(old_report_json)
+    first_port = next(old_report_json, None)
+    if first_port is None and options.format == 'text':
         sys.stdout.write("No existing imported topology.\n")
         return
+    if first_port is not None:
+        old_report_json = itertools.chain([first_port], old_report_json)
 
-    compare_reports(old_report_json, new_report_map)
+    try:
+        topology_diff.write_diff(diff, old_report_json, sys.stdout,
+                                 options.format)
+    except topology_diff.UnsortedMappingsError as e:
+        sys.stdout.write("ERROR: %s, compare without --stream.\n" % e)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -14,6 +14,8 @@
 #    under the License.
 
 import argparse
+import copy
+import multiprocessing
 import os
 import sys
 
@@ -26,12 +28,21 @@ from ansible.utils.display import Display
 try:
     from .helper import constants
     from .helper.utils import Utils
+    from .helper.utils import auto_forks
+    from .helper.utils import configured_forks
+    from .helper.utils import load_inventory
     from .helper.utils import run_ansible
 except (ImportError, ValueError):
     from helper import constants
     from helper.utils import Utils
+    from helper.utils import auto_forks
+    from helper.utils import configured_forks
+    from helper.utils import load_inventory
     from helper.utils import run_ansible
 
+# below this many hosts per shard, a shard costs more than it saves
+MIN_SHARD_HOSTS = 25
+
 
 def create_base_parser(prog, usage="", desc=None, epilog=None):
     """
@@ -56,9 +67,93 @@ def create_base_parser(prog, usage="", desc=None, epilog=None):
     parser.add_argument('-l', '--limit', default=None, dest='subset',
                         help="further limit selected hosts "
                              "to an additional pattern")
+    parser.add_argument('--refresh-inventory', default=False,
+                        dest='refresh_inventory', action='store_true',
+                        help="query the undercloud and overcloud for the "
+                             "compute hosts instead of using the cached "
+                             "inventory")
+    parser.add_argument('--incremental', default=False,
+                        dest='incremental', action='store_true',
+                        help="reuse the previous collection of the hosts "
+                             "whose agent mappings, OVS configuration and "
+                             "NICs did not change")
+    parser.add_argument('-s', '--shards', default=None, dest='shards',
+                        type=int,
+                        help="number of playbook processes collecting the "
+                             "hosts in parallel, defaults to the number of "
+                             "controller cores with at least %d hosts per "
+                             "process" % MIN_SHARD_HOSTS)
+    parser.add_argument('-f', '--forks', default=None, dest='forks',
+                        type=int,
+                        help="number of hosts each playbook process works "
+                             "on at once, defaults to the forks set in "
+                             "ansible.cfg or ANSIBLE_FORKS, else to one per "
+                             "host as far as the controller memory and "
+                             "cores allow")
     return parser
 
 
+def default_shards(host_count):
+    try:
+        cpus = multiprocessing.cpu_count()
+    except NotImplementedError:
+        cpus = 1
+    return max(1, min(cpus, host_count // MIN_SHARD_HOSTS))
+
+
+def split_shards(hosts, shards):
+    """Deal the hosts round robin into at most shards lists"""
+    return [hosts[i::shards] for i in range(min(shards, len(hosts)))]
+
+
+def get_compute_hosts(inventory_path, subset):
+    inventory = load_inventory(os.path.dirname(inventory_path),
+                               [inventory_path])
+    if subset:
+        inventory.subset(subset)
+    return sorted(host.name for host in inventory.get_hosts('tc_hosts'))
+
+
+def _run_shard(playbook_path, options, inventory_path, extra_vars):
+    sys.exit(run_ansible(playbook_path, options, [inventory_path],
+                         extra_vars, measure_workers=False))
+
+
+def run_sharded(shards, options, inventory_path, extra_vars):
+    """Collect the shards in parallel processes, then write one report.
+
+    The worker memory is not measured, as the children of this process
+    are whole shard controllers.
+    """
+    tc_path = os.path.dirname(inventory_path)
+    run_ansible(os.path.join(tc_path, "prepare.yml"), options,
+                extra_vars=extra_vars, measure_workers=False)
+    forks = options.forks or configured_forks()
+
+    processes = list()
+    for shard in shards:
+        shard_options = copy.copy(options)
+        shard_options.subset = ','.join(shard + ['localhost'])
+        if not forks:
+            # the shards share the controller memory and cores
+            shard_options.forks = auto_forks(len(shard), len(shards))
+        process = multiprocessing.Process(
+            target=_run_shard,
+            args=(os.path.join(tc_path, "topology.yml"), shard_options,
+                  inventory_path, extra_vars))
+        process.start()
+        processes.append(process)
+    for index, process in enumerate(processes):
+        process.join()
+        if process.exitcode:
+            sys.stdout.write("WARNING: shard %d of %d ended with exit "
+                             "code %d.\n" %
+                             (index + 1, len(processes), process.exitcode))
+
+    return run_ansible(os.path.join(tc_path, "report.yml"), options,
+                       extra_vars=extra_vars, measure_workers=False)
+
+
 def main(options):
     if not Utils.check_user(constants.STACK_USER):
         sys.stdout.write("ERROR: Run the script as %s user.\n" %
@@ -75,8 +170,37 @@ def main(options):
                          "\n" % constants.OVERCLOUDRC_FILE)
         sys.exit(1)
 
+    os.environ.setdefault('TC_UNDERCLOUD_ENV_FILE', constants.STACKRC_FILE)
+    os.environ.setdefault('TC_OSC_ENV_FILE', constants.OVERCLOUDRC_FILE)
+    if options.refresh_inventory:
+        os.environ['TC_INVENTORY_CACHE_TTL'] = '0'
+
+    if options.shards is not None and options.shards < 1:
+        sys.stdout.write("ERROR: --shards must be at least 1.\n")
+        sys.exit(1)
+
+    if options.forks is not None and options.forks < 1:
+        sys.stdout.write("ERROR: --forks must be at least 1.\n")
+        sys.exit(1)
+
     topo_playbook_path = os.path.join(constants.NUAGE_TC_PATH, "get_topo.yml")
-    run_ansible(topo_playbook_path, options)
+    inventory_path = os.path.join(constants.NUAGE_TC_PATH, "tc_inventory.yml")
+    extra_vars = {'incremental': options.incremental}
+
+    shards = options.shards
+    if shards != 1:
+        hosts = get_compute_hosts(inventory_path, options.subset)
+        if shards is None:
+            shards = default_shards(len(hosts))
+        if options.refresh_inventory:
+            # the shards reuse the inventory that was just refreshed
+            del os.environ['TC_INVENTORY_CACHE_TTL']
+    if shards > 1:
+        run_sharded(split_shards(hosts, shards), options, inventory_path,
+                    extra_vars)
+    else:
+        run_ansible(topo_playbook_path, options, [inventory_path],
+                    extra_vars)
 
 
 if __name__ == "__main__":
@@ -28,3 +28,5 @@ STACKRC_FILE = get_env_variable('undercloud_env_file')
 OVERCLOUDRC_FILE = get_env_variable('osc_env_file')
 OUTPUT_DIR = get_env_variable('output_dir')
 OUTPUT_FILE_PREFIX = get_env_variable('output_file_prefix')
+MIRROR_FILE = os.path.join(OUTPUT_DIR, 'switchport_mappings.sqlite')
+HISTORY_FILE = os.path.join(OUTPUT_DIR, 'report_history.sqlite')
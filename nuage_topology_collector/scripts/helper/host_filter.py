@@ -0,0 +1,50 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import fnmatch
+
+WILDCARDS = '*?['
+
+
+class HostFilter(object):
+    """Compute hosts selected by --limit.
+
+    The limit is a comma separated list of host names or fnmatch patterns,
+    matched against the full name of a host and against its short name,
+    so compute-0 selects compute-0.localdomain.
+    """
+
+    def __init__(self, limit):
+        self.patterns = [pattern.strip() for pattern in limit.split(',')
+                         if pattern.strip()]
+
+    @property
+    def names(self):
+        """The patterns that are plain host names"""
+        return [pattern for pattern in self.patterns
+                if not any(char in pattern for char in WILDCARDS)]
+
+    def match(self, name):
+        short_name = name.split('.', 1)[0]
+        return any(fnmatch.fnmatchcase(name, pattern) or
+                   fnmatch.fnmatchcase(short_name, pattern)
+                   for pattern in self.patterns)
+
+
+def add_limit_argument(parser):
+    parser.add_argument('-l', '--limit', '--hosts', default=None,
+                        dest='limit',
+                        help="only process the compute hosts matching this "
+                             "comma separated list of host names or "
+                             "patterns")
@@ -0,0 +1,144 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+JOURNAL_SUFFIX = '.journal'
+JOURNAL_VERSION = 1
+# the journal is synced to disk every SYNC_LINES lines or SYNC_INTERVAL
+# seconds, whichever comes first
+SYNC_LINES = 1000
+SYNC_INTERVAL = 0.2
+
+
+def file_checksum(path):
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as checked_file:
+        for block in iter(lambda: checked_file.read(1024 * 1024), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+class ImportJournal(object):
+    """Append-only record of the mappings neutron acknowledged for a report.
+
+    The first line holds the checksum of the report, every other line the
+    [host_id, pci_slot] of one mapping. Lines are synced to disk in groups,
+    every sync_lines lines or sync_interval seconds, outside of the lock
+    the importing threads take. A crash loses at most the last group,
+    whose mappings a resumed import sends again, which neutron takes as
+    unchanged. A journal is only resumed for the report it was written
+    for, and it is removed once the import completed.
+    """
+
+    def __init__(self, report_path, path=None, sync_lines=SYNC_LINES,
+                 sync_interval=SYNC_INTERVAL):
+        self.path = path or report_path + JOURNAL_SUFFIX
+        self.checksum = file_checksum(report_path)
+        self.sync_lines = sync_lines
+        self.sync_interval = sync_interval
+        self.done = set()
+        self.file = None
+        self.lock = threading.Lock()
+        self.unsynced = 0
+        self.synced_at = time.time()
+
+    def open(self, resume=False):
+        """Start writing the journal.
+
+        :param resume: keep the mappings journaled by an earlier import of
+                       the same report
+        :return: False when an earlier journal could not be resumed
+        """
+        resumed = resume and self._load()
+        if resumed:
+            self.file = open(self.path, 'a')
+        else:
+            self.done = set()
+            self.file = open(self.path, 'w')
+            self._write([{'version': JOURNAL_VERSION,
+                          'sha256': self.checksum}])
+            self._sync()
+        return resumed or not resume
+
+    def _load(self):
+        """Read the journal, cutting a line torn by a crash"""
+        try:
+            with open(self.path, 'rb') as journal_file:
+                header = json.loads(journal_file.readline().decode('utf-8'))
+                if header != {'version': JOURNAL_VERSION,
+                              'sha256': self.checksum}:
+                    return False
+                done = set()
+                end = journal_file.tell()
+                for line in iter(journal_file.readline, b''):
+                    if not line.endswith(b'\n'):
+                        break
+                    done.add(tuple(json.loads(line.decode('utf-8'))))
+                    end = journal_file.tell()
+        except (IOError, OSError, ValueError, TypeError):
+            return False
+        with open(self.path, 'ab') as journal_file:
+            journal_file.truncate(end)
+        self.done = done
+        return True
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def _write(self, entries):
+        self.file.write(''.join(json.dumps(entry) + '\n'
+                                for entry in entries))
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record(self, keys):
+        """Journal the (host_id, pci_slot) keys neutron acknowledged"""
+        with self.lock:
+            self._write([list(key) for key in keys])
+            self.done.update(keys)
+            self.unsynced += len(keys)
+            now = time.time()
+            if self.unsynced < self.sync_lines and \
+                    now - self.synced_at < self.sync_interval:
+                return
+            # the lines reach the kernel under the lock, the disk outside
+            self.file.flush()
+            self.unsynced = 0
+            self.synced_at = now
+            fileno = self.file.fileno()
+        os.fsync(fileno)
+
+    def close(self):
+        if self.file is not None:
+            self._sync()
+            self.file.close()
+            self.file = None
+
+    def complete(self):
+        """Remove the journal of an import that completed"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
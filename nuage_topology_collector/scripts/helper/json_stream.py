@@ -0,0 +1,155 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import io
+import json
+import numbers
+import re
+
+try:
+    # picks its C backend when yajl is installed
+    import ijson
+except ImportError:
+    ijson = None
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# what may follow a decoded number prefix and still be part of the number
+NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+
+
+class _Scanner(object):
+    """Decode JSON values one at a time from a file.
+
+    Only the text of the value being decoded is kept in memory. Each value
+    is decoded by the json module, which is C accelerated, from a buffer
+    that grows until the value fits.
+    """
+
+    def __init__(self, fileobj, chunk_size=CHUNK_SIZE):
+        self.file = fileobj
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """Drop the consumed text and read more, False at end of file"""
+        # reading as much as is buffered keeps decoding a large value
+        # linear in its size
+        chunk = self.file.read(max(self.chunk_size,
+                                   len(self.buffer) - self.pos))
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+        return bool(chunk)
+
+    def peek(self):
+        """Return the next character after whitespace, '' at end of file"""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('Expecting one of %r at %r' %
+                             (chars, self.buffer[self.pos:self.pos + 20]))
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                if self.eof or not self._fill():
+                    raise
+                continue
+            # a number cut by the end of the chunk, after its '.' or in its
+            # exponent, decodes as a shorter number: read on and decode again
+            if not self.eof and isinstance(value, numbers.Number) and \
+                    not isinstance(value, bool) and \
+                    NUMBER_TAIL.match(self.buffer, end).end() == \
+                    len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_items(fileobj, key, chunk_size=CHUNK_SIZE):
+    scanner = _Scanner(fileobj, chunk_size)
+    scanner.expect('{')
+    if scanner.peek() == '}':
+        return
+    while True:
+        name = scanner.value()
+        scanner.expect(':')
+        if name == key:
+            scanner.expect('[')
+            if scanner.peek() == ']':
+                scanner.pos += 1
+            else:
+                while True:
+                    yield scanner.value()
+                    if scanner.expect(',]') == ']':
+                        break
+        else:
+            scanner.value()
+        if scanner.expect(',}') == '}':
+            return
+
+
+def iter_items(path, key, chunk_size=CHUNK_SIZE):
+    """Yield the items of the array under key of a JSON object file.
+
+    The items are decoded one at a time, so memory use is bounded by the
+    largest item rather than by the file. ijson is used when installed,
+    otherwise a pure python scanner.
+    """
+    if ijson is not None:
+        with open(path, 'rb') as json_file:
+            for item in ijson.items(json_file, key + '.item'):
+                yield item
+        return
+    with io.open(path, encoding='utf-8') as json_file:
+        for item in _iter_items(json_file, key, chunk_size):
+            yield item
+
+
+def read_value(path, key, chunk_size=CHUNK_SIZE):
+    """Return the value under key of a JSON object file, None when absent.
+
+    The members are decoded in order up to key only, so a value written
+    ahead of a large array is read without decoding the array.
+    """
+    with io.open(path, encoding='utf-8') as json_file:
+        scanner = _Scanner(json_file, chunk_size)
+        scanner.expect('{')
+        if scanner.peek() == '}':
+            return None
+        while True:
+            name = scanner.value()
+            scanner.expect(':')
+            value = scanner.value()
+            if name == key:
+                return value
+            if scanner.expect(',}') == '}':
+                return None
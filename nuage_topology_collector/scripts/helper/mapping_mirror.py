@@ -0,0 +1,186 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS switchport_mappings (
+    id TEXT PRIMARY KEY,
+    host_id TEXT NOT NULL,
+    pci_slot TEXT NOT NULL,
+    switch_id TEXT,
+    port_id TEXT,
+    updated_at TEXT,
+    body TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS switchport_mappings_host_slot
+    ON switchport_mappings (host_id, pci_slot);
+CREATE INDEX IF NOT EXISTS switchport_mappings_switch_port
+    ON switchport_mappings (switch_id, port_id);
+CREATE TABLE IF NOT EXISTS sync (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+# the order of topology_diff.merge_key
+MERGE_ORDER = "upper(host_id), upper(pci_slot), host_id, pci_slot"
+# the sync row holding the latest updated_at mirrored
+SYNC_MARK = 'updated_at'
+# the sync row holding the time of the last full refresh
+SYNC_FULL = 'full_refresh_at'
+# seconds after a full refresh the next refresh is a full one again
+MAX_AGE = 24 * 3600
+
+
+class MappingMirror(object):
+    """Local copy of the neutron switchport mappings, in SQLite.
+
+    The mappings are indexed by (host_id, pci_slot) and by
+    (switch_id, port_id). A refresh only fetches the mappings changed
+    since the latest updated_at mirrored, with the changed_since filter
+    of neutron. Mappings deleted from neutron are only dropped by a full
+    refresh, which is also done when neutron does not return updated_at
+    and once the last full refresh is older than max_age.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def _sync_value(self, name):
+        row = self.connection.execute(
+            "SELECT value FROM sync WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _mark(self, max_age=None):
+        """Return the updated_at to refresh from, None for a full refresh"""
+        if max_age is not None:
+            full_refresh_at = self._sync_value(SYNC_FULL)
+            if full_refresh_at is None or \
+                    time.time() - float(full_refresh_at) > max_age:
+                return None
+        return self._sync_value(SYNC_MARK)
+
+    def refresh(self, neutron, full=False, max_age=None):
+        """Bring the mirror up to date with neutron.
+
+        :param neutron: a NeutronClient
+        :param full: fetch all the mappings and drop the ones neutron no
+                     longer has
+        :param max_age: seconds after which a full refresh is due, never
+                        when None
+        :return: the number of mappings fetched and whether the refresh
+                 was full
+        """
+        mark = None if full else self._mark(max_age)
+        full = mark is None
+        if full:
+            mappings = neutron.iter_switchport_mappings()
+        else:
+            mappings = neutron.iter_switchport_mappings(changed_since=mark)
+        count = 0
+        latest = mark
+        timestamps = True
+        with self.connection:
+            if full:
+                self.connection.execute("DELETE FROM switchport_mappings")
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO sync (name, value) VALUES (?, ?)",
+                    (SYNC_FULL, repr(time.time())))
+            for mapping in mappings:
+                count += 1
+                updated_at = mapping.get('updated_at')
+                if updated_at is None:
+                    timestamps = False
+                elif latest is None or updated_at > latest:
+                    latest = updated_at
+                # a mapping deleted and created again has a new id
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO switchport_mappings "
+                    "(id, host_id, pci_slot, switch_id, port_id, "
+                    "updated_at, body) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (mapping['id'], mapping['host_id'], mapping['pci_slot'],
+                     mapping.get('switch_id'), mapping.get('port_id'),
+                     updated_at, json.dumps(mapping)))
+            if latest is None or not timestamps:
+                # without timestamps the next refresh is a full one
+                self.connection.execute(
+                    "DELETE FROM sync WHERE name = ?", (SYNC_MARK,))
+            else:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO sync (name, value) VALUES (?, ?)",
+                    (SYNC_MARK, latest))
+        return count, full
+
+    def _select(self, where='', args=()):
+        for row in self.connection.execute(
+                "SELECT body FROM switchport_mappings " + where +
+                " ORDER BY " + MERGE_ORDER, args):
+            yield json.loads(row[0])
+
+    def mappings(self, host_ids=None):
+        """Yield the mirrored mappings in topology_diff.merge_key order
+
+        :param host_ids: only yield the mappings of these hosts
+        """
+        if host_ids is None:
+            for mapping in self._select():
+                yield mapping
+            return
+        for host_id in sorted(set(host_ids),
+                              key=lambda host_id: (host_id.upper(), host_id)):
+            for mapping in self._select("WHERE host_id = ?", (host_id,)):
+                yield mapping
+
+    def index(self, host_ids=None):
+        """Return the mirrored mappings by (host_id, pci_slot)"""
+        return dict(((mapping['host_id'], mapping['pci_slot']), mapping)
+                    for mapping in self.mappings(host_ids))
+
+    def switch_port_mappings(self, switch_id, port_id):
+        """Return the mappings behind a switch port"""
+        return list(self._select("WHERE switch_id = ? AND port_id = ?",
+                                 (switch_id, port_id)))
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT count(*) FROM switchport_mappings").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+def add_mirror_arguments(parser):
+    parser.add_argument('--mirror', default=False, action='store_true',
+                        help="read the neutron mappings from the local "
+                             "mirror, refreshed with the changes since its "
+                             "last refresh. Mappings deleted from neutron "
+                             "since the last full sync are still taken as "
+                             "existing: they are neither reported deleted "
+                             "nor imported again")
+    parser.add_argument('--full-sync', default=False, action='store_true',
+                        dest='full_sync',
+                        help="with --mirror, fetch all the neutron mappings "
+                             "again, dropping the deleted ones")
+    parser.add_argument('--mirror-max-age', default=MAX_AGE, type=int,
+                        dest='mirror_max_age', metavar='SECONDS',
+                        help="with --mirror, do a full sync when the last "
+                             "one is older than this, default %d" % MAX_AGE)
@@ -1,12 +1,69 @@
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 # TODO(OPENSTACK-2892) :
 #      This is temporary code for dealing with py2/py3 compatibility and have
 #      unit tests pass, while the production code isn't deployed as a true
 #      python package. This will be worked on in a subsequent release.
 try:
+    from .token_cache import TokenCache
     from .utils import Utils
 except (ImportError, ValueError):
+    from token_cache import TokenCache
     from utils import Utils
 
+# host_id filtered queries running at once
+HOST_QUERY_WORKERS = 16
+# switchport mappings per page when paging through neutron
+PAGE_SIZE = 1000
+# pages fetched ahead of the one being consumed
+PREFETCH_PAGES = 2
+MAPPING_SORT_KEYS = ('host_id', 'pci_slot')
+
+
+def prefetch(pages, depth=PREFETCH_PAGES):
+    """Iterate pages from a background thread, up to depth pages ahead.
+
+    The thread fetches the next pages while the caller works on the
+    current one. Its errors are raised by the iteration.
+    """
+    fetched = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+    end = object()
+
+    def fetch():
+        try:
+            for page in pages:
+                while not stopped.is_set():
+                    try:
+                        fetched.put((page, None), timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if stopped.is_set():
+                    return
+            fetched.put((end, None))
+        except Exception as e:
+            fetched.put((end, e))
+
+    thread = threading.Thread(target=fetch)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            page, error = fetched.get()
+            if error is not None:
+                raise error
+            if page is end:
+                return
+            yield page
+    finally:
+        stopped.set()
+
 
 class KeystoneClient(object):
     def __init__(self):
@@ -14,12 +71,24 @@ class KeystoneClient(object):
         self.session = None
         self.credentials = Utils.get_os_credentials()
 
+    def token_cache(self):
+        credentials = self.credentials
+        # domains are only set for identity v3
+        user_domain = (getattr(credentials, 'user_domain_name', None) or
+                       getattr(credentials, 'user_domain_id', None))
+        project_domain = (getattr(credentials, 'project_domain_name', None) or
+                          getattr(credentials, 'project_domain_id', None))
+        return TokenCache(credentials.auth_url, credentials.username,
+                          credentials.project_name, user_domain,
+                          project_domain)
+
     def authenticate(self, init_client=True):
         from keystoneauth1.exceptions.auth import AuthorizationFailure \
             as KeyStoneAuthorizationFailure
+        from keystoneauth1.exceptions.http import Unauthorized \
+            as KeyStoneUnauthorized
         from keystoneauth1.identity import v2 as keystone_v2
         from keystoneauth1.identity import v3 as keystone_v3
-        from keystoneauth1 import session as keystone_session
 
         from keystoneclient.v2_0 import client as keystone_v2_client
         from keystoneclient.v3 import client as keystone_client
@@ -39,8 +108,8 @@ class KeystoneClient(object):
                     user_domain_id=self.credentials.user_domain_id,
                     user_domain_name=self.credentials.user_domain_name)
 
-                self.session = keystone_session.Session(
-                    auth=auth,
+                self.session = self.token_cache().session(
+                    auth,
                     verify=(self.credentials.ca_cert if
                             self.credentials.verify_ca and self.credentials.
                             ca_cert else self.credentials.verify_ca))
@@ -53,7 +122,7 @@ class KeystoneClient(object):
                     password=self.credentials.password,
                     tenant_name=self.credentials.project_name)
 
-                self.session = keystone_session.Session(auth=auth)
+                self.session = self.token_cache().session(auth)
                 if init_client:
                     self.client = keystone_v2_client.Client(
                         username=self.credentials.username,
@@ -63,7 +132,7 @@ class KeystoneClient(object):
             return self
 
         except (AuthorizationFailure, KeyStoneAuthorizationFailure,
-                Unauthorized) as e:
+                KeyStoneUnauthorized, Unauthorized) as e:
             raise EnvironmentError('Authentication failure: ' + str(e))
 
 
@@ -95,8 +164,80 @@ class NeutronClient(object):
                                 retrieve_all,
                                 **_params)
 
+    def get_switchport_mapping_pages(self, page_size=PAGE_SIZE, **filters):
+        """Yield the mappings page by page, sorted by host_id and pci_slot.
+
+        Each page is one request, with the id of the last mapping of the
+        previous page as marker. A short page is not the last one, as
+        neutron caps limit to its pagination_max_limit: paging goes on
+        until a page comes back empty.
+        """
+        params = dict(filters, limit=page_size,
+                      sort_key=list(MAPPING_SORT_KEYS),
+                      sort_dir=['asc'] * len(MAPPING_SORT_KEYS))
+        while True:
+            page = self.client.get(self.switchport_mapping_path,
+                                   params=dict(params))['switchport_mappings']
+            if not page:
+                return
+            yield page
+            params['marker'] = page[-1]['id']
+
+    def iter_switchport_mappings(self, page_size=PAGE_SIZE,
+                                 depth=PREFETCH_PAGES, **filters):
+        """Yield the mappings sorted by host_id and pci_slot.
+
+        At most depth pages are held ahead of the mapping being consumed,
+        so memory use does not grow with the number of mappings.
+        """
+        for page in prefetch(self.get_switchport_mapping_pages(
+                page_size, **filters), depth):
+            for mapping in page:
+                yield mapping
+
+    def get_switchport_mappings_for_hosts(self, host_ids,
+                                          workers=HOST_QUERY_WORKERS):
+        """List the mappings of host_ids only.
+
+        Each host is a query with a host_id filter, and up to workers
+        queries run in parallel.
+        """
+        host_ids = list(host_ids)
+        pending = queue.Queue()
+        for host_id in host_ids:
+            pending.put(host_id)
+        found = dict()
+        errors = []
+
+        def work():
+            while not errors:
+                try:
+                    host_id = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    found[host_id] = self.get_switchport_mapping(
+                        host_id=host_id)['switchport_mappings']
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=work)
+                   for _ in range(min(workers, len(host_ids)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return {'switchport_mappings': [mapping for host_id in host_ids
+                                        for mapping in found[host_id]]}
+
     def create_switchport_mapping(self, body):
         return self.client.post(self.switchport_mapping_path, body)
 
+    def create_switchport_mappings(self, body):
+        """Bulk create, body holds a switchport_mappings list"""
+        return self.client.post(self.switchport_mapping_path, body)
+
     def update_switchport_mapping(self, id, body):
         return self.client.put(self.switchport_mappings_path % id, body)
@@ -0,0 +1,178 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import sqlite3
+
+try:
+    from .import_journal import file_checksum
+    from .json_stream import iter_items
+    from .json_stream import read_value
+except (ImportError, ValueError):
+    from import_journal import file_checksum
+    from json_stream import iter_items
+    from json_stream import read_value
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    datetime TEXT NOT NULL,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL UNIQUE,
+    hosts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_datetime ON reports (datetime);
+CREATE TABLE IF NOT EXISTS ports (
+    report_id INTEGER NOT NULL REFERENCES reports (id),
+    host TEXT NOT NULL,
+    interface TEXT NOT NULL,
+    pci_id TEXT,
+    switch_name TEXT,
+    mgmt_ip TEXT,
+    port TEXT,
+    bridge TEXT
+);
+CREATE INDEX IF NOT EXISTS ports_host_pci ON ports (host, pci_id);
+CREATE INDEX IF NOT EXISTS ports_host_interface ON ports (host, interface);
+CREATE INDEX IF NOT EXISTS ports_pci ON ports (pci_id);
+CREATE INDEX IF NOT EXISTS ports_neighbor ON ports (mgmt_ip, port, report_id);
+"""
+
+
+def report_ports(compute_hosts):
+    """Yield (host, interface, pci-id, neighbor name, mgmt ip, port,
+    bridge) of the report, with a None pci-id for the PF itself
+    """
+    for compute_host in compute_hosts:
+        host = compute_host['service_host name']
+        for interface in compute_host['interfaces']:
+            neighbor = (interface['neighbor-system-name'],
+                        interface['neighbor-system-mgmt-ip'],
+                        interface['neighbor-system-port'],
+                        interface.get('ovs-bridge'))
+            yield (host, interface['name'], None) + neighbor
+            for virtual_function in interface.get('vf_info', ()):
+                yield (host, interface['name'],
+                       virtual_function['pci-id']) + neighbor
+
+
+class ReportHistory(object):
+    """The ports of every report ingested, in SQLite.
+
+    There is one row per PF and per VF of each report, indexed by host,
+    interface, PCI address and neighbor switch port, so the reports can
+    be searched without reading them again.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def ingest(self, report_path):
+        """Load a report, streamed one compute host at a time.
+
+        :return: the number of ports loaded, None when the report was
+                 already ingested
+        """
+        checksum = file_checksum(report_path)
+        if self.connection.execute("SELECT 1 FROM reports WHERE sha256 = ?",
+                                   (checksum,)).fetchone():
+            return None
+        host_count = [0]
+
+        def compute_hosts():
+            for compute_host in iter_items(report_path, 'compute-hosts'):
+                host_count[0] += 1
+                yield compute_host
+
+        with self.connection:
+            report_id = self.connection.execute(
+                "INSERT INTO reports (datetime, path, sha256, hosts) "
+                "VALUES (?, ?, ?, 0)",
+                (read_value(report_path, 'datetime'),
+                 os.path.abspath(report_path), checksum)).lastrowid
+            count = self.connection.executemany(
+                "INSERT INTO ports (report_id, host, interface, pci_id, "
+                "switch_name, mgmt_ip, port, bridge) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((report_id,) + row
+                 for row in report_ports(compute_hosts()))).rowcount
+            self.connection.execute(
+                "UPDATE reports SET hosts = ? WHERE id = ?",
+                (host_count[0], report_id))
+        return count
+
+    def reports(self):
+        """Return (datetime, path, hosts) of the reports, oldest first"""
+        return self.connection.execute(
+            "SELECT datetime, path, hosts FROM reports "
+            "ORDER BY datetime, id").fetchall()
+
+    def _report_at(self, datetime=None):
+        """Return (id, datetime) of the latest report up to datetime"""
+        if datetime is None:
+            return self.connection.execute(
+                "SELECT id, datetime FROM reports "
+                "ORDER BY datetime DESC, id DESC LIMIT 1").fetchone()
+        return self.connection.execute(
+            "SELECT id, datetime FROM reports WHERE datetime <= ? "
+            "ORDER BY datetime DESC, id DESC LIMIT 1",
+            (datetime,)).fetchone()
+
+    def switch_port(self, mgmt_ip, port, datetime=None):
+        """Return the hosts and VFs behind a switch port.
+
+        :param datetime: as of the latest report up to this date and time,
+                         of the latest report when None
+        :return: the datetime of the report searched, None without
+                 reports, and its (host, interface, pci-id) behind the port
+        """
+        report = self._report_at(datetime)
+        if report is None:
+            return None, []
+        return report[1], self.connection.execute(
+            "SELECT host, interface, pci_id FROM ports "
+            "WHERE mgmt_ip = ? AND port = ? AND report_id = ? "
+            "ORDER BY host, interface, pci_id",
+            (mgmt_ip, port, report[0])).fetchall()
+
+    def moves(self, host, slot):
+        """Return when a PF or VF changed interface or neighbor.
+
+        :param slot: the PCI address of a VF, or the name of a PF
+        :return: (datetime, interface, switch name, mgmt ip, port) of the
+                 first report and of every report where one of them
+                 changed, oldest first
+        """
+        rows = self.connection.execute(
+            "SELECT reports.datetime, interface, switch_name, mgmt_ip, port "
+            "FROM ports JOIN reports ON reports.id = ports.report_id "
+            "WHERE host = ? AND pci_id = ? "
+            "UNION ALL "
+            "SELECT reports.datetime, interface, switch_name, mgmt_ip, port "
+            "FROM ports JOIN reports ON reports.id = ports.report_id "
+            "WHERE host = ? AND interface = ? AND pci_id IS NULL "
+            "ORDER BY 1", (host, slot, host, slot))
+        moves = []
+        for row in rows:
+            if not moves or moves[-1][1:] != row[1:]:
+                moves.append(tuple(row))
+        return moves
+
+    def close(self):
+        self.connection.close()
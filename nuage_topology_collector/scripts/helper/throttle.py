@@ -0,0 +1,76 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import random
+import threading
+import time
+
+# a request this many times slower than the fastest one seen means the
+# server is queueing
+LATENCY_FACTOR = 4
+# requests faster than this never count as slow
+MIN_SLOW_LATENCY = 0.25
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Return the seconds to wait before retry attempt, with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class AimdLimiter(object):
+    """Concurrency limit with additive increase, multiplicative decrease.
+
+    Every request that completes in time raises the limit by one request
+    per limit completions, so the limit grows by about one per round trip.
+    A request that was refused for overload or that took much longer than
+    the fastest one seen multiplies the limit by decrease, at most once
+    per round trip.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, decrease=0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.limit = float(initial)
+        self.in_flight = 0
+        self.min_latency = None
+        self.last_decrease = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, overloaded=False):
+        """Return a slot, with the latency of its request and the outcome"""
+        with self.condition:
+            self.in_flight -= 1
+            if not overloaded:
+                if self.min_latency is None or latency < self.min_latency:
+                    self.min_latency = latency
+                overloaded = latency > max(MIN_SLOW_LATENCY,
+                                           self.min_latency * LATENCY_FACTOR)
+            now = time.time()
+            if overloaded:
+                if now - self.last_decrease > (self.min_latency or latency):
+                    self.limit = max(self.minimum,
+                                     self.limit * self.decrease)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
@@ -0,0 +1,84 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import json
+import os
+import tempfile
+
+TOKEN_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache',
+                               'nuage-topology-collector', 'tokens')
+# a cached token is not handed out when it expires sooner than this
+EXPIRY_MARGIN = 300
+
+
+class TokenCache(object):
+    """Keystone tokens shared on disk by all collector entry points.
+
+    One file per auth URL, user and project holds the keystoneauth auth
+    state. The directory is only accessible to the user running the
+    scripts, and files are replaced atomically.
+    """
+
+    def __init__(self, auth_url, username, project_name,
+                 user_domain=None, project_domain=None,
+                 cache_dir=TOKEN_CACHE_DIR):
+        key = json.dumps([auth_url.rstrip('/'), username, project_name,
+                          user_domain, project_domain])
+        self.cache_dir = cache_dir
+        self.path = os.path.join(
+            cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def load(self, auth):
+        """Install the cached auth state into auth if still valid"""
+        try:
+            with open(self.path) as cache_file:
+                auth.set_auth_state(cache_file.read())
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return False
+        if auth.auth_ref is None or \
+                auth.auth_ref.will_expire_soon(EXPIRY_MARGIN):
+            auth.invalidate()
+            return False
+        return True
+
+    def save(self, auth):
+        state = auth.get_auth_state()
+        if not state:
+            return
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir, 0o700)
+            # mkstemp creates the file readable by its owner only
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, 'w') as cache_file:
+                cache_file.write(state)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            # the cache is an optimization only
+            pass
+
+    def session(self, auth, **kwargs):
+        """Return a keystoneauth session for auth using the cached token.
+
+        Without a valid cached token, authenticates right away and caches
+        the new token.
+        """
+        from keystoneauth1 import session as keystone_session
+
+        session = keystone_session.Session(auth=auth, **kwargs)
+        if not self.load(auth):
+            session.get_token()
+            self.save(auth)
+        return session
@@ -0,0 +1,334 @@
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import heapq
+import io
+import json
+import os
+import shutil
+import tempfile
+
+try:
+    from .json_stream import iter_items
+except (ImportError, ValueError):
+    from json_stream import iter_items
+
+ADDED = 'added'
+REMOVED = 'removed'
+MODIFIED = 'modified'
+UNCHANGED = 'unchanged'
+
+# the switchport mapping fields compared, besides its host_id and pci_slot
+DIFF_FIELDS = ('switch_id', 'port_id', 'switch_info', 'bridge')
+FORMATS = ('text', 'json', 'ndjson')
+# report mappings sorted in memory at once, more are merged from disk
+SORT_RUN_SIZE = 100000
+
+
+class UnsortedMappingsError(ValueError):
+    """The imported mappings are not in merge_key order, as when neutron
+    sorts them with another collation
+    """
+
+
+def interface_mappings(host_id, interface):
+    """Return the switchport mappings of a report interface.
+
+    One mapping per VF, keyed by its PCI address, then one for the PF
+    itself, keyed by the interface name.
+    """
+    base_mapping = {
+        'switch_info': interface['neighbor-system-name'],
+        'switch_id': interface['neighbor-system-mgmt-ip'],
+        'port_id': interface['neighbor-system-port'],
+        'host_id': host_id,
+        'bridge': interface.get('ovs-bridge')
+    }
+    mappings = [dict(base_mapping, pci_slot=virtual_function['pci-id'])
+                for virtual_function in interface.get('vf_info', ())]
+    mappings.append(dict(base_mapping, pci_slot=interface['name']))
+    return mappings
+
+
+def report_mappings(compute_hosts):
+    """Yield (interface name, switchport mapping) for the report hosts"""
+    for compute_host in compute_hosts:
+        host_id = compute_host['service_host name']
+        for interface in compute_host['interfaces']:
+            for mapping in interface_mappings(host_id, interface):
+                yield interface['name'], mapping
+
+
+def mapping_key(mapping):
+    return mapping['host_id'], mapping['pci_slot']
+
+
+def merge_key(host_id, pci_slot):
+    """Sort key of a mapping, in the order neutron lists them.
+
+    The upper case names come first as the case insensitive collation of
+    MySQL compares them, the names themselves break the ties.
+    """
+    return host_id.upper(), pci_slot.upper(), host_id, pci_slot
+
+
+def base_mappings(compute_hosts):
+    """Yield the switchport mappings of an older report, to diff against.
+
+    Each mapping holds its interface name, so VFs moved to another
+    interface are found, and a null id, as it does not come from neutron.
+    """
+    for interface_name, mapping in report_mappings(compute_hosts):
+        mapping['interface'] = interface_name
+        mapping['id'] = None
+        yield mapping
+
+
+def _changed_fields(old, new, interface_name):
+    """Return the fields of old that new changed"""
+    fields = [field for field in DIFF_FIELDS
+              if field in old and old[field] != new[field]]
+    if 'interface' in old and old['interface'] != interface_name:
+        fields.append('interface')
+    return fields
+
+
+class TopologyDiff(object):
+    """Difference between a report and the imported switchport mappings.
+
+    The report side is indexed by (host_id, pci_slot) in one pass, with
+    repeated strings stored once, then the imported mappings are streamed
+    against it, so the diff is linear in the number of mappings.
+
+    A field is only compared when the imported mapping has it, the
+    interface of a VF when it comes from base_mappings.
+    """
+
+    def __init__(self, new_mappings):
+        """:param new_mappings: (interface name, mapping) of the report"""
+        strings = dict()
+
+        def intern(value):
+            return strings.setdefault(value, value)
+
+        self.index = dict()
+        for interface_name, mapping in new_mappings:
+            key = (intern(mapping['host_id']), mapping['pci_slot'])
+            self.index[key] = (intern(interface_name),) + tuple(
+                intern(mapping[field]) for field in DIFF_FIELDS)
+        self.counts = dict.fromkeys((ADDED, REMOVED, MODIFIED, UNCHANGED),
+                                    0)
+
+    @staticmethod
+    def _mapping(key, values):
+        mapping = dict(zip(DIFF_FIELDS, values[1:]))
+        mapping['host_id'], mapping['pci_slot'] = key
+        return mapping
+
+    def _record(self, change, key, interface_name, old=None, new=None,
+                fields=()):
+        self.counts[change] += 1
+        return {
+            'change': change,
+            'host_id': key[0],
+            'pci_slot': key[1],
+            'interface': interface_name,
+            'fields': list(fields),
+            'old': old,
+            'new': new
+        }
+
+    def changes(self, old_mappings):
+        """Yield the removed and modified records in the order of
+        old_mappings, then the added ones. Consumes the index.
+        """
+        for old in old_mappings:
+            key = (old['host_id'], old['pci_slot'])
+            values = self.index.pop(key, None)
+            if values is None:
+                yield self._record(REMOVED, key, None, old=old)
+                continue
+            new = self._mapping(key, values)
+            fields = _changed_fields(old, new, values[0])
+            if fields:
+                yield self._record(MODIFIED, key, values[0], old, new,
+                                   fields)
+            else:
+                self.counts[UNCHANGED] += 1
+        for key, values in self.index.items():
+            yield self._record(ADDED, key, values[0],
+                               new=self._mapping(key, values))
+        self.index = dict()
+
+
+class SortedTopologyDiff(TopologyDiff):
+    """Difference between a report and the imported switchport mappings,
+    in bounded memory.
+
+    The report mappings are sorted by merge_key, run_size at a time in
+    memory and merged from temporary files beyond that. They are then
+    merge joined with the imported mappings, which must come sorted the
+    same way, as NeutronClient.iter_switchport_mappings lists them.
+    """
+
+    def __init__(self, new_mappings, run_size=SORT_RUN_SIZE):
+        self.new_mappings = new_mappings
+        self.run_size = run_size
+        self.counts = dict.fromkeys((ADDED, REMOVED, MODIFIED, UNCHANGED),
+                                    0)
+
+    def _sorted(self):
+        """Yield (merge key, interface name, mapping) in merge key order"""
+        tmp_dir = None
+        runs = []
+        run = []
+        try:
+            for sequence, (interface_name, mapping) in enumerate(
+                    self.new_mappings):
+                run.append((merge_key(mapping['host_id'],
+                                      mapping['pci_slot']),
+                            sequence, interface_name, mapping))
+                if len(run) >= self.run_size:
+                    tmp_dir = tmp_dir or tempfile.mkdtemp(prefix='tc-diff-')
+                    runs.append(self._dump(sorted(run), tmp_dir, len(runs)))
+                    run = []
+            run.sort()
+            for key, _, interface_name, mapping in heapq.merge(
+                    run, *[self._load(path) for path in runs]):
+                yield key, interface_name, mapping
+        finally:
+            if tmp_dir is not None:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _dump(run, tmp_dir, index):
+        path = os.path.join(tmp_dir, 'run-%d' % index)
+        with open(path, 'w') as run_file:
+            for _, sequence, interface_name, mapping in run:
+                run_file.write(json.dumps([sequence, interface_name,
+                                           mapping]) + '\n')
+        return path
+
+    @staticmethod
+    def _load(path):
+        with open(path) as run_file:
+            for line in run_file:
+                sequence, interface_name, mapping = json.loads(line)
+                yield (merge_key(mapping['host_id'], mapping['pci_slot']),
+                       sequence, interface_name, mapping)
+
+    def changes(self, old_mappings):
+        """Yield the records in merge key order.
+
+        :raises UnsortedMappingsError: when old_mappings is not sorted by
+                                       merge_key
+        """
+        new_mappings = self._sorted()
+        old_mappings = iter(old_mappings)
+        new = next(new_mappings, None)
+        old = next(old_mappings, None)
+        last_key = None
+        while new is not None or old is not None:
+            old_key = None
+            if old is not None:
+                old_key = merge_key(old['host_id'], old['pci_slot'])
+                if last_key is not None and old_key <= last_key:
+                    raise UnsortedMappingsError(
+                        'The imported mappings are not sorted by host_id '
+                        'and pci_slot at %s, %s' % (old['host_id'],
+                                                    old['pci_slot']))
+            if old is None or new is not None and new[0] < old_key:
+                _, interface_name, mapping = new
+                yield self._record(ADDED, mapping_key(mapping),
+                                   interface_name, new=mapping)
+                new = next(new_mappings, None)
+                continue
+            last_key = old_key
+            key = mapping_key(old)
+            if new is None or old_key < new[0]:
+                yield self._record(REMOVED, key, None, old=old)
+            else:
+                _, interface_name, mapping = new
+                fields = _changed_fields(old, mapping, interface_name)
+                if fields:
+                    yield self._record(MODIFIED, key, interface_name, old,
+                                       mapping, fields)
+                else:
+                    self.counts[UNCHANGED] += 1
+                new = next(new_mappings, None)
+            old = next(old_mappings, None)
+
+
+def _pair(mapping):
+    return '%s, %s' % (mapping['switch_id'], mapping['port_id'])
+
+
+def render_text(record):
+    """Return the human readable lines of a diff record"""
+    port = '%s, %s' % (record['host_id'], record['pci_slot'])
+    if record['change'] == REMOVED:
+        return 'Port deleted : %s\n\n' % port
+    if record['change'] == MODIFIED:
+        lines = 'Port Modified : %s\n%s ===> %s\n' % (
+            port, _pair(record['old']), _pair(record['new']))
+        fields = record.get('fields', ())
+        for field, label in (('switch_info', 'Neighbor'),
+                             ('bridge', 'Bridge')):
+            if field in fields:
+                lines += '%s : %s ===> %s\n' % (
+                    label, record['old'][field], record['new'][field])
+        if 'interface' in fields:
+            lines += 'VF moved : %s ===> %s\n' % (
+                record['old']['interface'], record['interface'])
+        return lines + '\n'
+    return 'New Port added: %s ===> %s\n\n' % (port, _pair(record['new']))
+
+
+def write_diff(diff, old_mappings, out, output_format='text'):
+    """Write the records of diff to out as they are produced.
+
+    json writes an object with the changes list and the counts, ndjson
+    one record per line and the counts on the last line.
+    """
+    records = diff.changes(old_mappings)
+    if output_format == 'text':
+        for record in records:
+            out.write(render_text(record))
+    elif output_format == 'ndjson':
+        for record in records:
+            out.write(json.dumps(record, sort_keys=True) + '\n')
+        out.write(json.dumps({'counts': diff.counts}, sort_keys=True) + '\n')
+    else:
+        out.write('{"changes": [')
+        for index, record in enumerate(records):
+            out.write('%s\n    %s' % (',' if index else '',
+                                      json.dumps(record, sort_keys=True)))
+        out.write('\n],\n"counts": %s}\n' %
+                  json.dumps(diff.counts, sort_keys=True))
+    return diff.counts
+
+
+def read_diff(path):
+    """Yield the change records of a json or ndjson diff file"""
+    with io.open(path, encoding='utf-8') as diff_file:
+        is_json = diff_file.readline().startswith('{"changes": ')
+    if is_json:
+        for record in iter_items(path, 'changes'):
+            yield record
+        return
+    with io.open(path, encoding='utf-8') as diff_file:
+        for line in diff_file:
+            record = json.loads(line) if line.strip() else {}
+            if 'change' in record:
+                yield record
@@ -13,6 +13,8 @@
 #    under the License.
 
 import getpass
+import json
+import multiprocessing
 import os
 import subprocess
 import sys
@@ -22,6 +24,7 @@ from ansible.parsing.dataloader import DataLoader
 from ansible.vars.manager import VariableManager
 from ansible.inventory.manager import InventoryManager
 from ansible.executor.playbook_executor import PlaybookExecutor
+from ansible.plugins.loader import inventory_loader
 from oslo_utils import uuidutils
 
 try:
@@ -30,6 +33,15 @@ except ImportError:
     from ansible.utils.display import Display
     display = Display()
 
+FORK_MEMORY_FILE = os.path.join(os.path.expanduser('~'), '.cache',
+                                'nuage-topology-collector', 'fork-memory')
+# peak RSS assumed for a worker until one was measured
+DEFAULT_FORK_MEMORY = 96 * 1024 * 1024
+# share of the available memory the workers may take
+FORK_MEMORY_SHARE = 0.75
+# workers mostly wait on SSH and async jobs, one core serves many
+FORKS_PER_CPU = 25
+
 
 class OSCredentials(object):
     def __init__(self, auth_url, username, password, project_name,
@@ -187,15 +199,127 @@ class Utils(object):
             return output_list
 
 
-def run_ansible(ansible_playbook_path, opts):
+def load_inventory(playbook_dir, inventory_sources=None, loader=None):
+    # inventory plugins are looked up before any playbook is loaded, so
+    # the ones next to the playbook are not found on their own
+    inventory_loader.add_directory(
+        os.path.join(playbook_dir, 'inventory_plugins'))
+    return InventoryManager(loader=loader or DataLoader(),
+                            sources=inventory_sources or [])
+
+
+def get_available_memory():
+    """Return the memory available for new processes, None if unknown"""
+    meminfo = dict()
+    try:
+        with open('/proc/meminfo') as meminfo_file:
+            for line in meminfo_file:
+                key, _, value = line.partition(':')
+                meminfo[key] = int(value.split()[0]) * 1024
+    except (IOError, OSError, ValueError, IndexError):
+        return None
+    if 'MemAvailable' in meminfo:
+        return meminfo['MemAvailable']
+    if 'MemFree' in meminfo:
+        # kernels before 3.14
+        return meminfo['MemFree'] + meminfo.get('Cached', 0)
+    return None
+
+
+def get_peak_memory():
+    """Return the peak RSS of this process and of its largest child.
+
+    The child is the largest one reaped so far, and its RSS counts the
+    copy-on-write pages it shares with this process, so it is an upper
+    bound of what one more worker takes rather than its own memory.
+    """
+    import resource
+
+    # ru_maxrss is in kilobytes on Linux
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024)
+
+
+def load_fork_memory(path=FORK_MEMORY_FILE):
+    """Return the largest worker RSS measured by an earlier run"""
+    try:
+        with open(path) as fork_memory_file:
+            return int(fork_memory_file.read()) or DEFAULT_FORK_MEMORY
+    except (IOError, OSError, ValueError):
+        return DEFAULT_FORK_MEMORY
+
+
+def save_fork_memory(size, path=FORK_MEMORY_FILE):
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as fork_memory_file:
+            fork_memory_file.write(str(size))
+    except (IOError, OSError):
+        # the next run falls back to the default size
+        pass
+
+
+def auto_forks(host_count, processes=1, fork_memory=None,
+               available_memory=None, cpus=None):
+    """Return the number of forks for a run over host_count hosts.
+
+    One fork per host, as far as the controller memory and cores allow
+    when they are shared by processes concurrent runs. The memory a fork
+    takes is the largest worker RSS measured by the last unsharded run.
+    """
+    if fork_memory is None:
+        fork_memory = load_fork_memory()
+    if available_memory is None:
+        available_memory = get_available_memory()
+    if cpus is None:
+        try:
+            cpus = multiprocessing.cpu_count()
+        except NotImplementedError:
+            cpus = 1
+
+    forks = min(host_count, cpus * FORKS_PER_CPU // processes)
+    if available_memory is not None:
+        forks = min(forks, int(available_memory * FORK_MEMORY_SHARE //
+                               (fork_memory * processes)))
+    return max(1, forks)
+
+
+def configured_forks():
+    """Return the forks set in ansible.cfg or ANSIBLE_FORKS, None if unset"""
+    try:
+        from ansible import constants as C
+        value, origin = C.config.get_config_value_and_origin('DEFAULT_FORKS')
+    except (ImportError, AttributeError):
+        # ansible before 2.4 has no origin for its settings
+        return None
+    if origin == 'default':
+        return None
+    return int(value)
+
+
+def run_ansible(ansible_playbook_path, opts, inventory_sources=None,
+                extra_vars=None, measure_workers=True):
+    """Run a playbook, with opts.forks or the configured forks if set.
+
+    :param measure_workers: save the largest worker RSS for auto_forks,
+                            False when the children of this process are
+                            not only ansible workers
+    """
     loader = DataLoader()
-    inventory = InventoryManager(loader=loader,
-                                 sources=[])
-    variable_manager = VariableManager(loader=loader,
-                                       inventory=inventory)
+    inventory = load_inventory(os.path.dirname(ansible_playbook_path),
+                               inventory_sources, loader)
     passwords = {}
     display.verbosity = opts.verbosity
 
+    forks = opts.forks or configured_forks()
+    if not forks:
+        inventory.subset(opts.subset)
+        forks = auto_forks(len(inventory.get_hosts()))
+        inventory.subset(None)
+    sys.stdout.write("\n Running %s with %d forks \n" %
+                     (os.path.basename(ansible_playbook_path), forks))
+
     # Since ansible has deprecated the options and introduced
     # new library context starting from 2.8
     try:
@@ -205,12 +329,17 @@ def run_ansible(ansible_playbook_path, opts):
 
         context.CLIARGS = ImmutableDict(
             listtags=False, listtasks=False, listhosts=False,
-            syntax=False, connection='smart', module_path=None, forks=100,
+            syntax=False, connection='smart', module_path=None, forks=forks,
             remote_user='slotlocker', timeout=10, become=False,
             become_ask_pass=False, ask_pass=False, become_method='sudo',
             become_user='root', verbosity=opts.verbosity,
             check=opts.check, diff=False, subset=opts.subset,
-            step=False, start_at_task=None)
+            step=False, start_at_task=None,
+            extra_vars=(json.dumps(extra_vars),) if extra_vars else ())
+
+        # extra vars are read from CLIARGS when the manager is created
+        variable_manager = VariableManager(loader=loader,
+                                           inventory=inventory)
 
         CLI.get_host_list(inventory, context.CLIARGS['subset'])
         playbook = PlaybookExecutor(
@@ -232,12 +361,15 @@ def run_ansible(ansible_playbook_path, opts):
 
         options = Options(
             listtags=False, listtasks=False, listhosts=False,
-            syntax=False, connection='ssh', module_path=None, forks=100,
+            syntax=False, connection='ssh', module_path=None, forks=forks,
             remote_user='slotlocker', private_key_file=None,
             ssh_common_args=None, ssh_extra_args=None,
             sftp_extra_args=None, scp_extra_args=None, become=False,
             become_method='sudo', become_user='root', verbosity=opts.verbosity,
             check=opts.check, diff=False)
+        variable_manager = VariableManager(loader=loader,
+                                           inventory=inventory)
+        variable_manager.extra_vars = extra_vars or {}
         CLI.get_host_list(inventory, opts.subset)
         playbook = PlaybookExecutor(
             playbooks=[ansible_playbook_path], inventory=inventory,
@@ -245,7 +377,13 @@ def run_ansible(ansible_playbook_path, opts):
             options=options, passwords=passwords)
 
     rc = playbook.run()
+    peak, worker_peak = get_peak_memory()
+    sys.stdout.write("\n Peak RSS: %d MiB controller, %d MiB largest "
+                     "worker \n" % (peak // 2 ** 20, worker_peak // 2 ** 20))
+    if measure_workers and worker_peak:
+        save_fork_memory(worker_peak)
     if rc == 0:
         sys.stdout.write("\n Running Ansible Completed !! \n")
     else:
         sys.stdout.write("\n Running Ansible seems to have some error !! \n")
+    return rc
@@ -14,6 +14,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import argparse
 import glob
 import os
 import sys
@@ -24,12 +25,25 @@ import sys
 #      python package. This will be worked on in a subsequent release.
 try:
     from .helper import constants
+    from .helper.host_filter import add_limit_argument
+    from .helper.mapping_mirror import add_mirror_arguments
 except (ImportError, ValueError):
     from helper import constants
+    from helper.host_filter import add_limit_argument
+    from helper.mapping_mirror import add_mirror_arguments
 import topology_import
 
 
-def main():
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(argv[0]),
+        description="Import the latest topology report into neutron")
+    parser.add_argument('--resume', default=False, action='store_true',
+                        help="skip the mappings imported by an interrupted "
+                             "import of the same report")
+    add_limit_argument(parser)
+    add_mirror_arguments(parser)
+    options = parser.parse_args(argv[1:])
 
     if (not os.path.isdir(constants.OUTPUT_DIR)) \
             and (not os.listdir(constants.OUTPUT_DIR)):
@@ -47,11 +61,22 @@ def main():
     topo_repo_file_path = max(list_of_files, key=os.path.getctime)
     if os.path.exists(topo_repo_file_path):
         sys.stdout.write('Processing %s\n\n' % topo_repo_file_path)
-        topology_import.main(['topology_import.py', topo_repo_file_path])
+        import_argv = ['topology_import.py', topo_repo_file_path]
+        if options.resume:
+            import_argv.append('--resume')
+        if options.limit:
+            import_argv.extend(['--limit', options.limit])
+        if options.mirror:
+            import_argv.append('--mirror')
+        if options.full_sync:
+            import_argv.append('--full-sync')
+        import_argv.extend(['--mirror-max-age',
+                            str(options.mirror_max_age)])
+        topology_import.main(import_argv)
     else:
         sys.stdout.write('ERROR: No file named %s found under '
                          '%s \n' % (topo_repo_file_path, constants.OUTPUT_DIR))
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv)
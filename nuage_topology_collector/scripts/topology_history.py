@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# Copyright 2020 NOKIA
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import argparse
+import os
+import sys
+
+# TODO(OPENSTACK-2892) :
+#      This is temporary code for dealing with py2/py3 compatibility and have
+#      unit tests pass, while the production code isn't deployed as a true
+#      python package. This will be worked on in a subsequent release.
+try:
+    from .helper import constants
+    from .helper.report_history import ReportHistory
+except (ImportError, ValueError):
+    from helper import constants
+    from helper.report_history import ReportHistory
+
+
+def ingest(history, options):
+    for report in options.reports:
+        if not os.path.isfile(report):
+            sys.stdout.write("ERROR: The report %s does not exist.\n" %
+                             report)
+            sys.exit(1)
+        count = history.ingest(report)
+        if count is None:
+            sys.stdout.write("%s was already ingested\n" % report)
+        else:
+            sys.stdout.write("Ingested %s ports of %s\n" % (count, report))
+
+
+def list_reports(history, options):
+    for datetime, path, hosts in history.reports():
+        sys.stdout.write("%s  %s compute hosts  %s\n" % (datetime, hosts,
+                                                         path))
+
+
+def switch_port(history, options):
+    datetime, ports = history.switch_port(options.mgmt_ip, options.port,
+                                          options.at)
+    if datetime is None:
+        sys.stdout.write("No report ingested%s.\n" %
+                         (" up to %s" % options.at if options.at else ""))
+        return
+    sys.stdout.write("Behind %s, %s in the report of %s:\n" %
+                     (options.mgmt_ip, options.port, datetime))
+    for host, interface, pci_id in ports:
+        sys.stdout.write("    %s, %s%s\n" % (host, interface,
+                                             ", " + pci_id if pci_id else ""))
+
+
+def moves(history, options):
+    changes = history.moves(options.host, options.slot)
+    if not changes:
+        sys.stdout.write("%s, %s is in no ingested report.\n" %
+                         (options.host, options.slot))
+        return
+    for datetime, interface, switch_name, mgmt_ip, port in changes:
+        sys.stdout.write("%s  %s ===> %s (%s), %s\n" %
+                         (datetime, interface, mgmt_ip, switch_name, port))
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description="Keep the topology reports in an indexed history and "
+                    "search it")
+    parser.add_argument('--db', default=constants.HISTORY_FILE,
+                        help="path of the history database, default %s" %
+                             constants.HISTORY_FILE)
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    command = commands.add_parser('ingest', help="load reports")
+    command.add_argument('reports', nargs='+', metavar='report')
+    command.set_defaults(function=ingest)
+
+    command = commands.add_parser('reports', help="list the reports loaded")
+    command.set_defaults(function=list_reports)
+
+    command = commands.add_parser(
+        'port', help="list the hosts and VFs behind a switch port")
+    command.add_argument('mgmt_ip', help="management IP of the switch")
+    command.add_argument('port', help="port of the switch, e.g. 1/1/5")
+    command.add_argument('--at', default=None, metavar='DATETIME',
+                         help="as of the last report up to this date and "
+                              "time, e.g. 2020-01-31@23:59:59")
+    command.set_defaults(function=switch_port)
+
+    command = commands.add_parser(
+        'moves', help="list when a VF or PF changed interface or neighbor")
+    command.add_argument('host', help="service host name of the compute")
+    command.add_argument('slot', help="PCI address of the VF, or name of "
+                                      "the PF")
+    command.set_defaults(function=moves)
+    return parser
+
+
+def main(argv):
+    options = create_parser().parse_args(argv[1:])
+    history = ReportHistory(options.db)
+    try:
+        options.function(history, options)
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
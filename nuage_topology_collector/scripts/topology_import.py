@@ -12,12 +12,22 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
-import json
+import argparse
+import collections
 import logging
 import os
 import sys
+import threading
+import time
 
 from neutronclient.common.exceptions import Conflict
+from neutronclient.common.exceptions import ConnectionFailed
+from neutronclient.common.exceptions import NotFound
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 # TODO(OPENSTACK-2892) :
 #      This is temporary code for dealing with py2/py3 compatibility and have
@@ -26,45 +36,84 @@ from neutronclient.common.exceptions import Conflict
 try:
     from .helper import constants
     from .helper import script_logging
+    from .helper.host_filter import add_limit_argument
+    from .helper.host_filter import HostFilter
+    from .helper.import_journal import ImportJournal
+    from .helper.json_stream import iter_items
+    from .helper.mapping_mirror import add_mirror_arguments
+    from .helper.mapping_mirror import MappingMirror
     from .helper.osclient import NeutronClient
+    from .helper.throttle import AimdLimiter
+    from .helper.throttle import backoff_delay
+    from .helper import topology_diff
     from .helper.utils import Utils
 except (ImportError, ValueError):
     from helper import constants
     from helper import script_logging
+    from helper.host_filter import add_limit_argument
+    from helper.host_filter import HostFilter
+    from helper.import_journal import ImportJournal
+    from helper.json_stream import iter_items
+    from helper.mapping_mirror import add_mirror_arguments
+    from helper.mapping_mirror import MappingMirror
     from helper.osclient import NeutronClient
+    from helper.throttle import AimdLimiter
+    from helper.throttle import backoff_delay
+    from helper import topology_diff
     from helper.utils import Utils
 
 
 script_name = 'topology_import'
 LOG = logging.getLogger(script_name)
-interface_of_compute_with_error = {}
-compute_host_name = None
+
+CREATED = 'created'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+RESUMED = 'resumed'
+REMOVED = 'removed'
+
+# neutron answers that mean it is overloaded, worth a retry
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+MAX_WORKERS = 32
+# new mappings sent per bulk create, 1 disables bulk creates
+BULK_SIZE = 100
+# answers to a bulk create meaning neutron does not take bulk bodies
+BULK_UNSUPPORTED_STATUS_CODES = (404, 405, 501)
+# answer to a bulk create meaning a bad mapping or a bulk body refused
+BAD_REQUEST = 400
 
 
 class TopologyReader(object):
-    def __init__(self, path):
+    """Read the compute hosts of a report one at a time from disk.
+
+    With a host_filter, only the compute hosts it matches are read.
+    """
+
+    def __init__(self, path, host_filter=None):
         super(TopologyReader, self).__init__()
         self.path = path
-        self.json_data = self._load_json()
+        self.host_filter = host_filter
+
+    def compute_hosts(self):
+        for compute_host in iter_items(self.path, 'compute-hosts'):
+            if self.host_filter is None or \
+                    self.host_filter.match(compute_host['service_host name']):
+                yield compute_host
 
-    def _load_json(self):
-        with open(self.path) as topology_file:
-            return json.load(topology_file)
+    def host_names(self):
+        return [compute_host['service_host name']
+                for compute_host in self.compute_hosts()]
 
     def interfaces(self):
-        global compute_host_name
-        compute_host_index = 0
-        total_compute_host = len(self.json_data['compute-hosts'])
-        for compute_host in self.json_data['compute-hosts']:
-            compute_host_name = str(self.json_data['compute-hosts']
-                                    [compute_host_index]
-                                    ['service_host name'])
+        # the number of hosts is only known at the end of the report
+        for compute_host_index, compute_host in enumerate(
+                self.compute_hosts(), 1):
+            compute_host_name = str(compute_host['service_host name'])
             msg = "\n Processing Compute Host - " + compute_host_name
-
-            total_compute_host_left = total_compute_host - compute_host_index
-            msg = msg + ", Total Computes Left: %s" % total_compute_host_left
+            msg = msg + ", Compute Host: %s" % compute_host_index
             LOG.user(msg)
-            compute_host_index = compute_host_index + 1
             total_interfaces_within_compute = len(compute_host['interfaces'])
             interfaces_within_compute_index = 0
             for interface in compute_host['interfaces']:
@@ -82,27 +131,44 @@ class TopologyReader(object):
                     yield interface
 
 
+class DiffReader(object):
+    """Read the changes of a diff written by compare_topology.py.
+
+    Added mappings are created and modified ones updated, removed ones are
+    left in neutron. The modified mappings of a diff against an older
+    report, compare_topology.py --base, have a null id and are looked up
+    in neutron before their update. With a host_filter, only the changes
+    of the compute hosts it matches are read.
+    """
+
+    def __init__(self, path, host_filter=None):
+        super(DiffReader, self).__init__()
+        self.path = path
+        self.host_filter = host_filter
+
+    def changes(self):
+        """Yield (interface, action, switchport mapping, existing one)"""
+        actions = {topology_diff.ADDED: CREATED,
+                   topology_diff.MODIFIED: UPDATED,
+                   topology_diff.REMOVED: REMOVED}
+        for record in topology_diff.read_diff(self.path):
+            if self.host_filter is not None and \
+                    not self.host_filter.match(record['host_id']):
+                continue
+            interface = {'host_id': record['host_id'],
+                         'name': record['interface'] or record['pci_slot']}
+            yield (interface, actions[record['change']],
+                   record['new'] or record['old'], record['old'])
+
+
 class TopologyConverter(object):
     def __init__(self, neutronclient):
         super(TopologyConverter, self).__init__()
         self.neutron = neutronclient
 
     def interface_to_mappings(self, interface):
-        base_mapping = {
-            'switch_info': interface['neighbor-system-name'],
-            'switch_id': interface['neighbor-system-mgmt-ip'],
-            'port_id': interface['neighbor-system-port'],
-            'host_id': interface['host_id'],
-            'bridge': interface['ovs-bridge']
-        }
-        interface_mappings = []
-        for virtual_function in interface['vf_info']:
-            vf_mapping = self.function_to_mapping(virtual_function)
-            interface_mapping = dict(base_mapping, **vf_mapping)
-            interface_mappings.append(interface_mapping)
-        vf_mapping = {'pci_slot': interface['name']}
-        interface_mapping = dict(base_mapping, **vf_mapping)
-        interface_mappings.append(interface_mapping)
+        interface_mappings = topology_diff.interface_mappings(
+            interface['host_id'], interface)
 
         with script_logging.indentation():
             if not interface_mappings:
@@ -135,67 +201,394 @@ def create_or_update(converter, switchport_mapping):
             mappings[0]['id'], body)
 
 
-@script_logging.step(description="importing topology")
-def import_interfaces(reader, converter):
-    global compute_host_name, interface_of_compute_with_error
-    for interface in reader.interfaces():
-        with script_logging.indentation():
-            mapping = []
-            for switchport_mapping in converter.interface_to_mappings(
-                    interface):
-                if switchport_mapping:
-                    LOG.debug("Sending %s",
-                              {'switchport_mapping': switchport_mapping})
-                try:
-                    create_or_update(converter, switchport_mapping)
-                    LOG.debug("Successfully imported the SwitchPort Mapping")
-                except Exception as e:
-                    with script_logging.indentation():
-                        msg_arg = {
-                            "error_msg": e.message,
-                            "switchport_mapping": switchport_mapping,
-                            "interface": interface["name"]
-                        }
-                        LOG.user("Failed to import SwitchPort Mapping:"
-                                 "%(switchport_mapping)s" % msg_arg,
-                                 exc_info=True)
-                        LOG.user("ERROR: %(error_msg)s" % msg_arg)
-                        mapping.append(switchport_mapping)
-                    interface_of_compute_with_error.update({
-                        (compute_host_name, interface["name"]): mapping})
-
-    LOG.debug("\n")
-    LOG.debug("-----------------")
-    LOG.debug("  Failure summary")
-    LOG.debug("-------------------")
-    LOG.debug("Errors occurred in:")
-
-    for (compute_name, interface_name), switchport_mapping in \
-            interface_of_compute_with_error.items():
-        with script_logging.indentation():
-            LOG.debug("Compute Host %s" % compute_name)
+def mapping_key(switchport_mapping):
+    return switchport_mapping['host_id'], switchport_mapping['pci_slot']
+
+
+def index_mappings(neutron, host_ids=None):
+    """List the switchport mappings once, indexed by (host_id, pci_slot)
+
+    :param host_ids: only list the mappings of these hosts
+    """
+    if host_ids is None:
+        mappings = neutron.get_switchport_mapping()
+    else:
+        mappings = neutron.get_switchport_mappings_for_hosts(host_ids)
+    return dict((mapping_key(mapping), mapping)
+                for mapping in mappings['switchport_mappings'])
+
+
+def classify(switchport_mapping, index):
+    """Return what importing switchport_mapping takes and the existing one.
+
+    The action is CREATED when no mapping exists for its host and slot,
+    UPDATED when one exists with other values and UNCHANGED otherwise.
+    """
+    existing = index.get(mapping_key(switchport_mapping))
+    if existing is None:
+        return CREATED, None
+    for key, value in switchport_mapping.items():
+        if existing.get(key) != value:
+            return UPDATED, existing
+    return UNCHANGED, existing
+
+
+def write_mapping(converter, action, switchport_mapping, existing=None):
+    """Send the create or update of switchport_mapping to neutron"""
+    if action == CREATED:
+        # the index is a snapshot, so a conflict is still possible
+        create_or_update(converter, switchport_mapping)
+    elif action == UPDATED:
+        mapping_id = existing.get('id')
+        if mapping_id is None:
+            # a diff against an older report has no neutron id
+            mappings = converter.neutron.get_switchport_mapping(
+                host_id=switchport_mapping['host_id'],
+                pci_slot=switchport_mapping['pci_slot'])[
+                'switchport_mappings']
+            if not mappings:
+                create_or_update(converter, switchport_mapping)
+                return
+            mapping_id = mappings[0]['id']
+        try:
+            converter.neutron.update_switchport_mapping(
+                mapping_id, {'switchport_mapping': switchport_mapping})
+        except NotFound:
+            # deleted from neutron since the index or the mirror was read
+            create_or_update(converter, switchport_mapping)
+
+
+def import_mapping(converter, switchport_mapping, index):
+    """Send switchport_mapping to neutron if needed, return the action"""
+    action, existing = classify(switchport_mapping, index)
+    write_mapping(converter, action, switchport_mapping, existing)
+    return action
+
+
+def is_overload(error):
+    """Tell whether a failed neutron call is worth a retry"""
+    return (isinstance(error, ConnectionFailed) or
+            getattr(error, 'status_code', None) in RETRY_STATUS_CODES)
+
+
+class TopologyImporter(object):
+    """Import the switchport mappings of a report into neutron.
+
+    The mappings are compared with the index of the existing ones and
+    only the creates and updates are sent, by a pool of worker threads.
+    New mappings are created in bulk, bulk_size at a time, until neutron
+    turns out not to take bulk creates. With a journal,
+    the mappings neutron acknowledged are recorded and the ones recorded
+    by an earlier run are skipped.
+    The number of requests in flight follows an AimdLimiter, and requests
+    neutron refused for overload are retried with jittered backoff.
+    Failures are kept per host and interface.
+    """
+
+    def __init__(self, converter, index=None, limiter=None,
+                 retries=MAX_RETRIES, bulk_size=BULK_SIZE, journal=None):
+        super(TopologyImporter, self).__init__()
+        self.converter = converter
+        self.index = index
+        self.bulk_size = bulk_size
+        # whether a bulk create went through, telling a bad request about
+        # the bulk body from one about a mapping of it
+        self.bulk_supported = False
+        # why bulk creates were disabled during the run
+        self.bulk_error = None
+        self.journal = journal
+        self.limiter = limiter or AimdLimiter(maximum=MAX_WORKERS)
+        self.retries = retries
+        self.counts = dict.fromkeys((CREATED, UPDATED, UNCHANGED, FAILED,
+                                     RESUMED, REMOVED), 0)
+        # (host, interface) -> [(switchport mapping, error)]
+        self.errors = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def _changes(self, reader):
+        """Yield (interface, action, switchport mapping, existing one)"""
+        if isinstance(reader, DiffReader):
+            for change in reader.changes():
+                yield change
+            return
+        if self.index is None:
+            self.index = index_mappings(self.converter.neutron)
+        for interface in reader.interfaces():
+            for switchport_mapping in \
+                    self.converter.interface_to_mappings(interface):
+                action, existing = classify(switchport_mapping, self.index)
+                yield interface, action, switchport_mapping, existing
+
+    def run(self, reader):
+        """:param reader: a TopologyReader, or a DiffReader to only apply
+                       the changes of a diff
+        """
+        jobs = queue.Queue(maxsize=2 * self.limiter.maximum)
+        workers = [threading.Thread(target=self._work, args=(jobs,))
+                   for _ in range(self.limiter.maximum)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        creates = []
+        try:
+            for interface, action, switchport_mapping, existing in \
+                    self._changes(reader):
+                if self.journal is not None and \
+                        mapping_key(switchport_mapping) in self.journal:
+                    self._done(RESUMED)
+                    continue
+                item = (interface, switchport_mapping, existing)
+                if action in (UNCHANGED, REMOVED):
+                    self._done(action)
+                elif action == UPDATED:
+                    jobs.put((action, [item]))
+                else:
+                    creates.append(item)
+                    if len(creates) >= max(1, self.bulk_size):
+                        jobs.put((CREATED, creates))
+                        creates = []
+            if creates:
+                jobs.put((CREATED, creates))
+        finally:
+            for _ in workers:
+                jobs.put(None)
+            for worker in workers:
+                worker.join()
+        return self.counts
+
+    def _done(self, action, key=None, switchport_mapping=None, error=None):
+        with self.lock:
+            self.counts[action] += 1
+            if error is not None:
+                self.errors.setdefault(key, []).append(
+                    (switchport_mapping, str(error)))
+
+    def _work(self, jobs):
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            action, items = job
+            if action == CREATED:
+                self._create(items)
+            else:
+                for interface, switchport_mapping, existing in items:
+                    self._write(interface, action, switchport_mapping,
+                                existing)
+
+    def _write(self, interface, action, switchport_mapping, existing):
+        try:
+            self._call(1, write_mapping, self.converter, action,
+                       switchport_mapping, existing)
+        except Exception as e:
+            LOG.debug("Failed to import SwitchPort Mapping %s",
+                      switchport_mapping, exc_info=True)
+            self._done(FAILED, (interface['host_id'], interface['name']),
+                       switchport_mapping, e)
+            return False
+        else:
+            LOG.debug("Successfully %s the SwitchPort Mapping %s",
+                      action, switchport_mapping)
+            self._journal([switchport_mapping])
+            self._done(action)
+            return True
+
+    def _create_singly(self, chunk):
+        """Create the mappings of chunk one by one, False if one failed"""
+        succeeded = True
+        for interface, switchport_mapping, _ in chunk:
+            succeeded = self._write(interface, CREATED, switchport_mapping,
+                                    None) and succeeded
+        return succeeded
+
+    def _disable_bulk(self, error):
+        with self.lock:
+            if self.bulk_size == 1:
+                return
+            self.bulk_size = 1
+            self.bulk_error = str(error)
+        LOG.debug("Bulk creates disabled after: %s", error)
+
+    def _create(self, chunk):
+        """Create the mappings of chunk in bulk, halving it on failure.
+
+        A bulk create is all or nothing, so after a failure caused by
+        some of the mappings, as a conflict, the halves are retried until
+        the mappings at fault fail on their own and are reported as usual.
+        A failure of the bulk body itself disables bulk creates for the
+        rest of the run: a 404, 405 or 501, or a 400 before any bulk
+        create went through when the mappings then go through one by one.
+        """
+        if len(chunk) == 1 or self.bulk_size == 1:
+            self._create_singly(chunk)
+            return
+        mappings = [switchport_mapping for _, switchport_mapping, _ in chunk]
+        try:
+            self._call(len(chunk),
+                       self.converter.neutron.create_switchport_mappings,
+                       {'switchport_mappings': mappings})
+        except Exception as e:
+            status_code = getattr(e, 'status_code', None)
+            if status_code in BULK_UNSUPPORTED_STATUS_CODES:
+                self._disable_bulk(e)
+                self._create_singly(chunk)
+                return
+            if status_code == BAD_REQUEST and not self.bulk_supported:
+                # one by one, the mappings tell whether it was about them
+                if self._create_singly(chunk):
+                    self._disable_bulk(e)
+                return
+            LOG.debug("Failed to bulk create %d SwitchPort Mappings, "
+                      "splitting them", len(chunk), exc_info=True)
+            half = len(chunk) // 2
+            self._create(chunk[:half])
+            self._create(chunk[half:])
+        else:
+            LOG.debug("Successfully created the SwitchPort Mappings %s",
+                      mappings)
+            self.bulk_supported = True
+            self._journal(mappings)
+            for _ in chunk:
+                self._done(CREATED)
+
+    def _journal(self, mappings):
+        if self.journal is not None:
+            self.journal.record([mapping_key(switchport_mapping)
+                                 for switchport_mapping in mappings])
+
+    def _call(self, weight, function, *args):
+        """Call neutron within the limiter, retrying on overload.
+
+        The latency of a call is divided by the number of mappings it
+        carries, weight, so bulk and single calls compare.
+        """
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            start = time.time()
+            try:
+                result = function(*args)
+            except Exception as e:
+                overloaded = is_overload(e)
+                self.limiter.release((time.time() - start) / weight,
+                                     overloaded)
+                if not overloaded or attempt >= self.retries:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+            else:
+                self.limiter.release((time.time() - start) / weight)
+                return result
+
+    def log_summary(self):
+        LOG.user("\nSwitchPort Mappings: %(created)s created, "
+                 "%(updated)s updated, %(unchanged)s unchanged, "
+                 "%(failed)s failed" % self.counts)
+        if self.bulk_error is not None:
+            LOG.user("Neutron does not take bulk creates of SwitchPort "
+                     "Mappings (%s), they were created one by one" %
+                     self.bulk_error)
+        if self.counts[RESUMED]:
+            LOG.user("%s SwitchPort Mappings imported by the interrupted "
+                     "run were skipped" % self.counts[RESUMED])
+        if self.counts[REMOVED]:
+            LOG.user("%s SwitchPort Mappings removed from the topology were "
+                     "left in neutron" % self.counts[REMOVED])
+        if not self.errors:
+            return
+        LOG.user("\nErrors occurred in:")
+        for (compute_name, interface_name), failures in \
+                self.errors.items():
             with script_logging.indentation():
-                LOG.debug("Interface Name: %s" % interface_name)
+                LOG.user("Compute Host %s" % compute_name)
                 with script_logging.indentation():
-                    for mapping in switchport_mapping:
-                        LOG.debug("SwitchPort Mapping: %s" % mapping)
+                    LOG.user("Interface Name: %s" % interface_name)
+                    with script_logging.indentation():
+                        for switchport_mapping, error in failures:
+                            LOG.user("SwitchPort Mapping: %s" %
+                                     switchport_mapping)
+                            LOG.user("ERROR: %s" % error)
+
+
+@script_logging.step(description="importing topology")
+def import_interfaces(reader, converter, index=None, resume=False):
+    bulk_size = int(Utils.get_env_var('TC_IMPORT_BULK_SIZE', BULK_SIZE))
+    if index is None and reader.host_filter is not None and \
+            not isinstance(reader, DiffReader):
+        host_ids = reader.host_names()
+        LOG.user("Importing the %s compute hosts matching the limit" %
+                 len(host_ids))
+        index = index_mappings(converter.neutron, host_ids)
+    journal = ImportJournal(reader.path)
+    if not journal.open(resume):
+        LOG.user("The report changed since the interrupted import or it "
+                 "has no journal, importing all of it")
+    elif resume:
+        LOG.user("Resuming the import after %s SwitchPort Mappings" %
+                 len(journal))
+    importer = TopologyImporter(converter, index,
+                                bulk_size=max(1, bulk_size),
+                                journal=journal)
+    try:
+        importer.run(reader)
+    finally:
+        journal.close()
+    if not importer.counts[FAILED]:
+        # a later --resume of this report imports all of it again
+        journal.complete()
+    importer.log_summary()
 
-    LOG.debug("\n")
     log_dir = os.path.expanduser('~') + '/nuage_logs'
-    LOG.user("Complete!! Please check the log file %s for summary" % log_dir)
+    LOG.user("Complete!! Please check the log file %s for details" % log_dir)
+    return importer
+
+
+def mirrored_index(neutron, reader, full_sync=False, max_age=None):
+    """Index the existing mappings from the local mirror, refreshed first.
+
+    The mirror may still hold mappings deleted from neutron since its last
+    full sync, those are taken as existing: it is full synced when older
+    than max_age.
+    """
+    mirror = MappingMirror(constants.MIRROR_FILE)
+    try:
+        count, full = mirror.refresh(neutron, full_sync, max_age)
+        LOG.user("%s the mirror of the SwitchPort Mappings with %s "
+                 "mappings" % ("Synced" if full else "Refreshed", count))
+        host_ids = None
+        if reader.host_filter is not None:
+            host_ids = reader.host_names()
+        return mirror.index(host_ids)
+    finally:
+        mirror.close()
+
+
+def create_parser(prog):
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Import a topology report into neutron")
+    parser.add_argument('report', help="path of the report to import, or "
+                                       "of the diff with --diff")
+    parser.add_argument('--diff', default=False, action='store_true',
+                        help="the report is a json or ndjson diff written by "
+                             "compare_topology.py, only apply its changes")
+    add_mirror_arguments(parser)
+    parser.add_argument('--resume', default=False, action='store_true',
+                        help="skip the mappings imported by an interrupted "
+                             "import of the same report")
+    add_limit_argument(parser)
+    return parser
 
 
 def main(argv):
 
-    if len(argv) != 2:
-        sys.stdout.write("ERROR: Please pass the new report as an argument.\n")
-        sys.exit(1)
+    options = create_parser(os.path.basename(argv[0])).parse_args(argv[1:])
 
     if not script_logging.log_file:
         script_logging.init_logging(script_name)
 
-    if not os.path.exists(argv[1]):
-        sys.stdout.write("ERROR: The report %s does not exist. \n" % argv[1])
+    if not os.path.exists(options.report):
+        sys.stdout.write("ERROR: The report %s does not exist. \n" %
+                         options.report)
         sys.exit(1)
 
     if not Utils.check_user(constants.STACK_USER):
@@ -213,9 +606,16 @@ def main(argv):
     neutron_client = NeutronClient()
     neutron_client.authenticate()
 
-    reader = TopologyReader(argv[1])
+    reader_class = DiffReader if options.diff else TopologyReader
+    reader = reader_class(options.report,
+                          HostFilter(options.limit) if options.limit
+                          else None)
     converter = TopologyConverter(neutron_client)
-    import_interfaces(reader, converter)
+    index = None
+    if options.mirror and not options.diff:
+        index = mirrored_index(neutron_client, reader, options.full_sync,
+                               options.mirror_max_age)
+    import_interfaces(reader, converter, index, resume=options.resume)
 
 
 if __name__ == '__main__':
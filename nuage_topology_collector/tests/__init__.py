@@ -0,0 +1,9 @@
+import os
+
+import ansible.module_utils
+
+# Ansible ships the collector's module_utils along with its modules;
+# make them importable the same way for the unit tests.
+ansible.module_utils.__path__.append(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'module_utils'))
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+#  Copyright 2020 NOKIA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License"); you may
+#  not use this file except in compliance with the License. You may obtain
+#  a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#  WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#  License for the specific language governing permissions and limitations
+#  under the License.
+
+"""Benchmark the bridgeinfo OVSDB sync against a synthetic database.
+
+A private ovsdb-server is started in a temporary directory and loaded
+with one bridge holding the requested number of vhost-user ports, each
+with populated statistics, status and external_ids. An IDL is then synced
+against it registering the full Open_vSwitch schema, and again
+registering only the columns bridgeinfo needs. Each sync runs in its own
+process so that peak resident memory is reported per variant.
+
+Requires ovsdb-tool, ovsdb-server and ovsdb-client in PATH:
+
+    python -m nuage_topology_collector.tests.benchmarks.ovsdb_sync \\
+        --ports 4000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+
+from ansible.module_utils import tc_ovs
+
+DEFAULT_SCHEMA = '/usr/share/openvswitch/vswitch.ovsschema'
+BRIDGE = 'br-bench'
+CHUNK = 100
+STATISTICS = ['rx_packets', 'rx_bytes', 'rx_dropped', 'rx_errors',
+              'tx_packets', 'tx_bytes', 'tx_dropped', 'tx_errors',
+              'collisions', 'rx_crc_err', 'rx_frame_err', 'rx_over_err']
+
+
+def _transact(remote, ops):
+    subprocess.check_output(['ovsdb-client', 'transact', remote,
+                             json.dumps(['Open_vSwitch'] + ops)])
+
+
+def _port_ops(index):
+    name = 'vhu%08d' % index
+    iface = {
+        'name': name,
+        'type': 'dpdkvhostuserclient',
+        'statistics': ['map', [[key, index * 1000 + i]
+                               for i, key in enumerate(STATISTICS)]],
+        'status': ['map', [['mode', 'client'],
+                           ['socket', '/var/lib/vhost_sockets/' + name],
+                           ['numa_id', '0'], ['tx_queues', '4'],
+                           ['rx_queues', '4']]],
+        'external_ids': ['map', [
+            ['iface-id', '%08d-0000-4000-8000-000000000000' % index],
+            ['attached-mac', 'fa:16:3e:%02x:%02x:%02x' % (
+                (index >> 16) & 0xff, (index >> 8) & 0xff, index & 0xff)],
+            ['iface-status', 'active'],
+            ['vm-uuid', '%08d-1111-4000-8000-000000000000' % index]]],
+    }
+    port = {
+        'name': name,
+        'interfaces': ['named-uuid', 'i%d' % index],
+        'external_ids': ['map', [['owner', 'benchmark']]],
+    }
+    return ([{'op': 'insert', 'table': 'Interface', 'row': iface,
+              'uuid-name': 'i%d' % index},
+             {'op': 'insert', 'table': 'Port', 'row': port,
+              'uuid-name': 'p%d' % index}],
+            ['named-uuid', 'p%d' % index])
+
+
+def populate(remote, ports):
+    _transact(remote, [
+        {'op': 'insert', 'table': 'Bridge', 'row': {'name': BRIDGE},
+         'uuid-name': 'br'},
+        {'op': 'insert', 'table': 'Open_vSwitch',
+         'row': {'bridges': ['named-uuid', 'br']}}])
+    for start in range(0, ports, CHUNK):
+        ops = []
+        refs = []
+        for index in range(start, min(start + CHUNK, ports)):
+            port_ops, ref = _port_ops(index)
+            ops.extend(port_ops)
+            refs.append(ref)
+        ops.append({'op': 'mutate', 'table': 'Bridge',
+                    'where': [['name', '==', BRIDGE]],
+                    'mutations': [['ports', 'insert', ['set', refs]]]})
+        _transact(remote, ops)
+
+
+def start_server(workdir, schema):
+    db = os.path.join(workdir, 'conf.db')
+    sock = os.path.join(workdir, 'db.sock')
+    subprocess.check_call(['ovsdb-tool', 'create', db, schema])
+    proc = subprocess.Popen(['ovsdb-server', db, '--remote=punix:' + sock,
+                             '--unixctl=' + os.path.join(workdir, 'ctl')])
+    for _ in range(100):
+        if os.path.exists(sock):
+            break
+        time.sleep(0.1)
+    return proc, 'unix:' + sock
+
+
+def _sync(remote, minimal, queue):
+    from ovsdbapp.backend.ovs_idl import connection
+    from ovsdbapp.backend.ovs_idl import idlutils
+
+    start = time.time()
+    if minimal:
+        idl = connection.OvsdbIdl(remote, tc_ovs.get_schema_helper(remote))
+    else:
+        idl = connection.OvsdbIdl.from_server(remote, 'Open_vSwitch')
+    idlutils.wait_for_change(idl, 600)
+    elapsed = time.time() - start
+    rows = len(idl.tables['Interface'].rows)
+    # ru_maxrss is reported in kilobytes on Linux
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               rows))
+
+
+def measure(remote, minimal):
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_sync,
+                                   args=(remote, minimal, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ports', type=int, default=4000,
+                        help="number of vhost-user ports to create")
+    parser.add_argument('--schema', default=DEFAULT_SCHEMA,
+                        help="path to vswitch.ovsschema")
+    parser.add_argument('--runs', type=int, default=3,
+                        help="syncs per variant, best run is reported")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='tc-ovsdb-bench-')
+    server, remote = start_server(workdir, args.schema)
+    try:
+        populate(remote, args.ports)
+        print("%d ports loaded into %s" % (args.ports, remote))
+        for label, minimal in (('full schema', False),
+                               ('bridgeinfo columns', True)):
+            runs = [measure(remote, minimal) for _ in range(args.runs)]
+            elapsed, maxrss, rows = min(runs)
+            print("%-20s sync %8.3f s  peak rss %8d KiB  interfaces %d" %
+                  (label, elapsed, maxrss, rows))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
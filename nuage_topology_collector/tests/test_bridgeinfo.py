@@ -0,0 +1,169 @@
+import mock
+import os
+import shutil
+import tempfile
+import testtools
+
+from ovs.db import idl
+from ovsdbapp.backend.ovs_idl import connection
+from ovsdbapp.backend.ovs_idl import idlutils
+from ovsdbapp.schema.open_vswitch import impl_idl
+
+from ansible.module_utils import tc_ovs
+
+from nuage_topology_collector.library import bridgeinfo
+
+
+def _ref(table):
+    return {'type': {'key': {'type': 'uuid', 'refTable': table},
+                     'min': 0, 'max': 'unlimited'}}
+
+
+SCHEMA = {
+    'name': 'Open_vSwitch',
+    'version': '8.2.0',
+    'tables': {
+        'Open_vSwitch': {
+            'columns': {
+                'bridges': _ref('Bridge'),
+                'next_cfg': {'type': 'integer'},
+                'cur_cfg': {'type': 'integer'}},
+            'isRoot': True},
+        'Bridge': {
+            'columns': {
+                'name': {'type': 'string'},
+                'ports': _ref('Port'),
+                'external_ids': {'type': {'key': 'string',
+                                          'value': 'string',
+                                          'min': 0, 'max': 'unlimited'}}}},
+        'Port': {
+            'columns': {
+                'name': {'type': 'string'},
+                'interfaces': _ref('Interface'),
+                'tag': {'type': {'key': 'integer', 'min': 0, 'max': 1}}}},
+        'Interface': {
+            'columns': {
+                'name': {'type': 'string'},
+                'type': {'type': 'string'},
+                'statistics': {'type': {'key': 'string',
+                                        'value': 'integer',
+                                        'min': 0, 'max': 'unlimited'},
+                               'ephemeral': True}}},
+        'Manager': {
+            'columns': {'target': {'type': 'string'}}},
+    }
+}
+
+
+class TestBridgeInfo(testtools.TestCase):
+
+    def _idl_schema(self, columns=None):
+        helper = idl.SchemaHelper(schema_json=SCHEMA)
+        with mock.patch.object(idlutils, 'get_schema_helper',
+                               return_value=helper) as get_helper:
+            tc_ovs.get_schema_helper('unix:/tmp/db.sock', columns)
+        get_helper.assert_called_once_with('unix:/tmp/db.sock',
+                                           'Open_vSwitch')
+        return helper.get_idl_schema()
+
+    def test_schema_helper_registers_bridgeinfo_columns(self):
+        schema = self._idl_schema()
+        self.assertEqual({'Bridge', 'Port', 'Interface'},
+                         set(schema.tables))
+        for table, columns in tc_ovs.OVSDB_SCHEMA_COLUMNS.items():
+            self.assertEqual(set(columns),
+                             set(schema.tables[table].columns) - {'_uuid'})
+
+    def test_schema_helper_custom_columns(self):
+        schema = self._idl_schema({'Open_vSwitch': ['next_cfg']})
+        self.assertEqual(['Open_vSwitch'], list(schema.tables))
+        self.assertNotIn('cur_cfg', schema.tables['Open_vSwitch'].columns)
+
+    @mock.patch.object(impl_idl.OvsdbIdl, '__init__', return_value=None)
+    @mock.patch.object(connection, 'Connection')
+    @mock.patch.object(connection, 'OvsdbIdl')
+    @mock.patch.object(tc_ovs, 'get_schema_helper')
+    def test_query_endpoint(self, get_helper, *mocks):
+        module = mock.Mock()
+        tc_ovs.OvsdbQuery(module, 'unix:/var/run/openvswitch/db.sock', {})
+        self.assertFalse(module.fail_json.called)
+        get_helper.assert_called_once_with(
+            'unix:/var/run/openvswitch/db.sock')
+
+    def test_unix_socket_endpoint(self):
+        self.assertEqual('unix:/var/run/openvswitch/db.sock',
+                         bridgeinfo.get_endpoint(
+                             {'host': '127.0.0.1', 'port': '6640',
+                              'socket': '/var/run/openvswitch/db.sock'}))
+
+    def test_tcp_endpoint(self):
+        self.assertEqual('tcp:10.0.0.5:6641',
+                         bridgeinfo.get_endpoint(
+                             {'host': '10.0.0.5', 'port': '6641',
+                              'socket': None}))
+
+
+class TestBridgeInfoCache(testtools.TestCase):
+
+    BRINFO = {'eth0': {'bridge': 'br-ex', 'type': 'system'}}
+
+    def setUp(self):
+        super(TestBridgeInfoCache, self).setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.cache_file = os.path.join(tmp_dir, 'cache', 'bridgeinfo.json')
+        self.state = {'uuid': 'b6e0a7b2-6a2b-4bd7-a4c6-5c7b8a8e0d41',
+                      'next_cfg': 10, 'cur_cfg': 10}
+        self.bridge_mappings = {'physnet1': 'br-ex'}
+        self.module = mock.Mock()
+
+    def _get_bridge_info(self):
+        return tc_ovs.get_bridge_info(self.module,
+                                      'unix:/var/run/openvswitch/db.sock',
+                                      self.bridge_mappings, self.cache_file)
+
+    def _run(self):
+        state = dict(self.state)
+        with mock.patch.object(tc_ovs, 'get_ovs_cfg_state',
+                               return_value=state), \
+                mock.patch.object(tc_ovs, 'OvsdbQuery') as query:
+            query.return_value.get_ovs_topology.return_value = self.BRINFO
+            brinfo, cached = self._get_bridge_info()
+        self.assertEqual(self.BRINFO, brinfo)
+        self.assertEqual(not cached, query.called)
+        return cached
+
+    def test_cache_hit(self):
+        self.assertFalse(self._run())
+        self.assertTrue(os.path.isfile(self.cache_file))
+        self.assertTrue(self._run())
+
+    def test_cache_invalidated(self):
+        changes = [('next_cfg', 11), ('cur_cfg', 11),
+                   ('uuid', '0d2b5e8c-2f1e-4c55-9a4f-5d0f0b9d6c11')]
+        self.assertFalse(self._run())
+        for column, value in changes:
+            self.state[column] = value
+            self.assertFalse(self._run())
+            self.assertTrue(self._run())
+
+    def test_cache_invalidated_on_bridge_mappings(self):
+        self.assertFalse(self._run())
+        self.bridge_mappings = {'physnet2': 'br-ex'}
+        self.assertFalse(self._run())
+
+    def test_cache_disabled_without_cfg_state(self):
+        with mock.patch.object(tc_ovs, 'get_ovs_cfg_state',
+                               side_effect=IOError('refused')), \
+                mock.patch.object(tc_ovs, 'OvsdbQuery') as query:
+            query.return_value.get_ovs_topology.return_value = self.BRINFO
+            self.assertEqual((self.BRINFO, False),
+                             self._get_bridge_info())
+        self.assertFalse(os.path.exists(self.cache_file))
+
+    def test_corrupt_cache_ignored(self):
+        os.makedirs(os.path.dirname(self.cache_file))
+        with open(self.cache_file, 'w') as cache_file:
+            cache_file.write('{"key":')
+        self.assertFalse(self._run())
+        self.assertTrue(self._run())
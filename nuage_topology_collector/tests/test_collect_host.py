@@ -0,0 +1,201 @@
+import mock
+import os
+import shutil
+import tempfile
+import testtools
+
+from ansible.module_utils import tc_fingerprint
+
+from nuage_topology_collector.library import collect_host
+
+NOKIA_LLDP = [
+    [1, "0450e0ef38aed1"],
+    [2, "073335393133373238"],
+    [3, "0015"],
+    [5, "616e6532652d7372696f7630322d7762783031"],
+    [6, '54694d4f532d44432d422d362e302e31302d333831206'
+        '26f74682f783836204e554147452032313020436f7079'
+        '72696768742028632920323030302d32303230204e6f6'
+        'b69612e'],
+    [8, '05010a1efe28020000000128000000010000000300000'
+        '0060000000100000004000000010000197f0000000100'
+        '00001200000004']]
+
+
+class TestCollectHost(testtools.TestCase):
+
+    def _module(self, **params):
+        defaults = {
+            'service_host': 'compute-0.localdomain',
+            'device_mappings': None,
+            'bridge_mappings': None,
+            'interface_regex': 'en|dpdk',
+            'ovsdb_socket': '/var/run/openvswitch/db.sock',
+            'cache_file': None,
+            'lldp_timeout': 30,
+            'decode': True,
+            'fingerprint': None
+        }
+        defaults.update(params)
+        return mock.Mock(params=defaults)
+
+    def test_interfaces_sriov_only(self):
+        module = self._module(device_mappings={'physnet1': ['ens1f0'],
+                                               'physnet2': ['ens1f1']})
+        with mock.patch.object(collect_host, 'get_bridge_info') as brinfo:
+            interfaces, ovs_bridges = collect_host.get_interfaces(module)
+        self.assertFalse(brinfo.called)
+        self.assertEqual(['ens1f0', 'ens1f1'], sorted(interfaces))
+        self.assertEqual({}, ovs_bridges)
+
+    @mock.patch.object(collect_host, 'get_aggregate_slaves',
+                       return_value={'bond0': ['ens2f0', 'ens2f1']})
+    @mock.patch.object(collect_host, 'get_bridge_info')
+    def test_interfaces_ovs_and_sriov(self, get_bridge_info, _slaves):
+        get_bridge_info.return_value = (
+            {'bond0': {'bridge': 'br-ex', 'type': 'system'},
+             'dpdk0': {'bridge': 'br-dpdk', 'type': 'dpdk'},
+             'vhu1234': {'bridge': 'br-dpdk', 'type': 'dpdkvhostuser'}},
+            False)
+        module = self._module(device_mappings={'physnet1': ['ens1f0',
+                                                            'ens2f0']},
+                              bridge_mappings={'physnet2': 'br-ex',
+                                               'physnet3': 'br-dpdk'})
+        interfaces, ovs_bridges = collect_host.get_interfaces(module)
+        get_bridge_info.assert_called_once_with(
+            module, 'unix:/var/run/openvswitch/db.sock',
+            {'physnet2': 'br-ex', 'physnet3': 'br-dpdk'}, None)
+        self.assertEqual({'ens2f0': {'bridge': 'br-ex', 'type': None},
+                          'ens2f1': {'bridge': 'br-ex', 'type': None},
+                          'dpdk0': {'bridge': 'br-dpdk', 'type': 'dpdk'}},
+                         ovs_bridges)
+        self.assertEqual(['ens1f0', 'ens2f0'], interfaces[:2])
+        self.assertEqual(['dpdk0', 'ens1f0', 'ens2f0', 'ens2f1'],
+                         sorted(interfaces))
+
+    def test_decode(self):
+        itfinfo = {'ens2f0': {'lldp': NOKIA_LLDP,
+                              'vfinfo': {'name': 'ens2f0',
+                                         'vf_info': []}}}
+        itf_list = collect_host.decode(
+            self._module(), itfinfo,
+            {'ens2f0': {'bridge': 'br-ex', 'type': None}})
+        self.assertEqual([{'name': 'ens2f0',
+                           'vf_info': [],
+                           'neighbor-system-name': 'ane2e-sriov02-wbx01',
+                           'neighbor-system-mgmt-ip': '10.30.254.40',
+                           'neighbor-system-port': '1/1/8',
+                           'ovs-bridge': 'br-ex'}], itf_list)
+
+    def test_decode_failure(self):
+        module = self._module()
+        module.fail_json.side_effect = SystemExit
+        itfinfo = {'ens2f0': {'lldp': NOKIA_LLDP[:5],
+                              'vfinfo': {'name': 'ens2f0',
+                                         'vf_info': []}}}
+        self.assertRaises(SystemExit, collect_host.decode, module,
+                          itfinfo, {})
+        self.assertIn('ens2f0', module.fail_json.call_args[1]['msg'])
+
+
+class TestHostFingerprint(testtools.TestCase):
+
+    INPUTS = {'device_mappings': {'physnet1': ['ens1f0']},
+              'bridge_mappings': {'physnet2': 'br-ex'}}
+
+    def setUp(self):
+        super(TestHostFingerprint, self).setUp()
+        self.sys_class_net = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.sys_class_net)
+        self.ovs_state = {'uuid': 'b6e0a7b2-6a2b-4bd7-a4c6-5c7b8a8e0d41',
+                          'next_cfg': 10, 'cur_cfg': 10}
+        self._netdev('ens1f0', ifindex=2, carrier_changes=1, numvfs=4)
+        self._netdev('ens1f1', ifindex=3, carrier_changes=1)
+        self._netdev('ens1f0v0', ifindex=10, carrier_changes=1, vf=True)
+        os.mkdir(os.path.join(self.sys_class_net, 'tap0'))
+
+    def _netdev(self, name, vf=False, numvfs=None, **counters):
+        device = os.path.join(self.sys_class_net, name, 'device')
+        os.makedirs(device)
+        if vf:
+            os.mkdir(os.path.join(device, 'physfn'))
+        if numvfs is not None:
+            counters['device/sriov_numvfs'] = numvfs
+        for counter, value in counters.items():
+            with open(os.path.join(self.sys_class_net, name,
+                                   counter), 'w') as f:
+                f.write('%s\n' % value)
+
+    def _fingerprint(self, inputs=None):
+        with mock.patch.object(tc_fingerprint, 'get_ovs_cfg_state',
+                               return_value=dict(self.ovs_state)):
+            return tc_fingerprint.get_fingerprint(
+                inputs or self.INPUTS, 'unix:/var/run/openvswitch/db.sock',
+                self.sys_class_net)
+
+    def test_netdev_state(self):
+        self.assertEqual({'ens1f0': ['2', '1', '4'],
+                          'ens1f1': ['3', '1', None]},
+                         tc_fingerprint.get_netdev_state(self.sys_class_net))
+
+    def test_stable(self):
+        fingerprint = self._fingerprint()
+        # VFs and virtual devices come and go with the instances
+        self._netdev('ens1f0v1', ifindex=11, carrier_changes=1, vf=True)
+        os.mkdir(os.path.join(self.sys_class_net, 'tap1'))
+        self.ovs_state['cur_cfg'] = 9
+        self.assertEqual(fingerprint, self._fingerprint())
+
+    def test_changed(self):
+        fingerprint = self._fingerprint()
+        with open(os.path.join(self.sys_class_net, 'ens1f1',
+                               'carrier_changes'), 'w') as f:
+            f.write('3\n')
+        changed = self._fingerprint()
+        self.assertNotEqual(fingerprint, changed)
+        self.ovs_state['next_cfg'] = 11
+        self.assertNotEqual(changed, self._fingerprint())
+        self.assertNotEqual(
+            self._fingerprint(),
+            self._fingerprint({'device_mappings': {'physnet1': ['ens1f1']},
+                               'bridge_mappings': {'physnet2': 'br-ex'}}))
+
+    def test_no_fingerprint_without_ovs_state(self):
+        with mock.patch.object(tc_fingerprint, 'get_ovs_cfg_state',
+                               side_effect=IOError('refused')):
+            self.assertIsNone(tc_fingerprint.get_fingerprint(
+                self.INPUTS, 'unix:/var/run/openvswitch/db.sock',
+                self.sys_class_net))
+
+    @mock.patch.object(collect_host, 'collect_interfaces')
+    @mock.patch.object(collect_host, 'get_host_fingerprint',
+                       return_value='1f2e')
+    @mock.patch.object(collect_host, 'AnsibleModule')
+    def test_unchanged_host_not_collected(self, module, *mocks):
+        module.return_value.params = {'fingerprint': '1f2e',
+                                      'incremental': True}
+        module.return_value.exit_json.side_effect = SystemExit
+        self.assertRaises(SystemExit, collect_host.main)
+        self.assertFalse(collect_host.collect_interfaces.called)
+        result = module.return_value.exit_json.call_args[1]
+        self.assertTrue(result['unchanged'])
+        self.assertEqual('1f2e', result['fingerprint'])
+
+    @mock.patch.object(collect_host, 'decode', return_value=None)
+    @mock.patch.object(collect_host, 'collect_interfaces', return_value={})
+    @mock.patch.object(collect_host, 'get_interfaces',
+                       return_value=([], {}))
+    @mock.patch.object(collect_host, 'get_host_fingerprint')
+    @mock.patch.object(collect_host, 'AnsibleModule')
+    def test_no_fingerprint_outside_incremental_mode(self, module,
+                                                     get_host_fingerprint,
+                                                     *mocks):
+        module.return_value.params = {'fingerprint': None,
+                                      'incremental': False,
+                                      'lldp_timeout': 30, 'decode': True}
+        module.return_value.exit_json.side_effect = SystemExit
+        self.assertRaises(SystemExit, collect_host.main)
+        self.assertFalse(get_host_fingerprint.called)
+        result = module.return_value.exit_json.call_args[1]
+        self.assertIsNone(result['fingerprint'])
+        self.assertFalse(result['unchanged'])
@@ -1,8 +1,11 @@
+import copy
 import filecmp
 import json
 import mock
 import os
+import shutil
 import sys
+import tempfile
 import testtools
 
 try:
@@ -11,6 +14,7 @@ except ImportError:
     from io import StringIO  # for Python 3
 
 from nuage_topology_collector.scripts import compare_topology
+from nuage_topology_collector.scripts.helper import constants
 from nuage_topology_collector.scripts.helper.utils import Utils
 
 TESTS_PATH = 'nuage_topology_collector/tests/'
@@ -66,3 +70,127 @@ class CompareTopology(testtools.TestCase):
         self.assertTrue(filecmp.cmp(mock_generated_output_path,
                                     mock_expected_output_path),
                         'The output does not match the expected output')
+
+    @mock.patch.object(Utils, 'check_user', return_value=True)
+    @mock.patch.object(os.path, 'isfile', return_value=True)
+    @mock.patch.object(Utils, 'source_rc_files', return_value=None)
+    def test_limit(self, *mocks):
+        new_report_path = os.path.join(
+            os.getcwd(), INPUTS_PATH + 'compare_topology_new.json')
+        with mock.patch.object(compare_topology, 'create_old_report',
+                               return_value=[]) as create_old_report:
+            with Capturing() as output:
+                compare_topology.main(
+                    ['compare_topology.py', new_report_path, '--limit',
+                     'overcloud-Ovs*,overcloud-SriovPerformanceCompute-0,'
+                     'compute-9'])
+        create_old_report.assert_called_once_with(
+            ['compute-9', 'overcloud-OvsCompute-0.localdomain',
+             'overcloud-SriovPerformanceCompute-0',
+             'overcloud-SriovPerformanceCompute-0.localdomain'])
+        self.assertEqual(['No existing imported topology.'], output)
+
+        with mock.patch.object(compare_topology, 'create_old_report',
+                               return_value=old_report_json):
+            with Capturing() as output:
+                compare_topology.main(
+                    ['compare_topology.py', new_report_path, '--limit',
+                     'overcloud-AvrsReadyCompute-0'])
+        self.assertFalse([line for line in output if
+                          'SriovPerformanceCompute' in line])
+
+    @mock.patch.object(Utils, 'check_user', return_value=True)
+    @mock.patch.object(os.path, 'isfile', return_value=True)
+    @mock.patch.object(Utils, 'source_rc_files', return_value=None)
+    def test_stream(self, *mocks):
+        new_report_path = os.path.join(
+            os.getcwd(), INPUTS_PATH + 'compare_topology_new.json')
+        sorted_old = sorted(old_report_json, key=lambda port: (
+            port['host_id'].upper(), port['pci_slot'].upper()))
+        with mock.patch.object(compare_topology, 'stream_old_report',
+                               return_value=iter(sorted_old)):
+            with Capturing() as output:
+                compare_topology.main(['compare_topology.py',
+                                       new_report_path, '--stream'])
+        with open(OUTPUT_PATH + 'test_compare_topology') as expected:
+            # the same changes, in host_id and pci_slot order
+            self.assertEqual(
+                sorted(expected.read().strip().split('\n\n')),
+                sorted('\n'.join(output).strip().split('\n\n')))
+
+    def test_base(self):
+        base_path = os.path.join(
+            os.getcwd(), INPUTS_PATH + 'compare_topology_new.json')
+        with open(base_path) as base_file:
+            base = json.load(base_file)
+        new = copy.deepcopy(base)
+        interfaces = dict((interface['name'], interface) for interface in
+                          new['compute-hosts'][0]['interfaces'])
+        interfaces['ens6f0']['neighbor-system-port'] = '1/1/6'
+        interfaces['ens6f0']['neighbor-system-name'] = 'cas-sf6-015'
+        interfaces['ens3f1']['ovs-bridge'] = 'br-sriov'
+        interfaces['ens3f1']['vf_info'].append(
+            interfaces['ens6f0']['vf_info'].pop())
+        interfaces['ens6f6']['vf_info'].append({'device-name': 'virtfn0',
+                                                'pci-id': '0000:81:17.0'})
+        new['compute-hosts'].pop()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        new_path = os.path.join(tmp_dir, 'new.json')
+        with open(new_path, 'w') as new_file:
+            json.dump(new, new_file)
+
+        with mock.patch.object(compare_topology, 'create_old_report') as \
+                create_old_report:
+            with Capturing() as output:
+                compare_topology.main(['compare_topology.py', new_path,
+                                       '--base', base_path])
+        self.assertFalse(create_old_report.called)
+        host = 'overcloud-SriovPerformanceCompute-0.localdomain'
+        self.assertEqual(
+            ['Port Modified : %s, 0000:81:00.2' % host,
+             '10.101.2.114, 1/1/5 ===> 10.101.2.114, 1/1/6',
+             'Neighbor : cas-sf6-014 ===> cas-sf6-015',
+             'Port Modified : %s, 0000:81:0c.0' % host,
+             '10.101.2.114, 1/1/5 ===> 10.101.2.114, 1/1/8',
+             'Bridge : None ===> br-sriov',
+             'VF moved : ens6f0 ===> ens3f1',
+             'Port Modified : %s, ens6f0' % host,
+             '10.101.2.114, 1/1/5 ===> 10.101.2.114, 1/1/6',
+             'Neighbor : cas-sf6-014 ===> cas-sf6-015',
+             'Port Modified : %s, 0000:03:03.1' % host,
+             '10.101.2.114, 1/1/8 ===> 10.101.2.114, 1/1/8',
+             'Bridge : None ===> br-sriov',
+             'Port Modified : %s, ens3f1' % host,
+             '10.101.2.114, 1/1/8 ===> 10.101.2.114, 1/1/8',
+             'Bridge : None ===> br-sriov'] +
+            ['Port deleted : overcloud-AvrsReadyCompute-0.localdomain, ' +
+             name for name in ('ens6f0', 'ens6f1', 'tenant-bond')] +
+            ['New Port added: %s, 0000:81:17.0 ===> None, None' % host],
+            [line for line in output if line])
+
+    @mock.patch.object(Utils, 'check_user', return_value=True)
+    @mock.patch.object(Utils, 'source_rc_files', return_value=None)
+    def test_mirror(self, *mocks):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        neutron = mock.Mock()
+        # the mirror keeps one mapping per id, as neutron has them
+        neutron.iter_switchport_mappings.return_value = iter(
+            dict(port, id='id-%d' % index)
+            for index, port in enumerate(old_report_json))
+        new_report_path = os.path.join(
+            os.getcwd(), INPUTS_PATH + 'compare_topology_new.json')
+        with mock.patch.object(constants, 'MIRROR_FILE',
+                               os.path.join(tmp_dir, 'mirror.sqlite')), \
+                mock.patch.object(constants, 'OVERCLOUDRC_FILE', __file__), \
+                mock.patch.object(compare_topology, 'neutron_client_factory',
+                                  return_value=neutron):
+            with Capturing() as output:
+                compare_topology.main(['compare_topology.py',
+                                       new_report_path, '--mirror'])
+        neutron.iter_switchport_mappings.assert_called_once_with()
+        with open(OUTPUT_PATH + 'test_compare_topology') as expected:
+            self.assertEqual(
+                sorted(expected.read().strip().split('\n\n')),
+                sorted('\n'.join(output).strip().split('\n\n')))
@@ -0,0 +1,100 @@
+import mock
+import os
+import shutil
+import tempfile
+import testtools
+
+from nuage_topology_collector.scripts import generate_topology
+from nuage_topology_collector.scripts.helper import utils
+
+MiB = 1024 * 1024
+
+
+class TestShards(testtools.TestCase):
+
+    def test_split_shards(self):
+        hosts = ['compute-%d' % i for i in range(5)]
+        self.assertEqual([['compute-0', 'compute-2', 'compute-4'],
+                          ['compute-1', 'compute-3']],
+                         generate_topology.split_shards(hosts, 2))
+        self.assertEqual([['compute-0'], ['compute-1']],
+                         generate_topology.split_shards(hosts[:2], 4))
+
+    @mock.patch('multiprocessing.cpu_count', return_value=8)
+    def test_default_shards(self, _):
+        self.assertEqual(1, generate_topology.default_shards(10))
+        self.assertEqual(4, generate_topology.default_shards(100))
+        self.assertEqual(8, generate_topology.default_shards(1000))
+
+
+class TestForks(testtools.TestCase):
+
+    def _forks(self, host_count, processes=1, cpus=4,
+               available_memory=8 * MiB * 1024):
+        return utils.auto_forks(host_count, processes,
+                                fork_memory=100 * MiB,
+                                available_memory=available_memory,
+                                cpus=cpus)
+
+    def test_one_fork_per_host(self):
+        self.assertEqual(10, self._forks(10))
+        self.assertEqual(1, self._forks(0))
+
+    def test_limited_by_memory(self):
+        self.assertEqual(61, self._forks(500))
+        self.assertEqual(30, self._forks(500, processes=2))
+        self.assertEqual(1, self._forks(500, available_memory=MiB))
+
+    def test_limited_by_cpus(self):
+        self.assertEqual(25, self._forks(500, cpus=1))
+
+    @mock.patch.object(utils, 'get_available_memory', return_value=None)
+    def test_unknown_memory(self, _):
+        self.assertEqual(100, self._forks(500, available_memory=None))
+
+    def test_fork_memory_file(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'cache', 'fork-memory')
+        self.assertEqual(utils.DEFAULT_FORK_MEMORY,
+                         utils.load_fork_memory(path))
+        utils.save_fork_memory(50 * MiB, path)
+        self.assertEqual(50 * MiB, utils.load_fork_memory(path))
+
+    def test_configured_forks(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('ANSIBLE_FORKS', None)
+            self.assertIsNone(utils.configured_forks())
+            os.environ['ANSIBLE_FORKS'] = '7'
+            self.assertEqual(7, utils.configured_forks())
+
+    def _run_sharded(self, configured):
+        with mock.patch.object(generate_topology, 'run_ansible') as \
+                run_ansible, \
+                mock.patch.object(generate_topology, 'configured_forks',
+                                  return_value=configured), \
+                mock.patch.object(generate_topology, 'auto_forks',
+                                  return_value=4), \
+                mock.patch('multiprocessing.Process') as process:
+            process.return_value.exitcode = 0
+            generate_topology.run_sharded([['compute-0'], ['compute-1']],
+                                          mock.Mock(forks=None),
+                                          '/tc/tc_inventory.yml', {})
+        # the prepare and report runs of the sharding parent
+        self.assertEqual(
+            [False, False],
+            [c[1]['measure_workers'] for c in run_ansible.call_args_list])
+        return [c[1]['args'][1].forks for c in process.call_args_list]
+
+    def test_sharded_forks(self):
+        self.assertEqual([4, 4], self._run_sharded(None))
+        # the shard runs pick the configured forks themselves
+        self.assertEqual([None, None], self._run_sharded(7))
+
+    @mock.patch.object(generate_topology, 'run_ansible', return_value=0)
+    def test_shard_not_measured(self, run_ansible):
+        self.assertRaises(SystemExit, generate_topology._run_shard,
+                          'topology.yml', None, 'tc_inventory.yml', {})
+        run_ansible.assert_called_once_with(
+            'topology.yml', None, ['tc_inventory.yml'], {},
+            measure_workers=False)
@@ -0,0 +1,47 @@
+import mock
+import testtools
+
+from nuage_topology_collector.scripts.helper.host_filter import HostFilter
+from nuage_topology_collector.scripts.helper.osclient import NeutronClient
+
+
+class TestHostFilter(testtools.TestCase):
+
+    def test_match(self):
+        host_filter = HostFilter('compute-0, rack2-*,,compute-1.localdomain')
+        self.assertEqual(['compute-0', 'rack2-*', 'compute-1.localdomain'],
+                         host_filter.patterns)
+        self.assertEqual(['compute-0', 'compute-1.localdomain'],
+                         host_filter.names)
+        for name in ('compute-0', 'compute-0.localdomain',
+                     'rack2-compute-7.localdomain', 'compute-1.localdomain'):
+            self.assertTrue(host_filter.match(name), name)
+        for name in ('compute-00.localdomain', 'compute-1',
+                     'rack1-compute-0.localdomain'):
+            self.assertFalse(host_filter.match(name), name)
+
+
+class TestHostQueries(testtools.TestCase):
+
+    def test_mappings_for_hosts(self):
+        neutron = NeutronClient()
+        with mock.patch.object(
+                neutron, 'get_switchport_mapping',
+                side_effect=lambda host_id: {'switchport_mappings': [
+                    {'host_id': host_id, 'pci_slot': slot}
+                    for slot in ('a', 'b')]}) as get:
+            mappings = neutron.get_switchport_mappings_for_hosts(
+                ['compute-%d' % i for i in range(40)], workers=8)
+        self.assertEqual(40, get.call_count)
+        self.assertEqual([('compute-%d' % i, slot) for i in range(40)
+                          for slot in ('a', 'b')],
+                         [(m['host_id'], m['pci_slot'])
+                          for m in mappings['switchport_mappings']])
+
+    def test_error(self):
+        neutron = NeutronClient()
+        with mock.patch.object(neutron, 'get_switchport_mapping',
+                               side_effect=ValueError('boom')):
+            self.assertRaises(ValueError,
+                              neutron.get_switchport_mappings_for_hosts,
+                              ['compute-0', 'compute-1'])
@@ -0,0 +1,101 @@
+import json
+import mock
+import os
+import shutil
+import tempfile
+import testtools
+
+from nuage_topology_collector.scripts.helper import import_journal
+from nuage_topology_collector.scripts.helper.import_journal import \
+    ImportJournal
+
+
+class TestImportJournal(testtools.TestCase):
+
+    def setUp(self):
+        super(TestImportJournal, self).setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.report = os.path.join(tmp_dir, 'report.json')
+        self._write_report({'compute-hosts': []})
+
+    def _write_report(self, report):
+        with open(self.report, 'w') as report_file:
+            json.dump(report, report_file)
+
+    def _journal(self, resume, keys=()):
+        journal = ImportJournal(self.report)
+        self.addCleanup(journal.close)
+        resumed = journal.open(resume)
+        if keys:
+            journal.record(keys)
+        journal.close()
+        return resumed, journal
+
+    def test_resume(self):
+        self._journal(False, [('compute-0', '0000:81:00.2')])
+        self._journal(True, [('compute-0', '0000:81:00.3'),
+                             ('compute-1', '0000:81:00.2')])
+        resumed, journal = self._journal(True)
+        self.assertTrue(resumed)
+        self.assertEqual(3, len(journal))
+        self.assertIn(('compute-1', '0000:81:00.2'), journal)
+        self.assertEqual(self.report + '.journal', journal.path)
+
+    def test_not_resumed(self):
+        self._journal(False, [('compute-0', '0000:81:00.2')])
+        # starting over drops the earlier journal
+        self.assertEqual((True, 0), (self._journal(False)[0],
+                                     len(self._journal(True)[1])))
+
+    def test_report_changed(self):
+        self._journal(False, [('compute-0', '0000:81:00.2')])
+        self._write_report({'compute-hosts': [{}]})
+        resumed, journal = self._journal(True)
+        self.assertFalse(resumed)
+        self.assertEqual(0, len(journal))
+
+    def test_no_journal(self):
+        resumed, journal = self._journal(True)
+        self.assertFalse(resumed)
+        self.assertEqual(0, len(journal))
+
+    def test_torn_line(self):
+        _, journal = self._journal(False, [('compute-0', '0000:81:00.2')])
+        with open(journal.path, 'a') as journal_file:
+            journal_file.write('["compute-0", "0000:8')
+        self._journal(True, [('compute-0', '0000:81:00.3')])
+        resumed, journal = self._journal(True)
+        self.assertTrue(resumed)
+        self.assertEqual({('compute-0', '0000:81:00.2'),
+                          ('compute-0', '0000:81:00.3')}, journal.done)
+
+    def test_group_sync(self):
+        journal = ImportJournal(self.report, sync_lines=3, sync_interval=60)
+        self.addCleanup(journal.close)
+        with mock.patch.object(import_journal.os, 'fsync') as fsync:
+            journal.open()
+            self.assertEqual(1, fsync.call_count)
+            for i in range(7):
+                journal.record([('compute-0', '0000:81:00.%d' % i)])
+            self.assertEqual(3, fsync.call_count)
+            journal.close()
+            self.assertEqual(4, fsync.call_count)
+        resumed, journal = self._journal(True)
+        self.assertEqual(7, len(journal))
+
+    def test_sync_interval(self):
+        journal = ImportJournal(self.report, sync_lines=1000,
+                                sync_interval=0)
+        self.addCleanup(journal.close)
+        with mock.patch.object(import_journal.os, 'fsync') as fsync:
+            journal.open()
+            journal.record([('compute-0', '0000:81:00.2')])
+            self.assertEqual(2, fsync.call_count)
+
+    def test_complete(self):
+        _, journal = self._journal(False, [('compute-0', '0000:81:00.2')])
+        journal.complete()
+        self.assertFalse(os.path.exists(journal.path))
+        self.assertEqual((False, 0), (self._journal(True)[0],
+                                      len(self._journal(True)[1])))
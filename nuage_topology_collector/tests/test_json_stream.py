@@ -0,0 +1,73 @@
+import io
+import json
+import mock
+import os
+import shutil
+import tempfile
+import testtools
+
+from nuage_topology_collector.scripts.helper import json_stream
+
+INPUTS_PATH = 'nuage_topology_collector/tests/inputs/'
+
+
+class TestJsonStream(testtools.TestCase):
+
+    def _items(self, text, key='compute-hosts', chunk_size=7):
+        return list(json_stream._iter_items(io.StringIO(text), key,
+                                            chunk_size))
+
+    def test_report(self):
+        path = INPUTS_PATH + 'compare_topology_new.json'
+        with open(path) as report_file:
+            expected = json.load(report_file)['compute-hosts']
+        for chunk_size in (1, 13, 4096):
+            with io.open(path, encoding='utf-8') as report_file:
+                self.assertEqual(expected, list(json_stream._iter_items(
+                    report_file, 'compute-hosts', chunk_size)))
+
+    def test_keys_around_the_array(self):
+        text = (u'{"datetime": "x", "skipped": {"a": [1, {"b": "]}"}]},'
+                u' "compute-hosts" : [ {"n": 12345}, 678 , "[,]" ],'
+                u' "count": 123456789 }')
+        self.assertEqual([{'n': 12345}, 678, '[,]'], self._items(text))
+        self.assertEqual([], self._items(u'{"compute-hosts": []}'))
+        self.assertEqual([], self._items(u'{}'))
+        self.assertEqual([], self._items(u'{"a": 1}'))
+
+    def test_numbers_across_chunks(self):
+        self.assertEqual([1234567890123, 4.5e10],
+                         self._items(u'{"compute-hosts":[1234567890123,'
+                                     u'4.5e10]}', chunk_size=3))
+
+    def test_number_boundaries(self):
+        items = [1.5, -0.25, 12e3, 4.5E-10, 1e+2, 123, -7, 0, True, None]
+        for padding in range(1, 24):
+            text = u'{"pad": "%s", "compute-hosts": [%s]}' % (
+                'x' * padding,
+                u', '.join(json.dumps(item) for item in items))
+            for chunk_size in (1, 2, 3, 5, 8):
+                self.assertEqual(items, self._items(text,
+                                                    chunk_size=chunk_size))
+
+    def test_invalid(self):
+        for text in (u'', u'[]', u'{"compute-hosts": [1 2]}',
+                     u'{"compute-hosts": [1,'):
+            self.assertRaises(ValueError, self._items, text)
+
+    @mock.patch.object(json_stream, 'ijson', None)
+    def test_iter_items_fallback(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'report.json')
+        with open(path, 'w') as report_file:
+            json.dump({'compute-hosts': [{'service_host name': 'c0'}]},
+                      report_file)
+        self.assertEqual([{'service_host name': 'c0'}],
+                         list(json_stream.iter_items(path, 'compute-hosts')))
+
+    def test_read_value(self):
+        path = INPUTS_PATH + 'compare_topology_new.json'
+        self.assertEqual('2018-11-05@18:35:41',
+                         json_stream.read_value(path, 'datetime', 16))
+        self.assertIsNone(json_stream.read_value(path, 'missing'))
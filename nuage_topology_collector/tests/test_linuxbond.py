@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import testtools
+
+from ansible.module_utils import tc_bond
+
+
+class TestLinuxBond(testtools.TestCase):
+
+    def setUp(self):
+        super(TestLinuxBond, self).setUp()
+        self.sys_class_net = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.sys_class_net)
+        for dev in ('ens1f0', 'ens1f1', 'ens2f0', 'ens2f1', 'ens3f0',
+                    'ens3f1', 'ens4f0', 'vnet0', 'dpdk0', 'team0', 'br0'):
+            os.mkdir(os.path.join(self.sys_class_net, dev))
+        os.mkdir(os.path.join(self.sys_class_net, 'br0', 'bridge'))
+        # plain bond
+        self._bond('bond0', ['ens1f0', 'ens1f1'])
+        # team
+        self._enslave('team0', 'ens2f0')
+        self._enslave('team0', 'ens2f1')
+        # bond of bonds
+        self._bond('bond2', ['ens3f0', 'ens3f1'])
+        self._bond('bond1', ['bond2', 'ens4f0'])
+        # linux bridge port
+        self._enslave('br0', 'vnet0')
+
+    def _enslave(self, master, dev):
+        os.symlink('../' + master,
+                   os.path.join(self.sys_class_net, dev, 'master'))
+
+    def _bond(self, bond, slaves):
+        os.makedirs(os.path.join(self.sys_class_net, bond, 'bonding'))
+        with open(os.path.join(self.sys_class_net, bond,
+                               'bonding', 'slaves'), 'w') as f:
+            f.write(' '.join(slaves) + '\n')
+        for slave in slaves:
+            self._enslave(bond, slave)
+
+    def test_aggregate_slaves(self):
+        masters = tc_bond.get_aggregate_slaves(self.sys_class_net)
+        self.assertEqual({'bond0': ['ens1f0', 'ens1f1'],
+                          'bond1': ['bond2', 'ens4f0'],
+                          'bond2': ['ens3f0', 'ens3f1'],
+                          'team0': ['ens2f0', 'ens2f1']}, masters)
+
+    def test_expand_bond(self):
+        # same result as the /proc/net/bonding based detection
+        brinfo = {'bond0': {'bridge': 'br-ex', 'type': 'system'},
+                  'dpdk0': {'bridge': 'br-dpdk', 'type': 'dpdk'}}
+        masters = tc_bond.get_aggregate_slaves(self.sys_class_net)
+        self.assertEqual(
+            {'bond0': {'bridge': 'br-ex', 'type': 'system'},
+             'ens1f0': {'bridge': 'br-ex', 'type': None},
+             'ens1f1': {'bridge': 'br-ex', 'type': None},
+             'dpdk0': {'bridge': 'br-dpdk', 'type': 'dpdk'}},
+            tc_bond.expand_bonds(brinfo, masters))
+
+    def test_expand_nested_bond_and_team(self):
+        brinfo = {'bond1': {'bridge': 'br-ex', 'type': 'system'},
+                  'team0': {'bridge': 'br-tenant', 'type': 'system'},
+                  'vnet0': {'bridge': 'br-int', 'type': 'system'}}
+        masters = tc_bond.get_aggregate_slaves(self.sys_class_net)
+        self.assertEqual(
+            {'bond1': {'bridge': 'br-ex', 'type': 'system'},
+             'bond2': {'bridge': 'br-ex', 'type': None},
+             'ens3f0': {'bridge': 'br-ex', 'type': None},
+             'ens3f1': {'bridge': 'br-ex', 'type': None},
+             'ens4f0': {'bridge': 'br-ex', 'type': None},
+             'team0': {'bridge': 'br-tenant', 'type': 'system'},
+             'ens2f0': {'bridge': 'br-tenant', 'type': None},
+             'ens2f1': {'bridge': 'br-tenant', 'type': None},
+             'vnet0': {'bridge': 'br-int', 'type': 'system'}},
+            tc_bond.expand_bonds(brinfo, masters))
@@ -0,0 +1,97 @@
+import mock
+import os
+import shutil
+import tempfile
+import testtools
+import time
+
+from nuage_topology_collector.scripts.helper.mapping_mirror import \
+    MappingMirror
+
+
+def mapping(host_id, pci_slot, port_id='1/1/1', updated_at=None, **kwargs):
+    result = {'id': 'id-%s-%s' % (host_id, pci_slot), 'host_id': host_id,
+              'pci_slot': pci_slot, 'switch_id': '10.101.2.114',
+              'port_id': port_id, 'updated_at': updated_at}
+    result.update(kwargs)
+    return result
+
+
+class TestMappingMirror(testtools.TestCase):
+
+    def setUp(self):
+        super(TestMappingMirror, self).setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.mirror = MappingMirror(os.path.join(tmp_dir, 'reports',
+                                                 'mirror.sqlite'))
+        self.addCleanup(self.mirror.close)
+        self.neutron = mock.Mock()
+
+    def _refresh(self, mappings, full=False):
+        self.neutron.iter_switchport_mappings.return_value = iter(mappings)
+        return self.mirror.refresh(self.neutron, full)
+
+    def test_incremental(self):
+        self.assertEqual((3, True), self._refresh([
+            mapping('compute-1', 'b', updated_at='2020-01-02T00:00:00Z'),
+            mapping('Compute-2', 'a', updated_at='2020-01-03T00:00:00Z'),
+            mapping('compute-1', 'a', updated_at='2020-01-01T00:00:00Z')]))
+        self.neutron.iter_switchport_mappings.assert_called_once_with()
+
+        # a port moved, a mapping created again with a new id, a new one
+        self.assertEqual((3, False), self._refresh([
+            mapping('compute-1', 'a', '1/1/2',
+                    updated_at='2020-01-04T00:00:00Z'),
+            mapping('compute-1', 'b', id='id-new',
+                    updated_at='2020-01-04T00:00:00Z'),
+            mapping('compute-3', 'a', updated_at='2020-01-05T00:00:00Z')]))
+        self.neutron.iter_switchport_mappings.assert_called_with(
+            changed_since='2020-01-03T00:00:00Z')
+        self.assertEqual(4, len(self.mirror))
+        self.assertEqual(
+            [('compute-1', 'a', '1/1/2'), ('compute-1', 'b', '1/1/1'),
+             ('Compute-2', 'a', '1/1/1'), ('compute-3', 'a', '1/1/1')],
+            [(m['host_id'], m['pci_slot'], m['port_id'])
+             for m in self.mirror.mappings()])
+        self.assertEqual('id-new', self.mirror.index(['compute-1'])[
+            ('compute-1', 'b')]['id'])
+
+        self._refresh([])
+        self.neutron.iter_switchport_mappings.assert_called_with(
+            changed_since='2020-01-05T00:00:00Z')
+
+    def test_full(self):
+        self._refresh([mapping('compute-1', 'a', updated_at='2020-01-01'),
+                       mapping('compute-1', 'b', updated_at='2020-01-01')])
+        self.assertEqual((1, True), self._refresh(
+            [mapping('compute-1', 'b', updated_at='2020-01-02')], full=True))
+        self.assertEqual([('compute-1', 'b')], list(self.mirror.index()))
+
+    def test_max_age(self):
+        self._refresh([mapping('compute-1', 'a', updated_at='2020-01-01'),
+                       mapping('compute-1', 'b', updated_at='2020-01-01')])
+        self.neutron.iter_switchport_mappings.return_value = iter([])
+        self.assertEqual((0, False),
+                         self.mirror.refresh(self.neutron, max_age=60))
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.neutron.iter_switchport_mappings.return_value = iter(
+                [mapping('compute-1', 'b', updated_at='2020-01-01')])
+            self.assertEqual((1, True),
+                             self.mirror.refresh(self.neutron, max_age=60))
+        self.neutron.iter_switchport_mappings.assert_called_with()
+        self.assertEqual([('compute-1', 'b')], list(self.mirror.index()))
+
+    def test_no_timestamps(self):
+        self._refresh([mapping('compute-1', 'a')])
+        self.assertEqual((1, True),
+                         self._refresh([mapping('compute-1', 'b')]))
+        self.assertEqual([('compute-1', 'b')], list(self.mirror.index()))
+
+    def test_switch_port(self):
+        self._refresh([mapping('compute-1', 'a', '1/1/1'),
+                       mapping('compute-2', 'a', '1/1/2'),
+                       mapping('compute-3', 'a', '1/1/1')])
+        self.assertEqual(['compute-1', 'compute-3'], [
+            m['host_id'] for m in
+            self.mirror.switch_port_mappings('10.101.2.114', '1/1/1')])
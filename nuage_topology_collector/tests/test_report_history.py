@@ -0,0 +1,109 @@
+import copy
+import json
+import os
+import shutil
+import sys
+import tempfile
+import testtools
+
+try:
+    from StringIO import StringIO  # for Python 2
+except ImportError:
+    from io import StringIO  # for Python 3
+
+from nuage_topology_collector.scripts.helper.report_history import \
+    ReportHistory
+from nuage_topology_collector.scripts import topology_history
+
+INPUTS_PATH = 'nuage_topology_collector/tests/inputs/'
+HOST = 'overcloud-SriovPerformanceCompute-0.localdomain'
+
+
+class TestReportHistory(testtools.TestCase):
+
+    def setUp(self):
+        super(TestReportHistory, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.db = os.path.join(self.tmp_dir, 'reports', 'history.sqlite')
+        self.first = INPUTS_PATH + 'compare_topology_new.json'
+        with open(self.first) as report_file:
+            report = json.load(report_file)
+        # a later report where a VF moved to ens3f1 and ens6f0 moved port
+        report = copy.deepcopy(report)
+        report['datetime'] = '2018-11-06@18:35:41'
+        interfaces = dict((interface['name'], interface) for interface in
+                          report['compute-hosts'][0]['interfaces'])
+        interfaces['ens3f1']['vf_info'].append(
+            interfaces['ens6f0']['vf_info'].pop())
+        interfaces['ens6f0']['neighbor-system-port'] = '1/1/7'
+        self.second = os.path.join(self.tmp_dir, 'second.json')
+        with open(self.second, 'w') as report_file:
+            json.dump(report, report_file)
+        self.history = ReportHistory(self.db)
+        self.addCleanup(self.history.close)
+
+    def test_ingest(self):
+        self.assertEqual(17, self.history.ingest(self.first))
+        self.assertIsNone(self.history.ingest(self.first))
+        self.history.ingest(self.second)
+        self.assertEqual(
+            [('2018-11-05@18:35:41', os.path.abspath(self.first), 3),
+             ('2018-11-06@18:35:41', os.path.abspath(self.second), 3)],
+            self.history.reports())
+
+    def test_switch_port(self):
+        self.assertEqual((None, []),
+                         self.history.switch_port('10.101.2.114', '1/1/5'))
+        self.history.ingest(self.first)
+        self.history.ingest(self.second)
+        self.assertEqual(
+            ('2018-11-05@18:35:41',
+             [(HOST, 'ens6f0', None), (HOST, 'ens6f0', '0000:81:00.2'),
+              (HOST, 'ens6f0', '0000:81:0c.0')]),
+            self.history.switch_port('10.101.2.114', '1/1/5',
+                                     '2018-11-05@23:00:00'))
+        self.assertEqual(
+            ('2018-11-06@18:35:41', []),
+            self.history.switch_port('10.101.2.114', '1/1/5'))
+        self.assertEqual(
+            [(HOST, 'ens6f0', None), (HOST, 'ens6f0', '0000:81:00.2')],
+            self.history.switch_port('10.101.2.114', '1/1/7')[1])
+
+    def test_moves(self):
+        self.history.ingest(self.first)
+        self.history.ingest(self.second)
+        self.assertEqual(
+            [('2018-11-05@18:35:41', 'ens6f0', 'cas-sf6-014',
+              '10.101.2.114', '1/1/5'),
+             ('2018-11-06@18:35:41', 'ens3f1', 'cas-sf6-014',
+              '10.101.2.114', '1/1/8')],
+            self.history.moves(HOST, '0000:81:0c.0'))
+        self.assertEqual(2, len(self.history.moves(HOST, 'ens6f0')))
+        self.assertEqual(1, len(self.history.moves(HOST, 'ens3f1')))
+        self.assertEqual([], self.history.moves(HOST, 'eth9'))
+
+    def test_cli(self):
+        stdout = sys.stdout
+        sys.stdout = output = StringIO()
+        try:
+            topology_history.main(['topology_history.py', '--db', self.db,
+                                   'ingest', self.first, self.second])
+            topology_history.main(['topology_history.py', '--db', self.db,
+                                   'port', '10.101.2.114', '1/1/7'])
+            topology_history.main(['topology_history.py', '--db', self.db,
+                                   'moves', HOST, '0000:81:0c.0'])
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(
+            ['Ingested 17 ports of %s' % self.first,
+             'Ingested 17 ports of %s' % self.second,
+             'Behind 10.101.2.114, 1/1/7 in the report of '
+             '2018-11-06@18:35:41:',
+             '    %s, ens6f0' % HOST,
+             '    %s, ens6f0, 0000:81:00.2' % HOST,
+             '2018-11-05@18:35:41  ens6f0 ===> 10.101.2.114 (cas-sf6-014), '
+             '1/1/5',
+             '2018-11-06@18:35:41  ens3f1 ===> 10.101.2.114 (cas-sf6-014), '
+             '1/1/8'],
+            output.getvalue().splitlines())
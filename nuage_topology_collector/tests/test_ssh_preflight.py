@@ -0,0 +1,128 @@
+import errno
+import mock
+import socket
+import threading
+import testtools
+import time
+
+from ansible.module_utils import tc_preflight
+
+
+class FakeServer(object):
+
+    def __init__(self, greeting):
+        self.greeting = greeting
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.connections = []
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.error:
+                return
+            self.connections.append(conn)
+            if self.greeting:
+                conn.sendall(self.greeting)
+
+    def close(self):
+        for conn in self.connections:
+            conn.close()
+        self.sock.close()
+
+
+class TestSshPreflight(testtools.TestCase):
+
+    def _server(self, greeting):
+        server = FakeServer(greeting)
+        self.addCleanup(server.close)
+        return ('127.0.0.1', server.port)
+
+    def _closed_port(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return ('127.0.0.1', port)
+
+    def test_probe(self):
+        hosts = {
+            'compute-0': self._server(b'SSH-2.0-OpenSSH_7.4\r\n'),
+            'compute-1': self._server(b'Welcome\r\nSSH-2.0-OpenSSH_8.0\r\n'),
+            'compute-2': self._server(b'SSH-2.0-dropbear_2019.78\r\n'),
+            'compute-3': self._server(None),
+            'compute-4': self._closed_port()
+        }
+        start = time.time()
+        unreachable = tc_preflight.probe_ssh(hosts, 1)
+        self.assertLess(time.time() - start, 3)
+        self.assertEqual(['compute-2', 'compute-3', 'compute-4'],
+                         sorted(unreachable))
+        self.assertIn('dropbear', unreachable['compute-2'])
+        self.assertEqual('timed out', unreachable['compute-3'])
+
+    def test_single_timeout_for_all_hosts(self):
+        hosts = dict(('compute-%d' % i, self._server(None))
+                     for i in range(20))
+        start = time.time()
+        unreachable = tc_preflight.probe_ssh(hosts, 0.5)
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(sorted(hosts), sorted(unreachable))
+
+    def test_window(self):
+        hosts = dict(('compute-%d' % i,
+                      self._server(b'SSH-2.0-OpenSSH_7.4\r\n'))
+                     for i in range(6))
+        hosts['compute-6'] = self._server(None)
+        unreachable = tc_preflight.probe_ssh(hosts, 0.5, window=2)
+        self.assertEqual({'compute-6': 'timed out'}, unreachable)
+
+    def test_out_of_file_descriptors(self):
+        hosts = dict(('compute-%d' % i,
+                      self._server(b'SSH-2.0-OpenSSH_7.4\r\n'))
+                     for i in range(4))
+        emfile = socket.error(errno.EMFILE, 'Too many open files')
+        with mock.patch.object(tc_preflight, '_connect',
+                               side_effect=emfile):
+            self.assertRaises(socket.error, tc_preflight.probe_ssh,
+                              hosts, 1)
+
+        # the second socket fails, the hosts are then probed one by one
+        connect = tc_preflight._connect
+        with mock.patch.object(tc_preflight, '_connect') as connect_mock:
+            connect_mock.side_effect = [connect(*hosts['compute-0']),
+                                        emfile] + [
+                connect(*hosts['compute-%d' % i]) for i in range(1, 4)]
+            self.assertEqual({}, tc_preflight.probe_ssh(hosts, 1))
+        self.assertEqual(5, connect_mock.call_count)
+
+    def test_fd_window(self):
+        with mock.patch.object(tc_preflight.resource, 'getrlimit',
+                               return_value=(1024, 4096)), \
+                mock.patch.object(tc_preflight.resource,
+                                  'setrlimit') as setrlimit:
+            self.assertEqual(4096 - tc_preflight.FD_HEADROOM,
+                             tc_preflight.fd_window())
+        setrlimit.assert_called_once_with(
+            tc_preflight.resource.RLIMIT_NOFILE, (4096, 4096))
+        with mock.patch.object(tc_preflight.resource, 'getrlimit',
+                               return_value=(1024, 4096)), \
+                mock.patch.object(tc_preflight.resource, 'setrlimit',
+                                  side_effect=ValueError):
+            self.assertEqual(1024 - tc_preflight.FD_HEADROOM,
+                             tc_preflight.fd_window())
+
+    def test_greeting(self):
+        self.assertIsNone(tc_preflight._check_greeting(b'SSH-2.0-Open',
+                                                       'OpenSSH'))
+        self.assertEqual('', tc_preflight._check_greeting(
+            b'SSH-2.0-OpenSSH_7.4\r\n', 'OpenSSH'))
+        self.assertEqual('no SSH banner received',
+                         tc_preflight._check_greeting(
+                             b'x' * tc_preflight.MAX_GREETING, 'OpenSSH'))
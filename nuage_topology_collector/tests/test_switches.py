@@ -1,7 +1,7 @@
 import testtools
 
-from nuage_topology_collector.library.topology import get_switch
-from nuage_topology_collector.library.topology import NokiaSwitch
+from ansible.module_utils.tc_topology import get_switch
+from ansible.module_utils.tc_topology import NokiaSwitch
 
 
 class TestSwitches(testtools.TestCase):
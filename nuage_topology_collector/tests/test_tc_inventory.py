@@ -0,0 +1,156 @@
+import json
+import mock
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import testtools
+
+from ansible.inventory.data import InventoryData
+from ansible.parsing.dataloader import DataLoader
+from ansible.plugins.loader import inventory_loader
+
+TC_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'overcloud-controller-0': '192.168.24.10',
+    'overcloud-compute-0': '192.168.24.20',
+    'overcloud-compute-1': '192.168.24.21'
+}
+
+AGENTS = [
+    {'host': 'overcloud-compute-0.localdomain',
+     'agent_type': 'NIC Switch agent',
+     'configurations': {'device_mappings': {'physnet1': ['ens1f0']},
+                        'extensions': []}},
+    {'host': 'overcloud-compute-0.localdomain',
+     'agent_type': 'Open vSwitch agent',
+     'configurations': {'bridge_mappings': {'physnet2': 'br-ex'}}},
+    {'host': 'overcloud-compute-1.localdomain',
+     'agent_type': 'Open vSwitch agent',
+     'configurations': {'bridge_mappings': {'physnet2': 'br-ex'}}},
+    {'host': 'overcloud-compute-2.localdomain',
+     'agent_type': 'Open vSwitch agent',
+     'configurations': {'bridge_mappings': {}}}
+]
+
+
+class TestTcOvercloudInventory(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTcOvercloudInventory, self).setUp()
+        inventory_loader.add_directory(
+            os.path.join(TC_PATH, 'inventory_plugins'))
+        self.plugin = inventory_loader.get('tc_overcloud')
+        # the plugin loader imports its own copy of the module
+        self.tc_overcloud = sys.modules[type(self.plugin).__module__]
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.cache_file = os.path.join(self.tmp_dir, 'cache', 'inv.json')
+        self.config = os.path.join(self.tmp_dir, 'tc_inventory.yml')
+        self._write_config()
+
+    def _write_config(self, **options):
+        options.setdefault('cache_file', self.cache_file)
+        with open(self.config, 'w') as config:
+            config.write('plugin: tc_overcloud\n')
+            for option, value in options.items():
+                config.write('%s: %s\n' % (option, value))
+
+    def _parse(self, servers=SERVERS, agents=AGENTS):
+        inventory = InventoryData()
+        with mock.patch.object(self.tc_overcloud, 'read_rc_file',
+                               return_value={'OS_AUTH_URL': 'http://ks'}), \
+                mock.patch.object(self.tc_overcloud, 'list_servers',
+                                  return_value=servers) as servers, \
+                mock.patch.object(self.tc_overcloud, 'list_agents',
+                                  return_value=agents):
+            self.plugin.parse(inventory, DataLoader(), self.config)
+        return inventory, servers.called
+
+    def test_verify_file(self):
+        self.assertTrue(self.plugin.verify_file(self.config))
+        other = os.path.join(self.tmp_dir, 'hosts.yml')
+        open(other, 'w').close()
+        self.assertFalse(self.plugin.verify_file(other))
+
+    def test_hosts(self):
+        inventory, queried = self._parse()
+        self.assertTrue(queried)
+        self.assertEqual(['overcloud-compute-0', 'overcloud-compute-1'],
+                         sorted(h.name for h in
+                                inventory.groups['tc_hosts'].get_hosts()))
+        host_vars = inventory.hosts['overcloud-compute-0'].vars
+        self.assertEqual('192.168.24.20', host_vars['ansible_host'])
+        self.assertEqual('heat-admin', host_vars['ansible_user'])
+        self.assertEqual('overcloud-compute-0.localdomain',
+                         host_vars['service_host'])
+        self.assertEqual({'physnet1': ['ens1f0']},
+                         host_vars['device_mappings'])
+        self.assertEqual({'physnet2': 'br-ex'}, host_vars['bridge_mappings'])
+        self.assertNotIn('device_mappings',
+                         inventory.hosts['overcloud-compute-1'].vars)
+
+    def test_cache(self):
+        self.assertTrue(self._parse()[1])
+        self.assertTrue(os.path.isfile(self.cache_file))
+        inventory, queried = self._parse()
+        self.assertFalse(queried)
+        self.assertEqual('192.168.24.21',
+                         inventory.hosts['overcloud-compute-1']
+                         .vars['ansible_host'])
+
+    def test_cache_expired(self):
+        self.assertTrue(self._parse()[1])
+        with open(self.cache_file) as cache_file:
+            cache = json.load(cache_file)
+        cache['timestamp'] -= 3600
+        with open(self.cache_file, 'w') as cache_file:
+            json.dump(cache, cache_file)
+        self.assertTrue(self._parse()[1])
+
+    def test_cache_disabled(self):
+        self._write_config(cache_ttl=0)
+        self.assertTrue(self._parse()[1])
+        self.assertTrue(self._parse()[1])
+
+    def test_read_rc_file(self):
+        rc_file = os.path.join(self.tmp_dir, 'stackrc')
+        with open(rc_file, 'w') as rc:
+            rc.write('export OS_AUTH_URL=http://192.168.24.2:5000\n'
+                     'export OS_USERNAME=admin\n')
+        env = self.tc_overcloud.read_rc_file(rc_file)
+        self.assertEqual('http://192.168.24.2:5000', env['OS_AUTH_URL'])
+        self.assertEqual('admin', env['OS_USERNAME'])
+        self.assertNotIn('OS_PASSWORD', env)
+
+    def _host_vars_size(self, count):
+        servers = dict(('overcloud-compute-%d' % i, '192.168.%d.%d' % (
+            24 + i // 250, i % 250)) for i in range(count))
+        agents = []
+        for i in range(count):
+            host = 'overcloud-compute-%d.localdomain' % i
+            agents.append({'host': host,
+                           'agent_type': 'NIC Switch agent',
+                           'configurations': {'device_mappings': {
+                               'physnet1': ['ens1f0', 'ens1f1']}}})
+            agents.append({'host': host,
+                           'agent_type': 'Open vSwitch agent',
+                           'configurations': {'bridge_mappings': {
+                               'physnet2': 'br-ex'}}})
+        self._write_config(cache_ttl=0)
+        inventory, _ = self._parse(servers, agents)
+        # host vars are what ansible templates and serializes to the
+        # worker forks for every task of every host
+        return [len(pickle.dumps(host.get_vars()))
+                for host in inventory.groups['tc_hosts'].get_hosts()]
+
+    def test_host_vars_grow_linearly(self):
+        small = self._host_vars_size(50)
+        large = self._host_vars_size(800)
+        self.assertEqual(800, len(large))
+        # no host carries data of other hosts, so the per host size does
+        # not depend on the size of the cloud and the total is linear
+        self.assertLessEqual(max(large), max(small) + 8)
+        self.assertLess(sum(large), 16 * sum(small) * 1.1)
@@ -0,0 +1,55 @@
+import mock
+import testtools
+
+from nuage_topology_collector.scripts.helper import throttle
+
+
+class TestAimdLimiter(testtools.TestCase):
+
+    def _complete(self, limiter, latency, overloaded=False):
+        limiter.acquire()
+        limiter.release(latency, overloaded)
+
+    def test_additive_increase(self):
+        limiter = throttle.AimdLimiter(initial=4, maximum=6)
+        # about one more per limit completions
+        for _ in range(5):
+            self._complete(limiter, 0.01)
+        self.assertEqual(5, int(limiter.limit))
+        for _ in range(100):
+            self._complete(limiter, 0.01)
+        self.assertEqual(6, limiter.limit)
+
+    @mock.patch('time.time')
+    def test_multiplicative_decrease(self, now):
+        now.return_value = 100
+        limiter = throttle.AimdLimiter(initial=16)
+        self._complete(limiter, 0.01, overloaded=True)
+        self.assertEqual(8, limiter.limit)
+        # once per round trip only
+        self._complete(limiter, 0.01, overloaded=True)
+        self.assertEqual(8, limiter.limit)
+        now.return_value = 101
+        self._complete(limiter, 0.01, overloaded=True)
+        self.assertEqual(4, limiter.limit)
+
+    @mock.patch('time.time')
+    def test_slow_requests_decrease(self, now):
+        now.return_value = 100
+        limiter = throttle.AimdLimiter(initial=16, minimum=2)
+        self._complete(limiter, 0.1)
+        self._complete(limiter, 0.3)
+        self.assertGreater(limiter.limit, 16)
+        self._complete(limiter, 1)
+        self.assertEqual(8, int(limiter.limit))
+        for seconds in range(5):
+            now.return_value = 101 + seconds
+            self._complete(limiter, 10)
+        self.assertEqual(2, limiter.limit)
+
+    def test_backoff_delay(self):
+        for attempt in range(10):
+            delay = throttle.backoff_delay(attempt)
+            self.assertTrue(0 <= delay <= min(throttle.BACKOFF_CAP,
+                                              throttle.BACKOFF_BASE *
+                                              2 ** attempt))
@@ -0,0 +1,75 @@
+import datetime
+import mock
+import os
+import shutil
+import stat
+import tempfile
+import testtools
+
+from keystoneauth1 import access
+from keystoneauth1 import fixture
+from keystoneauth1.identity import v3
+
+from nuage_topology_collector.scripts.helper.token_cache import TokenCache
+
+AUTH_URL = 'http://192.168.24.2:5000/v3'
+
+
+class TestTokenCache(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTokenCache, self).setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.cache_dir = os.path.join(tmp_dir, 'tokens')
+        self.expires = datetime.timedelta(hours=1)
+
+    def _token_cache(self, username='admin'):
+        return TokenCache(AUTH_URL, username, 'admin', 'Default', 'Default',
+                          cache_dir=self.cache_dir)
+
+    def _session(self, token_cache):
+        """Return the session token and whether keystone was called"""
+        auth = v3.Password(auth_url=AUTH_URL, username='admin',
+                           password='secret', project_name='admin',
+                           user_domain_name='Default',
+                           project_domain_name='Default')
+        token = fixture.V3Token(
+            expires=datetime.datetime.utcnow() + self.expires)
+        auth_ref = access.create(body=token, auth_token=token.audit_id)
+        with mock.patch.object(v3.Password, 'get_auth_ref',
+                               return_value=auth_ref) as get_auth_ref:
+            session = token_cache.session(auth)
+            return session.get_token(), get_auth_ref.called
+
+    def test_token_reused(self):
+        token, authenticated = self._session(self._token_cache())
+        self.assertTrue(authenticated)
+        self.assertEqual((token, False), self._session(self._token_cache()))
+
+    def test_permissions(self):
+        token_cache = self._token_cache()
+        self._session(token_cache)
+        self.assertEqual(0o700,
+                         stat.S_IMODE(os.stat(self.cache_dir).st_mode))
+        self.assertEqual(0o600,
+                         stat.S_IMODE(os.stat(token_cache.path).st_mode))
+
+    def test_keyed_by_user(self):
+        self._session(self._token_cache())
+        self.assertTrue(self._session(self._token_cache('nuage'))[1])
+        self.assertNotEqual(self._token_cache().path,
+                            self._token_cache('nuage').path)
+
+    def test_expired_token_not_reused(self):
+        self.expires = datetime.timedelta(minutes=1)
+        self.assertTrue(self._session(self._token_cache())[1])
+        self.assertTrue(self._session(self._token_cache())[1])
+
+    def test_corrupt_cache_ignored(self):
+        token_cache = self._token_cache()
+        os.makedirs(self.cache_dir)
+        with open(token_cache.path, 'w') as cache_file:
+            cache_file.write('{"auth_token":')
+        self.assertTrue(self._session(token_cache)[1])
+        self.assertFalse(self._session(token_cache)[1])
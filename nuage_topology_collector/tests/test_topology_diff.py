@@ -0,0 +1,181 @@
+import io
+import json
+import mock
+import os
+import shutil
+import tempfile
+import testtools
+
+from nuage_topology_collector.scripts.helper import osclient
+from nuage_topology_collector.scripts.helper import topology_diff
+
+
+def interface(name, pci_slots, port='1/1/1'):
+    return {
+        'name': name,
+        'vf_info': [{'pci-id': pci_slot} for pci_slot in pci_slots],
+        'neighbor-system-name': 'cas-sf6-014',
+        'neighbor-system-mgmt-ip': '10.101.2.114',
+        'neighbor-system-port': port,
+        'ovs-bridge': None
+    }
+
+
+def old_mapping(pci_slot, port_id='1/1/1', host_id='compute-0'):
+    return {'id': 'id-' + pci_slot, 'host_id': host_id,
+            'pci_slot': pci_slot, 'switch_id': '10.101.2.114',
+            'port_id': port_id}
+
+
+class TestTopologyDiff(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTopologyDiff, self).setUp()
+        self.hosts = [{'service_host name': 'compute-0', 'interfaces': [
+            interface('ens6f0', ['0000:81:00.2', '0000:81:00.3']),
+            interface('ens6f1', ['0000:81:10.2'], '1/1/2')]}]
+        self.old = [old_mapping('0000:81:00.2'),
+                    old_mapping('0000:81:00.3', '1/1/9'),
+                    old_mapping('0000:81:00.4'),
+                    old_mapping('ens6f0')]
+
+    def _diff(self):
+        return topology_diff.TopologyDiff(
+            topology_diff.report_mappings(self.hosts))
+
+    def test_interface_mappings(self):
+        mappings = topology_diff.interface_mappings(
+            'compute-0', interface('ens6f0', ['0000:81:00.2']))
+        self.assertEqual(['0000:81:00.2', 'ens6f0'],
+                         [m['pci_slot'] for m in mappings])
+        self.assertEqual({'switch_info': 'cas-sf6-014',
+                          'switch_id': '10.101.2.114', 'port_id': '1/1/1',
+                          'host_id': 'compute-0', 'bridge': None,
+                          'pci_slot': 'ens6f0'}, mappings[1])
+
+    def test_changes(self):
+        diff = self._diff()
+        records = list(diff.changes(self.old))
+        self.assertEqual(
+            [('modified', '0000:81:00.3', 'ens6f0'),
+             ('removed', '0000:81:00.4', None),
+             ('added', '0000:81:10.2', 'ens6f1'),
+             ('added', 'ens6f1', 'ens6f1')],
+            [(r['change'], r['pci_slot'], r['interface']) for r in records])
+        self.assertEqual('id-0000:81:00.3', records[0]['old']['id'])
+        self.assertEqual(['port_id'], records[0]['fields'])
+        self.assertEqual('1/1/1', records[0]['new']['port_id'])
+        self.assertIsNone(records[1]['new'])
+        self.assertEqual({'added': 2, 'removed': 1, 'modified': 1,
+                          'unchanged': 2}, diff.counts)
+
+    def test_text(self):
+        out = io.StringIO()
+        topology_diff.write_diff(self._diff(), self.old, out)
+        self.assertEqual(
+            u'Port Modified : compute-0, 0000:81:00.3\n'
+            u'10.101.2.114, 1/1/9 ===> 10.101.2.114, 1/1/1\n\n'
+            u'Port deleted : compute-0, 0000:81:00.4\n\n'
+            u'New Port added: compute-0, 0000:81:10.2 ===> '
+            u'10.101.2.114, 1/1/2\n\n'
+            u'New Port added: compute-0, ens6f1 ===> 10.101.2.114, 1/1/2\n\n',
+            out.getvalue())
+
+    def test_formats_read_back(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        expected = list(self._diff().changes(self.old))
+        for output_format in ('json', 'ndjson'):
+            path = os.path.join(tmp_dir, 'diff.' + output_format)
+            with io.open(path, 'w') as diff_file:
+                counts = topology_diff.write_diff(self._diff(), self.old,
+                                                  diff_file, output_format)
+            self.assertEqual(4, sum(counts.values()) - counts['unchanged'])
+            self.assertEqual(expected,
+                             list(topology_diff.read_diff(path)))
+            with open(path) as diff_file:
+                if output_format == 'json':
+                    self.assertEqual(counts, json.load(diff_file)['counts'])
+                else:
+                    self.assertEqual({'counts': counts},
+                                     json.loads(diff_file.readlines()[-1]))
+
+    def test_empty(self):
+        out = io.StringIO()
+        topology_diff.write_diff(topology_diff.TopologyDiff([]), [], out,
+                                 'json')
+        self.assertEqual([], json.loads(out.getvalue())['changes'])
+
+    def test_sorted(self):
+        self.hosts.insert(0, {'service_host name': 'Compute-1',
+                              'interfaces': [interface('ens6f0', ['0:1'])]})
+        self.old.append(old_mapping('0:2', host_id='compute-1'))
+        expected = list(self._diff().changes(self.old))
+        old = sorted(self.old, key=lambda m: topology_diff.merge_key(
+            m['host_id'], m['pci_slot']))
+        for run_size in (1, 2, 1000):
+            diff = topology_diff.SortedTopologyDiff(
+                topology_diff.report_mappings(self.hosts), run_size)
+            records = list(diff.changes(iter(old)))
+            key = (lambda r: (r['change'], r['host_id'], r['pci_slot']))
+            self.assertEqual(sorted(expected, key=key),
+                             sorted(records, key=key))
+            self.assertEqual(
+                sorted(records, key=lambda r: topology_diff.merge_key(
+                    r['host_id'], r['pci_slot'])), records)
+            self.assertEqual({'added': 4, 'removed': 2, 'modified': 1,
+                              'unchanged': 2}, diff.counts)
+
+    def test_unsorted(self):
+        diff = topology_diff.SortedTopologyDiff(
+            topology_diff.report_mappings(self.hosts))
+        self.assertRaises(topology_diff.UnsortedMappingsError, list,
+                          diff.changes(reversed(self.old)))
+
+
+class TestPagination(testtools.TestCase):
+
+    def setUp(self):
+        super(TestPagination, self).setUp()
+        self.neutron = osclient.NeutronClient()
+        self.neutron.client = mock.Mock()
+        self.mappings = [old_mapping('0000:81:00.%d' % i) for i in range(5)]
+
+        def get(path, params):
+            start = 0
+            if 'marker' in params:
+                start = [m['id'] for m in self.mappings].index(
+                    params['marker']) + 1
+            limit = min(params['limit'], self.max_limit or params['limit'])
+            return {'switchport_mappings':
+                    self.mappings[start:start + limit]}
+
+        self.neutron.client.get.side_effect = get
+        self.max_limit = None
+
+    def test_pages(self):
+        self.assertEqual(self.mappings, list(
+            self.neutron.iter_switchport_mappings(page_size=2, depth=1)))
+        calls = self.neutron.client.get.call_args_list
+        self.assertEqual([None, 'id-0000:81:00.1', 'id-0000:81:00.3',
+                          'id-0000:81:00.4'],
+                         [c[1]['params'].get('marker') for c in calls])
+        self.assertEqual(['host_id', 'pci_slot'],
+                         calls[0][1]['params']['sort_key'])
+
+    def test_capped_limit(self):
+        # neutron caps limit to its pagination_max_limit
+        self.max_limit = 2
+        self.assertEqual(self.mappings, list(
+            self.neutron.iter_switchport_mappings(page_size=4, depth=1)))
+        self.assertEqual(4, self.neutron.client.get.call_count)
+
+    def test_prefetch_error(self):
+        def pages():
+            yield [1]
+            raise RuntimeError('page failed')
+
+        results = []
+        self.assertRaises(RuntimeError, lambda: [
+            results.append(page) for page in osclient.prefetch(pages())])
+        self.assertEqual([[1]], results)
@@ -1,12 +1,407 @@
+import io
+import mock
+import os
+import shutil
+import tempfile
 import testtools
+import threading
+import time
+
+from neutronclient.common.exceptions import NeutronClientException
+from neutronclient.common.exceptions import NotFound
 
 # test the imports
+from nuage_topology_collector.scripts import topology_import
+from nuage_topology_collector.scripts.helper.host_filter import HostFilter
+from nuage_topology_collector.scripts.helper.throttle import AimdLimiter
+from nuage_topology_collector.scripts.helper import topology_diff
 from nuage_topology_collector.scripts.topology_import import TopologyConverter
 from nuage_topology_collector.scripts.topology_import import TopologyReader
 
 
+def mapping(pci_slot, port_id='1/1/1', **kwargs):
+    result = {
+        'switch_info': 'cas-sf6-014',
+        'switch_id': '10.101.2.114',
+        'port_id': port_id,
+        'host_id': 'compute-0',
+        'bridge': None,
+        'pci_slot': pci_slot
+    }
+    result.update(kwargs)
+    return result
+
+
 class TestTopologyImport(testtools.TestCase):
 
     def test_import(self):
         yield TopologyReader  # reference the import for pep8 compatibility
         yield TopologyConverter  # reference the import for pep8 compatibility
+
+
+class TestHostScope(testtools.TestCase):
+
+    def test_reader_limit(self):
+        reader = TopologyReader(
+            'nuage_topology_collector/tests/inputs/compare_topology_new.json',
+            HostFilter('overcloud-Ovs*,overcloud-AvrsReadyCompute-0'))
+        self.assertEqual(['overcloud-AvrsReadyCompute-0.localdomain',
+                          'overcloud-OvsCompute-0.localdomain'],
+                         sorted(reader.host_names()))
+
+    def test_index_hosts(self):
+        neutron = mock.Mock()
+        neutron.get_switchport_mappings_for_hosts.return_value = {
+            'switchport_mappings': [mapping('0000:81:00.2', id='id-1')]}
+        index = topology_import.index_mappings(neutron, ['compute-0'])
+        self.assertEqual([('compute-0', '0000:81:00.2')], list(index))
+        neutron.get_switchport_mappings_for_hosts.assert_called_once_with(
+            ['compute-0'])
+        self.assertFalse(neutron.get_switchport_mapping.called)
+
+
+class TestDiffImport(testtools.TestCase):
+
+    def setUp(self):
+        super(TestDiffImport, self).setUp()
+        self.neutron = mock.Mock()
+        self.neutron.get_switchport_mapping.return_value = {
+            'switchport_mappings': [
+                mapping('0000:81:00.2', id='id-1'),
+                mapping('0000:81:00.3', id='id-2'),
+                mapping('0000:81:00.2', host_id='compute-1', id='id-3')
+            ]
+        }
+        self.converter = TopologyConverter(self.neutron)
+        self.index = topology_import.index_mappings(self.neutron)
+
+    def test_index(self):
+        self.assertEqual({('compute-0', '0000:81:00.2'),
+                          ('compute-0', '0000:81:00.3'),
+                          ('compute-1', '0000:81:00.2')}, set(self.index))
+        self.neutron.get_switchport_mapping.assert_called_once_with()
+
+    def test_classify(self):
+        self.assertEqual(
+            (topology_import.UNCHANGED, self.index[('compute-0',
+                                                    '0000:81:00.2')]),
+            topology_import.classify(mapping('0000:81:00.2'), self.index))
+        self.assertEqual(
+            topology_import.UPDATED,
+            topology_import.classify(mapping('0000:81:00.3', '1/1/2'),
+                                     self.index)[0])
+        self.assertEqual(
+            (topology_import.CREATED, None),
+            topology_import.classify(mapping('0000:81:00.4'), self.index))
+
+    def test_only_changes_sent(self):
+        actions = [topology_import.import_mapping(self.converter, m,
+                                                  self.index)
+                   for m in (mapping('0000:81:00.2'),
+                             mapping('0000:81:00.3', '1/1/2'),
+                             mapping('0000:81:00.4'))]
+        self.assertEqual([topology_import.UNCHANGED, topology_import.UPDATED,
+                          topology_import.CREATED], actions)
+        self.neutron.update_switchport_mapping.assert_called_once_with(
+            'id-2', {'switchport_mapping': mapping('0000:81:00.3', '1/1/2')})
+        self.neutron.create_switchport_mapping.assert_called_once_with(
+            {'switchport_mapping': mapping('0000:81:00.4')})
+        self.assertEqual(1, self.neutron.get_switchport_mapping.call_count)
+
+    def test_update_of_deleted_mapping(self):
+        self.neutron.update_switchport_mapping.side_effect = NotFound()
+        topology_import.write_mapping(
+            self.converter, topology_import.UPDATED,
+            mapping('0000:81:00.3', '1/1/2'),
+            self.index[('compute-0', '0000:81:00.3')])
+        self.neutron.create_switchport_mapping.assert_called_once_with(
+            {'switchport_mapping': mapping('0000:81:00.3', '1/1/2')})
+
+
+class FakeReader(object):
+
+    def __init__(self, interfaces):
+        self._interfaces = interfaces
+
+    def interfaces(self):
+        for interface in self._interfaces:
+            yield dict(interface)
+
+
+def interface(host_id, name, pci_slots, port='1/1/1'):
+    return {
+        'host_id': host_id,
+        'name': name,
+        'vf_info': [{'pci-id': pci_slot} for pci_slot in pci_slots],
+        'neighbor-system-name': 'cas-sf6-014',
+        'neighbor-system-mgmt-ip': '10.101.2.114',
+        'neighbor-system-port': port,
+        'ovs-bridge': None
+    }
+
+
+class TestTopologyImporter(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTopologyImporter, self).setUp()
+        self.neutron = mock.Mock()
+        self.converter = TopologyConverter(self.neutron)
+        patcher = mock.patch.object(topology_import, 'backoff_delay',
+                                    return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, interfaces, index=None, **kwargs):
+        importer = topology_import.TopologyImporter(self.converter,
+                                                    index or {}, **kwargs)
+        with mock.patch.object(TopologyConverter, 'interface_to_mappings',
+                               side_effect=self._mappings):
+            importer.run(FakeReader(interfaces))
+        return importer
+
+    @staticmethod
+    def _mappings(interface):
+        return [mapping(vf['pci-id'], host_id=interface['host_id'])
+                for vf in interface['vf_info']]
+
+    def test_counts(self):
+        index = topology_import.index_mappings(mock.Mock(**{
+            'get_switchport_mapping.return_value': {
+                'switchport_mappings': [
+                    mapping('0000:81:00.2', id='id-1'),
+                    mapping('0000:81:00.3', '1/1/9', id='id-2')]}}))
+        importer = self._run([interface('compute-0', 'ens6f0', [
+            '0000:81:00.2', '0000:81:00.3', '0000:81:00.4'])], index)
+        self.assertEqual({'created': 1, 'updated': 1, 'unchanged': 1,
+                          'failed': 0, 'resumed': 0, 'removed': 0},
+                         importer.counts)
+
+    def test_concurrent(self):
+        in_flight = [0, 0]
+        lock = threading.Lock()
+
+        def create(body):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+
+        self.neutron.create_switchport_mapping.side_effect = create
+        start = time.time()
+        importer = self._run([interface('compute-%d' % i, 'ens6f0',
+                                        ['0000:81:00.%d' % j
+                                         for j in range(10)])
+                              for i in range(4)], bulk_size=1)
+        self.assertEqual(40, importer.counts['created'])
+        self.assertGreater(in_flight[1], 1)
+        self.assertLess(time.time() - start, 40 * 0.05)
+
+    def test_retry_and_errors(self):
+        calls = []
+
+        def create(body):
+            calls.append(body)
+            pci_slot = body['switchport_mapping']['pci_slot']
+            if pci_slot == '0000:81:00.2' and len(calls) < 3:
+                raise NeutronClientException(status_code=503)
+            if pci_slot == '0000:81:00.3':
+                raise NeutronClientException(message='bad request',
+                                             status_code=400)
+
+        self.neutron.create_switchport_mapping.side_effect = create
+        importer = topology_import.TopologyImporter(
+            self.converter, {},
+            limiter=topology_import.AimdLimiter(initial=1, maximum=1),
+            bulk_size=1)
+        with mock.patch.object(TopologyConverter, 'interface_to_mappings',
+                               side_effect=self._mappings):
+            importer.run(FakeReader([
+                interface('compute-0', 'ens6f0', ['0000:81:00.2']),
+                interface('compute-0', 'ens6f1', ['0000:81:00.3'])]))
+        self.assertEqual(1, importer.counts['created'])
+        self.assertEqual(1, importer.counts['failed'])
+        self.assertEqual([('compute-0', 'ens6f1')], list(importer.errors))
+        failures = importer.errors[('compute-0', 'ens6f1')]
+        self.assertEqual('0000:81:00.3', failures[0][0]['pci_slot'])
+        self.assertIn('bad request', failures[0][1])
+        # the 400 is not retried
+        self.assertEqual(4, len(calls))
+
+    def test_bulk_create(self):
+        bulk_calls = []
+
+        def bulk_create(body):
+            pci_slots = [m['pci_slot'] for m in body['switchport_mappings']]
+            bulk_calls.append(pci_slots)
+            if '0000:81:00.5' in pci_slots:
+                raise NeutronClientException(message='conflict',
+                                             status_code=409)
+
+        def create(body):
+            if body['switchport_mapping']['pci_slot'] == '0000:81:00.5':
+                raise NeutronClientException(message='bad mapping',
+                                             status_code=400)
+
+        self.neutron.create_switchport_mappings.side_effect = bulk_create
+        self.neutron.create_switchport_mapping.side_effect = create
+        importer = self._run([interface('compute-0', 'ens6f0',
+                                        ['0000:81:00.%d' % j
+                                         for j in range(10)])],
+                             bulk_size=8)
+
+        self.assertEqual(9, importer.counts['created'])
+        self.assertEqual(1, importer.counts['failed'])
+        self.assertEqual(
+            ['0000:81:00.5'],
+            [m['pci_slot'] for m, _ in
+             importer.errors[('compute-0', 'ens6f0')]])
+        # chunks of 8 and 2 mappings, then halves down to the bad one
+        self.assertEqual([['0000:81:00.%d' % j for j in range(8)],
+                          ['0000:81:00.0', '0000:81:00.1', '0000:81:00.2',
+                           '0000:81:00.3'],
+                          ['0000:81:00.4', '0000:81:00.5', '0000:81:00.6',
+                           '0000:81:00.7'],
+                          ['0000:81:00.4', '0000:81:00.5'],
+                          ['0000:81:00.6', '0000:81:00.7'],
+                          ['0000:81:00.8', '0000:81:00.9']],
+                         sorted(bulk_calls, key=lambda c: (-len(c), c)))
+        self.neutron.create_switchport_mapping.assert_has_calls(
+            [mock.call({'switchport_mapping': mapping('0000:81:00.4')}),
+             mock.call({'switchport_mapping': mapping('0000:81:00.5')})],
+            any_order=True)
+
+    def _run_bulk(self, bulk_create, create=None):
+        self.neutron.create_switchport_mappings.side_effect = bulk_create
+        self.neutron.create_switchport_mapping.side_effect = create
+        return self._run([interface('compute-0', 'ens6f0',
+                                    ['0000:81:00.%d' % j
+                                     for j in range(10)])],
+                         limiter=AimdLimiter(initial=1, maximum=1),
+                         bulk_size=4)
+
+    def test_bulk_unsupported(self):
+        importer = self._run_bulk(NeutronClientException(
+            message='not found', status_code=404))
+        self.assertEqual(10, importer.counts['created'])
+        self.assertEqual(1, importer.bulk_size)
+        self.assertEqual('not found', importer.bulk_error)
+        self.assertEqual(
+            1, self.neutron.create_switchport_mappings.call_count)
+        self.assertEqual(10,
+                         self.neutron.create_switchport_mapping.call_count)
+
+    def test_bulk_body_refused(self):
+        importer = self._run_bulk(NeutronClientException(
+            message='bad request', status_code=400))
+        self.assertEqual(10, importer.counts['created'])
+        self.assertEqual(1, importer.bulk_size)
+        self.assertEqual(
+            1, self.neutron.create_switchport_mappings.call_count)
+
+    def test_bulk_bad_mapping(self):
+        def create(body):
+            if body['switchport_mapping']['pci_slot'] == '0000:81:00.1':
+                raise NeutronClientException(message='bad mapping',
+                                             status_code=400)
+
+        def bulk_create(body):
+            if '0000:81:00.1' in [m['pci_slot']
+                                  for m in body['switchport_mappings']]:
+                raise NeutronClientException(message='bad mapping',
+                                             status_code=400)
+
+        importer = self._run_bulk(bulk_create, create)
+        # the first chunk is sent one by one, the others still in bulk
+        self.assertEqual(9, importer.counts['created'])
+        self.assertEqual(1, importer.counts['failed'])
+        self.assertEqual(4, importer.bulk_size)
+        self.assertEqual(
+            3, self.neutron.create_switchport_mappings.call_count)
+        self.assertEqual(4,
+                         self.neutron.create_switchport_mapping.call_count)
+
+    def test_journal(self):
+        journal = mock.MagicMock()
+        journal.__contains__.side_effect = \
+            lambda key: key == ('compute-0', '0000:81:00.0')
+        self.neutron.update_switchport_mapping.side_effect = \
+            NeutronClientException(message='bad request', status_code=400)
+        importer = self._run(
+            [interface('compute-0', 'ens6f0',
+                       ['0000:81:00.%d' % j for j in range(4)])],
+            {('compute-0', '0000:81:00.3'): mapping('0000:81:00.3', '1/1/9',
+                                                    id='id-1')},
+            journal=journal)
+        self.assertEqual({'created': 2, 'updated': 0, 'unchanged': 0,
+                          'failed': 1, 'resumed': 1, 'removed': 0},
+                         importer.counts)
+        journal.record.assert_called_once_with(
+            [('compute-0', '0000:81:00.1'), ('compute-0', '0000:81:00.2')])
+
+    def test_diff(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'diff.ndjson')
+        old = [mapping('0000:81:00.2', id='id-1'),
+               mapping('0000:81:00.3', '1/1/9', id='id-2'),
+               mapping('0000:81:00.9', id='id-3'),
+               mapping('0000:81:00.2', host_id='compute-1', id='id-4')]
+        hosts = [{'service_host name': host_id,
+                  'interfaces': [interface(host_id, 'ens6f0', [
+                      '0000:81:00.2', '0000:81:00.3'])]}
+                 for host_id in ('compute-0', 'compute-1')]
+        with io.open(path, 'w') as diff_file:
+            topology_diff.write_diff(
+                topology_diff.TopologyDiff(
+                    topology_diff.report_mappings(hosts)),
+                old, diff_file, 'ndjson')
+
+        importer = topology_import.TopologyImporter(self.converter,
+                                                    bulk_size=1)
+        importer.run(topology_import.DiffReader(path,
+                                                HostFilter('compute-0')))
+        self.assertEqual({'created': 1, 'updated': 1, 'unchanged': 0,
+                          'failed': 0, 'resumed': 0, 'removed': 1},
+                         importer.counts)
+        self.neutron.update_switchport_mapping.assert_called_once_with(
+            'id-2', {'switchport_mapping': mapping('0000:81:00.3')})
+        self.neutron.create_switchport_mapping.assert_called_once_with(
+            {'switchport_mapping': mapping('ens6f0')})
+        self.assertFalse(self.neutron.get_switchport_mapping.called)
+
+    def test_base_diff(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'diff.json')
+        base = [{'service_host name': 'compute-0',
+                 'interfaces': [interface('compute-0', 'ens6f0', [
+                     '0000:81:00.2', '0000:81:00.3'])]}]
+        hosts = [{'service_host name': 'compute-0',
+                  'interfaces': [interface('compute-0', 'ens6f0', [
+                      '0000:81:00.2', '0000:81:00.3'], '1/1/9')]}]
+        with io.open(path, 'w') as diff_file:
+            topology_diff.write_diff(
+                topology_diff.TopologyDiff(
+                    topology_diff.report_mappings(hosts)),
+                topology_diff.base_mappings(base), diff_file, 'json')
+        # the mapping of ens6f0 is no longer in neutron
+        self.neutron.get_switchport_mapping.side_effect = \
+            lambda host_id, pci_slot: {'switchport_mappings': [
+                mapping(pci_slot, id='id-' + pci_slot)]
+                if pci_slot != 'ens6f0' else []}
+
+        importer = topology_import.TopologyImporter(self.converter,
+                                                    bulk_size=1)
+        importer.run(topology_import.DiffReader(path))
+        self.assertEqual({'created': 0, 'updated': 3, 'unchanged': 0,
+                          'failed': 0, 'resumed': 0, 'removed': 0},
+                         importer.counts)
+        self.neutron.update_switchport_mapping.assert_has_calls(
+            [mock.call('id-' + pci_slot,
+                       {'switchport_mapping': mapping(pci_slot, '1/1/9')})
+             for pci_slot in ('0000:81:00.2', '0000:81:00.3')],
+            any_order=True)
+        self.neutron.create_switchport_mapping.assert_called_once_with(
+            {'switchport_mapping': mapping('ens6f0', '1/1/9')})
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import tempfile
+import testtools
+
+from ansible.module_utils import tc_report
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'schema',
+                           'topo-collect-schema.json')
+
+
+def host(name, interfaces=None):
+    return {
+        'service_host name': name,
+        'interfaces': interfaces if interfaces is not None else [{
+            'name': 'ens6f0',
+            'vf_info': [{'device-name': 'virtfn0', 'pci-id': '0000:81:00.2'}],
+            'neighbor-system-name': 'cas-sf6-014',
+            'neighbor-system-mgmt-ip': '10.101.2.114',
+            'neighbor-system-port': '1/1/5',
+            'ovs-bridge': None
+        }]
+    }
+
+
+class TestTopologyReport(testtools.TestCase):
+
+    def setUp(self):
+        super(TestTopologyReport, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.src = os.path.join(self.tmp_dir, 'tmp')
+        os.mkdir(self.src)
+        self.dest = os.path.join(self.tmp_dir, 'report.json')
+        with open(SCHEMA_PATH) as schema_file:
+            self.schema = json.load(schema_file)
+
+    def _write(self, name, content):
+        with open(os.path.join(self.src, name), 'w') as host_file:
+            host_file.write(content if isinstance(content, str)
+                            else json.dumps(content))
+
+    def test_report(self):
+        self._write('compute-1.json', host('compute-1.localdomain'))
+        self._write('compute-0.json', host('compute-0.localdomain', []))
+        self._write('compute-2.json', '{"service_host name": ')
+        self._write('compute-3.json', {'interfaces': []})
+        self._write('compute-4.json', host('compute-4', [{'name': 'eth0'}]))
+        self._write('compute-5.unreachable', 'timed out')
+
+        count, skipped = tc_report.write_report(
+            self.src, self.dest, self.schema, '2020-01-01@00:00:00')
+
+        self.assertEqual(2, count)
+        self.assertEqual(['compute-2', 'compute-3', 'compute-4'],
+                         sorted(skipped))
+        self.assertIn('invalid JSON', skipped['compute-2'])
+        self.assertIn("'service_host name'", skipped['compute-3'])
+        self.assertIn('/interfaces/0', skipped['compute-4'])
+        with open(self.dest) as report_file:
+            report = json.load(report_file)
+        self.assertEqual('2020-01-01@00:00:00', report['datetime'])
+        self.assertEqual(['compute-5'], report['unreachable-hosts'])
+        self.assertEqual([host('compute-0.localdomain', []),
+                          host('compute-1.localdomain')],
+                         report['compute-hosts'])
+        self.assertEqual(skipped, report['skipped-hosts'])
+        self.assertIsNone(tc_report.validate(report, self.schema))
+
+    def test_no_hosts(self):
+        tc_report.write_report(self.src, self.dest, self.schema, 'now')
+        with open(self.dest) as report_file:
+            report = json.load(report_file)
+        self.assertEqual([], report['compute-hosts'])
+        self.assertEqual({}, report['skipped-hosts'])
+
+    def test_validate_types(self):
+        self.assertEqual('/interfaces is not of type array',
+                         tc_report.validate(
+                             {'service_host name': 'c', 'interfaces': {}},
+                             self.schema,
+                             tc_report.resolve(self.schema,
+                                               tc_report.HOST_DEFINITION)))
+        self.assertIsNotNone(tc_report.validate(
+            True, self.schema, {'type': 'integer'}))